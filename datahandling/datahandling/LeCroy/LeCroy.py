@@ -130,3 +130,54 @@ def InterpretWaveform(raw, integersOnly=False, headersOnly=False):
                         x = arange(len(integers)) * WAVEDESC['HORIZ_INTERVAL'] + WAVEDESC['HORIZ_OFFSET']
                         return (WAVEDESC, x, y, integers)
 
+
+
+def ReadWaveformBlocks(filepath, BlockSize=2**20):
+        """
+        Reads the voltages of a waveform file (in the format read by
+        InterpretWaveform) a block of BlockSize samples at a time, so that
+        files larger than memory can be streamed. The byte order, sample
+        size and the lengths of the descriptor and of any user text and
+        time arrays before the data are read from the WAVEDESC.
+
+        Parameters
+        ----------
+        filepath : string
+                The filepath to the waveform file
+        BlockSize : int, optional
+                The number of samples in each block, the last block may
+                be shorter.
+
+        Yields
+        ------
+        voltage : ndarray
+                The next block of the voltage data in Volts
+        """
+        from struct import unpack
+        from numpy import frombuffer, dtype
+
+        with open(filepath, 'rb') as f:
+                start = f.read(1024)
+                hashIndex = start.find(b'#') # skips "C1:WF ALL," or similar if present
+                if hashIndex == -1:
+                        raise Exception('Waveform format not as expected')
+                n = int(start[hashIndex+1:hashIndex+2]) # number of digits in length of data
+                descStart = hashIndex + 2 + n
+                desc = start[descStart:]
+
+                # the byte order, sample size and lengths of the blocks before the data are read from WAVEDESC
+                endian = {0: '>', 1: '<'}[unpack('<H', desc[34:36])[0]]
+                sampleType = dtype(endian + {0: 'i1', 1: 'i2'}[unpack(endian + 'H', desc[32:34])[0]])
+                WAVE_DESCRIPTOR, USER_TEXT = unpack(endian + 'll', desc[36:44])
+                TRIGTIME_ARRAY, RIS_TIME_ARRAY = unpack(endian + 'll', desc[48:56])
+                WAVE_ARRAY_1 = unpack(endian + 'l', desc[60:64])[0]
+                VERTICAL_GAIN, VERTICAL_OFFSET = unpack(endian + 'ff', desc[156:164])
+
+                f.seek(descStart + WAVE_DESCRIPTOR + USER_TEXT + TRIGTIME_ARRAY + RIS_TIME_ARRAY)
+                remaining = WAVE_ARRAY_1 // sampleType.itemsize
+                while remaining > 0:
+                        integers = frombuffer(f.read(sampleType.itemsize*min(BlockSize, remaining)), dtype=sampleType)
+                        if len(integers) == 0:
+                                raise Exception('Binary data not the expected length')
+                        remaining -= len(integers)
+                        yield integers * VERTICAL_GAIN - VERTICAL_OFFSET
@@ -1,5 +1,5 @@
 from datahandling import DataObject
-from datahandling import take_closest
+from datahandling import TimeAxis
 import numpy as _np
 import matplotlib.pyplot as _plt
 
@@ -11,7 +11,7 @@ class SimData(DataObject):
     ----------
         SampleFreq : float
                 The sample frequency used in generating the data.
-        time : ndarray
+        time : TimeAxis
                 Contains the time data in seconds
         voltage : ndarray
                 Contains the voltage data in Volts - with noise and clean signals
@@ -60,7 +60,7 @@ class SimData(DataObject):
 
         Returns
         -------
-        time : ndarray
+        time : TimeAxis
                 Contains the time data in seconds
         voltage : ndarray
                 Contains the voltage data in Volts - with noise and clean signals
@@ -79,7 +79,7 @@ class SimData(DataObject):
         Generates the simulated data (several sine waves with noise).
         """
         Ts = 1/self.SampleFreq
-        self.time = _np.arange(self.TimeTuple[0], self.TimeTuple[1], Ts)
+        self.time = TimeAxis(_np.ceil((self.TimeTuple[1] - self.TimeTuple[0]) / Ts), Ts, self.TimeTuple[0])
         self.TrueSignals = {}
         for Freq in self.SignalFreqs:
             w = 2*_np.pi*Freq
@@ -96,7 +96,7 @@ class SimData(DataObject):
         with phase noise.
         """
         Ts = 1/self.SampleFreq
-        self.time = _np.arange(self.TimeTuple[0], self.TimeTuple[1], Ts)
+        self.time = TimeAxis(_np.ceil((self.TimeTuple[1] - self.TimeTuple[0]) / Ts), Ts, self.TimeTuple[0])
         self.TrueSignals = {}
         for FreqIndex, Freq in enumerate(self.SignalFreqs):
             w = 2*_np.pi*Freq
@@ -126,8 +126,7 @@ class SimData(DataObject):
         """
         if timeLimits == "Default":
             timeLimits = [self.time[0], self.time[-1]]
-        lowerIndex = self.time.tolist().index(takeClosest(self.time, timeLimits[0]))
-        upperIndex = self.time.tolist().index(takeClosest(self.time, timeLimits[1]))
+        lowerIndex, upperIndex = self.time.get_index(timeLimits)
         fig = _plt.figure()
         NumPlots = len(self.TrueSignals) + 2
         axList = []
@@ -1,25 +1,49 @@
 import datahandling.LeCroy
-import matplotlib.pyplot as _plt
 import numpy as _np
 import scipy.signal
 from bisect import bisect_left as _bisect_left
 from scipy.optimize import curve_fit as _curve_fit
+from scipy.optimize import least_squares as _least_squares
 import uncertainties as _uncertainties
-from mpl_toolkits.mplot3d.axes3d import Axes3D
-from matplotlib import rcParams
-import matplotlib.animation as _animation
 from glob import glob
 import re
-import seaborn as _sns
-import pandas as _pd
 import fnmatch as _fnmatch
 from multiprocessing import Pool as _Pool
 from multiprocessing import cpu_count as _cpu_count
 from scipy.optimize import minimize as _minimize
 import warnings as _warnings
+import os as _os
+import json as _json
+import hashlib as _hashlib
+import sqlite3 as _sqlite3
+import importlib as _importlib
+from functools import lru_cache as _lru_cache
+from concurrent.futures import ThreadPoolExecutor as _ThreadPoolExecutor
 from scipy.signal import hilbert as _hilbert
 
 
+class _LazyModule():
+    """
+    Stands in for a module, which is only imported the first time one of
+    its attributes is used. Used for the plotting libraries and pandas, which
+    take most of the time to import datahandling, so that loading data and
+    fitting (e.g. in worker processes) doesn't wait for them.
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        return None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = _importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+_plt = _LazyModule("matplotlib.pyplot")
+_pd = _LazyModule("pandas")
+
+
 class DataObject():
     """
     Creates an object containing data and all it's properties.
@@ -34,7 +58,7 @@ class DataObject():
             this particular instance of the DataObject class
     waveDescription : dictionary
             Contains various information about the data as it was collected.
-    time : ndarray
+    time : TimeAxis
             Contains the time data in seconds
     voltage : ndarray
             Contains the voltage data in Volts
@@ -78,8 +102,8 @@ class DataObject():
 
         Returns
         -------
-        time : ndarray
-                        array containing the value of time (in seconds) at which the
+        time : TimeAxis
+                        the value of time (in seconds) at which the
                         voltage is sampled
         voltage : ndarray
                         array containing the sampled voltages
@@ -87,12 +111,16 @@ class DataObject():
         f = open(self.filepath, 'rb')
         raw = f.read()
         f.close()
-        self.waveDescription, self.time, self.voltage, _ = \
-            datahandling.LeCroy.InterpretWaveform(raw)
+        self.waveDescription, integers = \
+            datahandling.LeCroy.InterpretWaveform(raw, integersOnly=True)
+        self.voltage = integers * self.waveDescription["VERTICAL_GAIN"] - \
+            self.waveDescription["VERTICAL_OFFSET"]
+        self.time = TimeAxis(len(integers), self.waveDescription["HORIZ_INTERVAL"],
+                             self.waveDescription["HORIZ_OFFSET"])
         self.SampleFreq = (1 / self.waveDescription["HORIZ_INTERVAL"])
         return self.time, self.voltage
 
-    def plot_time_data(self, timeStart="Default", timeEnd="Default", ShowFig=True):
+    def plot_time_data(self, timeStart="Default", timeEnd="Default", NumPoints=4000, ShowFig=True):
         """
         plot time data against voltage data.
 
@@ -104,6 +132,11 @@ class DataObject():
         timeEnd : float, optional
             The time to finish plotting at.
             By default it uses the last time point
+        NumPoints : int, optional
+            The approximate number of points to plot, the min/max envelope
+            of the voltage (see get_voltage_envelope) is plotted and is
+            re-calculated for the visible window when zooming. If None
+            every sample is plotted. defaults to 4000
         ShowFig : bool, optional
             If True runs plt.show() before returning figure
             if False it just returns the figure object.
@@ -121,13 +154,15 @@ class DataObject():
         if timeEnd == "Default":
             timeEnd = self.time[-1]
 
-        StartIndex = list(self.time).index(take_closest(self.time, timeStart))
-        EndIndex = list(self.time).index(take_closest(self.time, timeEnd))
+        StartIndex, EndIndex = _take_closest_index(self.time, [timeStart, timeEnd])
 
         fig = _plt.figure(figsize=[10, 6])
         ax = fig.add_subplot(111)
-        ax.plot(self.time[StartIndex:EndIndex],
-                self.voltage[StartIndex:EndIndex])
+        if NumPoints is None:
+            ax.plot(self.time[StartIndex:EndIndex],
+                    self.voltage[StartIndex:EndIndex])
+        else:
+            _plot_voltage_envelope(ax, self, StartIndex, EndIndex, NumPoints)
         ax.set_xlabel("time (s)")
         ax.set_ylabel("voltage (V)")
         ax.set_xlim([timeStart, timeEnd])
@@ -135,6 +170,48 @@ class DataObject():
             _plt.show()
         return fig, ax
 
+    def get_voltage_envelope(self, timeStart="Default", timeEnd="Default", NumPoints=4000):
+        """
+        Gets the min/max envelope of the voltage between timeStart and
+        timeEnd with about NumPoints points, for plotting long traces
+        quickly without losing spikes. The MinMaxPyramid it is read from
+        is calculated the first time it is needed and kept.
+
+        Parameters
+        ----------
+        timeStart : float, optional
+            The time to start from.
+            By default it uses the first time point
+        timeEnd : float, optional
+            The time to finish at.
+            By default it uses the last time point
+        NumPoints : int, optional
+            The approximate number of points to return, defaults to 4000
+
+        Returns
+        -------
+        time : ndarray
+            The time of the start of the bin of each point
+        voltage : ndarray
+            The minimum and maximum voltage of each bin in turn
+        """
+        if timeStart == "Default":
+            timeStart = self.time[0]
+        if timeEnd == "Default":
+            timeEnd = self.time[-1]
+        StartIndex, EndIndex = _take_closest_index(self.time, [timeStart, timeEnd])
+        Indices, voltage = self._get_voltage_pyramid().get_envelope(StartIndex, EndIndex + 1, NumPoints // 2)
+        return self.time[Indices], voltage
+
+    def _get_voltage_pyramid(self):
+        """
+        Returns the MinMaxPyramid of the voltage, calculating it if it
+        hasn't been or the voltage has been replaced since.
+        """
+        if getattr(self, "_VoltagePyramid", None) is None or self._VoltagePyramid.Signal is not self.voltage:
+            self._VoltagePyramid = MinMaxPyramid(self.voltage)
+        return self._VoltagePyramid
+
     def get_PSD(self, NPerSegment='Default', window="hann"):
         """
         Extracts the pulse spectral density (PSD) from the data.
@@ -173,6 +250,111 @@ class DataObject():
         self.freqs = freqs
         return self.freqs, self.PSD
 
+    def get_peaks(self, MinProminence=0, MinHeight=0):
+        """
+        Finds every peak in the PSD in a single vectorised pass, giving the
+        centre, height, prominence and FWHM of each one. The table of all
+        the peaks is calculated once per PSD and reused by later calls,
+        which only filter it.
+
+        Parameters
+        ----------
+        MinProminence : float, optional
+            Only return peaks with at least this prominence
+            (height above the higher of the peak's 2 bases) in V**2/Hz.
+            defaults to 0
+        MinHeight : float, optional
+            Only return peaks with at least this height in V**2/Hz.
+            defaults to 0
+
+        Returns
+        -------
+        PeakTable : pandas.DataFrame
+            Table containing a row for every peak, sorted by frequency,
+            see find_PSD_peaks for a description of the columns.
+        """
+        if getattr(self, "_PeakTablePSD", None) is not self.PSD:
+            self._PeakTable = find_PSD_peaks(self.freqs, self.PSD)
+            self._PeakTablePSD = self.PSD
+        PeakTable = self._PeakTable
+        if MinProminence > 0 or MinHeight > 0:
+            PeakTable = PeakTable[(PeakTable.Prominence >= MinProminence) &
+                                  (PeakTable.Height >= MinHeight)].reset_index(drop=True)
+        return PeakTable
+
+    def enable_fit_cache(self, CachePath="Default"):
+        """
+        Remembers the results of get_fit and get_fit_auto in memory (for
+        the lifetime of this object) and in a results store on disk so
+        that repeating a fit (e.g. after reloading the file in a new
+        session) with the same PSD and fitting parameters returns the
+        stored result instead of fitting again. Until this is called
+        nothing is remembered.
+
+        Parameters
+        ----------
+        CachePath : string or None, optional
+            The filepath of the results store (an sqlite database) to use.
+            Several data files may share the same store as results are
+            keyed by a hash of the PSD as well as the fitting parameters.
+            If None the results are only remembered in memory.
+            defaults to a sidecar file next to the data file,
+            <filepath>.fits.sqlite
+
+        Returns
+        -------
+        CachePath : string or None
+            The filepath of the results store used
+        """
+        if CachePath == "Default":
+            CachePath = self.filepath + ".fits.sqlite"
+        self.FitCachePath = CachePath
+        self._FitCache = {}
+        return CachePath
+
+    def _get_fit_cache_key(self, Method, Args):
+        """
+        Returns the key used to store the results of running Method with
+        the arguments Args on this PSD.
+        """
+        if getattr(self, "_PSDHashPSD", None) is not self.PSD:
+            PSDHash = _hashlib.sha1()
+            PSDHash.update(_np.ascontiguousarray(self.freqs).tobytes())
+            PSDHash.update(_np.ascontiguousarray(self.PSD).tobytes())
+            self._PSDHash = PSDHash.hexdigest()
+            self._PSDHashPSD = self.PSD
+        KeyString = _json.dumps([self._PSDHash, Method, Args], default=float)
+        return _hashlib.sha1(KeyString.encode()).hexdigest()
+
+    def _get_cached_fit(self, Key):
+        """
+        Returns the stored result for Key, from memory or from the results
+        store, or None if there is no stored result or enable_fit_cache
+        hasn't been called.
+        """
+        if getattr(self, "_FitCache", None) is None:
+            return None
+        if Key in self._FitCache:
+            return self._FitCache[Key]
+        if getattr(self, "FitCachePath", None) is not None:
+            Result = _read_fit_cache(self.FitCachePath, Key)
+            if Result is not None:
+                self._FitCache[Key] = Result
+            return Result
+        return None
+
+    def _set_cached_fit(self, Key, Result):
+        """
+        Stores the (JSON serialisable) Result for Key in memory and in
+        the results store, if enable_fit_cache has been called.
+        """
+        if getattr(self, "_FitCache", None) is None:
+            return None
+        self._FitCache[Key] = Result
+        if getattr(self, "FitCachePath", None) is not None:
+            _write_fit_cache(self.FitCachePath, Key, Result)
+        return None
+
     def plot_PSD(self, xlim="Default", ShowFig=True):
         """
         plot the pulse spectral density.
@@ -231,11 +413,14 @@ class DataObject():
         AreaUnderPSD = sum(self.PSD[index_startAreaPSD: index_endAreaPSD])
         return AreaUnderPSD
 
-    def get_fit(self, TrapFreq, WidthOfPeakToFit, A_Initial=0.1e10, Gamma_Initial=400, NMovAveToFit=1, Silent=False, MakeFig=True, ShowFig=True):
+    def get_fit(self, TrapFreq, WidthOfPeakToFit, A_Initial=0.1e10, Gamma_Initial=400, NMovAveToFit=1, Silent=False, MakeFig=False, ShowFig=False):
         """
         Function that fits to a peak to the PSD to extract the 
         frequency, A factor and Gamma (damping) factor.
 
+        If enable_fit_cache has been called the result is remembered and
+        returned again for the same PSD and fitting parameters.
+
         Parameters
         ----------
         TrapFreq : float
@@ -258,10 +443,10 @@ class DataObject():
             defaults to False
         MakeFig : bool, optional
             Whether to construct and return the figure object showing
-            the fitting. defaults to True
+            the fitting. defaults to False
         ShowFig : bool, optional
-            Whether to show the figure object when it has been created.
-            defaults to True
+            Whether to show the figure object (it is made even if MakeFig is False).
+            defaults to False
 
         Returns
         -------
@@ -288,32 +473,34 @@ class DataObject():
                 - initial fit
                 - final fit
         """
-        if MakeFig == True:
+        Key = self._get_fit_cache_key("get_fit", [TrapFreq, WidthOfPeakToFit, A_Initial, Gamma_Initial, NMovAveToFit])
+        Cached = self._get_cached_fit(Key)
+        if Cached is None:
             Params, ParamsErr, fig, ax = fit_PSD(
                 self, WidthOfPeakToFit, NMovAveToFit, TrapFreq, A_Initial, Gamma_Initial, MakeFig=MakeFig, ShowFig=ShowFig)
+            self._set_cached_fit(Key, [Params.tolist(), ParamsErr.tolist()])
         else:
-            Params, ParamsErr, _ , _ = fit_PSD(
-                self, WidthOfPeakToFit, NMovAveToFit, TrapFreq, A_Initial, Gamma_Initial, MakeFig=MakeFig, ShowFig=ShowFig)
+            Params, ParamsErr = _np.array(Cached[0]), _np.array(Cached[1])
+            if MakeFig == True or ShowFig == True:
+                AngFreqs, freqs_smoothed, logPSD_smoothed, ftrap, _, _ = \
+                    _get_PSD_fit_region(self, WidthOfPeakToFit, NMovAveToFit, TrapFreq)
+                fig, ax = _plot_PSD_fit(AngFreqs, self.PSD, freqs_smoothed, logPSD_smoothed,
+                                        [A_Initial, ftrap, Gamma_Initial], Params, ftrap,
+                                        2 * _np.pi * WidthOfPeakToFit, ShowFig=ShowFig)
 
         if Silent == False:
-            print("\n")
-            print("A: {} +- {}% ".format(Params[0],
-                                         ParamsErr[0] / Params[0] * 100))
-            print(
-                "Trap Frequency: {} +- {}% ".format(Params[1], ParamsErr[1] / Params[1] * 100))
-            print(
-                "Big Gamma: {} +- {}% ".format(Params[2], ParamsErr[2] / Params[2] * 100))
+            _print_fit_params(Params, ParamsErr)
 
         self.A = _uncertainties.ufloat(Params[0], ParamsErr[0])
         self.Ftrap = _uncertainties.ufloat(Params[1], ParamsErr[1])
         self.Gamma = _uncertainties.ufloat(Params[2], ParamsErr[2])
 
-        if MakeFig == True:
+        if MakeFig == True or ShowFig == True:
             return self.A, self.Ftrap, self.Gamma, fig, ax
         else:
             return self.A, self.Ftrap, self.Gamma, None, None
 
-    def get_fit_from_peak(self, lowerLimit, upperLimit, NumPointsSmoothing=1, Silent=False, ShowFig=True):
+    def get_fit_from_peak(self, lowerLimit, upperLimit, NumPointsSmoothing=1, Silent=False, ShowFig=False):
         """
         Finds an approximate values for the peaks central frequency, height, 
         and FWHM by looking for the heighest peak in the frequncy range defined 
@@ -334,6 +521,7 @@ class DataObject():
             Whether it prints the values fitted or is silent.
         ShowFig : bool, optional
             Whether it makes and shows the figure object or not.
+            defaults to False
 
         Returns
         -------
@@ -344,49 +532,21 @@ class DataObject():
         Gamma : ufloat
             Gamma, the damping parameter
         """
-        lowerIndex = list(self.freqs).index(
-            take_closest(self.freqs, lowerLimit))
-        upperIndex = list(self.freqs).index(
-            take_closest(self.freqs, upperLimit))
+        lowerIndex, upperIndex = _take_closest_index(
+            self.freqs, [lowerLimit, upperLimit])
 
         if lowerIndex == upperIndex:
             _warnings.warn("range is too small, returning NaN", UserWarning)
             val = _uncertainties.ufloat(_np.NaN, _np.NaN)
             return val, val, val
 
-        MaxPSD = max(self.PSD[lowerIndex:upperIndex])
-
-        CentralFreq = self.freqs[list(self.PSD).index(MaxPSD)]
-        centralIndex = list(self.freqs).index(CentralFreq)
-
-        approx_A = MaxPSD * 1e16  # 1e16 was calibrated for a number of saves to be approximately the correct conversion factor between the height of the PSD and the A factor in the fitting
-
-        MinPSD = min(self.PSD[lowerIndex:upperIndex])
-
-        # need to get this on log scale
-        HalfMax = MinPSD + (MaxPSD - MinPSD) / 2
-
-        try:
-            LeftSideOfPeakIndex = list(self.PSD).index(
-                take_closest(self.PSD[lowerIndex:centralIndex], HalfMax))
-            LeftSideOfPeak = self.freqs[LeftSideOfPeakIndex]
-        except IndexError:
-            _warnings.warn("range is too small, returning NaN", UserWarning)
-            val = _uncertainties.ufloat(_np.NaN, _np.NaN)
-            return val, val, val
-
-        try:
-            RightSideOfPeakIndex = list(self.PSD).index(
-                take_closest(self.PSD[centralIndex:upperIndex], HalfMax))
-            RightSideOfPeak = self.freqs[RightSideOfPeakIndex]
-        except IndexError:
+        Seed = _get_peak_seed(self.get_peaks(), lowerLimit, upperLimit)
+        if Seed is None:
             _warnings.warn("range is too small, returning NaN", UserWarning)
             val = _uncertainties.ufloat(_np.NaN, _np.NaN)
             return val, val, val
+        CentralFreq, approx_A, approx_Gamma = Seed
 
-        FWHM = RightSideOfPeak - LeftSideOfPeak
-
-        approx_Gamma = FWHM/4
         try:
             self.get_fit(CentralFreq, (upperLimit-lowerLimit)/2, 
                          A_Initial=approx_A, Gamma_Initial=approx_Gamma, Silent=Silent, MakeFig=ShowFig, ShowFig=ShowFig)
@@ -397,18 +557,20 @@ class DataObject():
         FTrap = self.Ftrap
         A = self.A
         Gamma = self.Gamma
-
-        omegaArray = 2 * _np.pi * \
-            self.freqs[LeftSideOfPeakIndex:RightSideOfPeakIndex]
-        PSDArray = self.PSD[LeftSideOfPeakIndex:RightSideOfPeakIndex]
-
         return FTrap, A, Gamma
 
-    def get_fit_auto(self, CentralFreq, MaxWidth=15000, MinWidth=500, WidthIntervals=500, ShowFig=True):
+    def get_fit_auto(self, CentralFreq, MaxWidth=15000, MinWidth=500, WidthIntervals=500, Silent=False, ShowFig=False, ReturnTable=False):
         """
-        Tries a range of regions to search for peaks and runs the one with the least error
+        Tries a range of regions to search for peaks and keeps the one with the least error
         and returns the parameters with the least errors.
 
+        The widths are swept from MaxWidth down to MinWidth. The search and
+        fitting windows for every width are calculated up front and each fit
+        is started from the solution found at the previous (neighbouring)
+        width, the best fit is then kept rather than being fitted again.
+        If enable_fit_cache has been called the result is remembered and
+        returned again for the same PSD and fitting parameters.
+
         Parameters
         ----------
         CentralFreq : float
@@ -419,8 +581,14 @@ class DataObject():
             The minimum bandwidth to use for the fitting of the peaks.
         WidthIntervals : float, optional
             The intervals to use in going between the MaxWidth and MinWidth.
+        Silent : bool, optional
+            Whether to print the values of the best fit or be silent.
         ShowFig : bool, optional
             Whether to plot and show the final (best) fitting or not.
+            defaults to False
+        ReturnTable : bool, optional
+            Whether to also return the table of the fits performed at
+            every width. defaults to False
 
         Returns
         -------
@@ -430,32 +598,291 @@ class DataObject():
             A parameter
         Gamma : ufloat
             Gamma, the damping parameter
+        FitTable : pandas.DataFrame
+            Only returned if ReturnTable is True. Contains one row per
+            width tried with the columns Width, A, AErr, Ftrap, FtrapErr,
+            Gamma, GammaErr and TotalSumSquaredError.
+        """
+        Key = self._get_fit_cache_key("get_fit_auto", [CentralFreq, MaxWidth, MinWidth, WidthIntervals])
+        Cached = self._get_cached_fit(Key)
+        if Cached is None:
+            Table, Best = self._fit_width_sweep(CentralFreq, MaxWidth, MinWidth, WidthIntervals)
+            self._set_cached_fit(Key, [Table, Best])
+        else:
+            Table, Best = Cached
+
+        FitTable = _pd.DataFrame(Table, columns=["Width", "A", "AErr", "Ftrap", "FtrapErr",
+                                                 "Gamma", "GammaErr", "TotalSumSquaredError"])
+
+        if Best is None:
+            _warnings.warn("Couldn't find good fit with any width, returning NaN", RuntimeWarning)
+            val = _uncertainties.ufloat(_np.NaN, _np.NaN)
+            if ReturnTable == True:
+                return val, val, val, FitTable
+            return val, val, val
+
+        BestWidth, PeakFreq = Best[0], Best[1]
+        p0, Params_Fit, Params_Fit_Err = [_np.array(Values) for Values in Best[2:]]
+        if Silent == False:
+            _print_fit_params(Params_Fit, Params_Fit_Err)
+        self.A = _uncertainties.ufloat(Params_Fit[0], Params_Fit_Err[0])
+        self.Ftrap = _uncertainties.ufloat(Params_Fit[1], Params_Fit_Err[1])
+        self.Gamma = _uncertainties.ufloat(Params_Fit[2], Params_Fit_Err[2])
+
+        if ShowFig == True:
+            AngFreqs = 2 * _np.pi * self.freqs
+            logPSD = 10 * _np.log10(self.PSD)
+            _plot_PSD_fit(AngFreqs, self.PSD, AngFreqs, logPSD, p0, Params_Fit,
+                          2 * _np.pi * PeakFreq, 2 * _np.pi * BestWidth / 2, ShowFig=True)
+
+        FTrap = self.Ftrap
+        A = self.A
+        Gamma = self.Gamma
+        if ReturnTable == True:
+            return FTrap, A, Gamma, FitTable
+        return FTrap, A, Gamma
+
+    def _fit_width_sweep(self, CentralFreq, MaxWidth, MinWidth, WidthIntervals):
         """
+        Runs the sweep of fits over widths for get_fit_auto.
+
+        Returns
+        -------
+        Table : list
+            A row of [Width, A, AErr, Ftrap, FtrapErr, Gamma, GammaErr,
+            TotalSumSquaredError] per width
+        Best : list
+            [Width, PeakFreq, p0, Params, ParamsErr] of the fit with the
+            least error, or None if no fit succeeded
+        """
+        Widths = _np.arange(MaxWidth, MinWidth - WidthIntervals, -WidthIntervals)
+        AngFreqs = 2 * _np.pi * self.freqs
+        logPSD = 10 * _np.log10(self.PSD)
+        LowerIndices = _take_closest_index(self.freqs, CentralFreq - Widths / 2)
+        UpperIndices = _take_closest_index(self.freqs, CentralFreq + Widths / 2)
+
+        PeakTable = self.get_peaks()
+
+        Table = []
+        Params_Fit = None
         MinTotalSumSquaredError = _np.infty
-        for Width in _np.arange(MaxWidth, MinWidth - WidthIntervals, -WidthIntervals):
+        Best = None
+        for Width, lowerIndex, upperIndex in zip(Widths, LowerIndices, UpperIndices):
+            Seed = None
+            if lowerIndex != upperIndex:
+                Seed = _get_peak_seed(PeakTable, CentralFreq - Width / 2, CentralFreq + Width / 2)
+            if Seed is None:
+                _warnings.warn("range is too small for width {}".format(
+                    Width), UserWarning)
+                Params_Fit = None
+                Table.append([float(Width)] + [_np.NaN] * 7)
+                continue
+            PeakFreq, approx_A, approx_Gamma = Seed
+
+            # same fitting window as get_fit_from_peak -> get_fit would use
+            indx_fit_lower, indx_fit_upper = _take_closest_index(
+                AngFreqs, 2 * _np.pi * _np.array([PeakFreq - Width / 4, PeakFreq + Width / 4]))
+
+            if Params_Fit is None:
+                p0 = _np.array([approx_A, 2 * _np.pi * PeakFreq, approx_Gamma])
+            else:
+                p0 = Params_Fit # warm-start from the neighbouring width
             try:
-                Ftrap, A, Gamma = self.get_fit_from_peak(
-                    CentralFreq - Width / 2, CentralFreq + Width / 2, Silent=True, ShowFig=False)
-            except RuntimeError:
+                Params_Fit, Params_Fit_Err = _fit_PSD_window(
+                    AngFreqs[indx_fit_lower:indx_fit_upper],
+                    logPSD[indx_fit_lower:indx_fit_upper], p0)
+            except (RuntimeError, TypeError):
                 _warnings.warn("Couldn't find good fit with width {}".format(
                     Width), RuntimeWarning)
-                val = _uncertainties.ufloat(_np.NaN, _np.NaN)
-                Ftrap = val
-                A = val
-                Gamma = val
-            TotalSumSquaredError = (
-                A.std_dev / A.n)**2 + (Gamma.std_dev / Gamma.n)**2 + (Ftrap.std_dev / Ftrap.n)**2
-            #print("totalError: {}".format(TotalSumSquaredError))
+                Params_Fit = None
+                Table.append([float(Width)] + [_np.NaN] * 7)
+                continue
+
+            TotalSumSquaredError = _np.sum((Params_Fit_Err / Params_Fit)**2)
+            Table.append([float(Width), Params_Fit[0], Params_Fit_Err[0],
+                          Params_Fit[1], Params_Fit_Err[1],
+                          Params_Fit[2], Params_Fit_Err[2],
+                          TotalSumSquaredError])
             if TotalSumSquaredError < MinTotalSumSquaredError:
                 MinTotalSumSquaredError = TotalSumSquaredError
-                BestWidth = Width
-        print("found best")
-        self.get_fit_from_peak(CentralFreq - BestWidth / 2,
-                               CentralFreq + BestWidth / 2, ShowFig=ShowFig)
-        FTrap = self.Ftrap
-        A = self.A
-        Gamma = self.Gamma
-        return FTrap, A, Gamma
+                Best = [float(Width), float(PeakFreq), p0.tolist(),
+                        Params_Fit.tolist(), Params_Fit_Err.tolist()]
+
+        return Table, Best
+
+    def get_multi_fit(self, TrapFreqs, lowerLimit, upperLimit, A_Initials="Default", Gamma_Initials="Default", NoiseFloor_Initial="Default", SearchWidth=5000, NMovAveToFit=1, Silent=False, MakeFig=False, ShowFig=False):
+        """
+        Function that fits several peaks (e.g. the z, x and y peaks and
+        their harmonics) and a flat noise floor to the PSD simultaneously
+        in order to extract the frequency, A factor and Gamma (damping)
+        factor of each peak. Fitting all the peaks at once stops the tails
+        of neighbouring peaks biasing the fit of each peak.
+
+        Parameters
+        ----------
+        TrapFreqs : array_like
+            The approximate trapping frequencies of the peaks to fit
+        lowerLimit : float
+            The lower frequency limit of the region of the PSD to fit
+        upperLimit : float
+            The upper frequency limit of the region of the PSD to fit
+        A_Initials : array_like, optional
+            The initial values of the A parameter of each peak.
+            By default they are estimated from the heights of the peaks
+            found by get_peaks.
+        Gamma_Initials : array_like, optional
+            The initial values of the Gamma parameter of each peak.
+            By default they are estimated from the widths of the peaks
+            found by get_peaks.
+        NoiseFloor_Initial : float, optional
+            The initial value of the noise floor.
+            By default the 5th percentile of the PSD in the region fitted.
+        SearchWidth : float, optional
+            The width of the region about each of the TrapFreqs in which
+            to look for the peak in order to estimate initial values.
+            defaults to 5000
+        NMovAveToFit : int, optional
+            The number of point of moving average filter to perform
+            before fitting in order to smooth out the peaks.
+            defaults to 1.
+        Silent : bool, optional
+            Whether to print any output when running this function
+            defaults to False
+        MakeFig : bool, optional
+            Whether to construct and return the figure object showing
+            the fitting. defaults to False
+        ShowFig : bool, optional
+            Whether to show the figure object (it is made even if MakeFig is False).
+            defaults to False
+
+        Returns
+        -------
+        As : list of uncertainties.ufloat
+            Fitting constant A of each peak
+        Ftraps : list of uncertainties.ufloat
+            The trapping frequency of each peak (in angular frequency)
+        Gammas : list of uncertainties.ufloat
+            The damping factor Gamma of each peak
+        NoiseFloor : uncertainties.ufloat
+            The noise floor in V**2/Hz
+        fig : matplotlib.figure.Figure object
+            figure object containing the plot
+        ax : matplotlib.axes.Axes object
+            axes with the data, the total fit and each peak's fit plotted
+        """
+        TrapFreqs = _np.atleast_1d(TrapFreqs)
+        PeakTable = self.get_peaks()
+        Seeds = [_get_peak_seed(PeakTable, freq - SearchWidth / 2, freq + SearchWidth / 2)
+                 for freq in TrapFreqs]
+        if isinstance(A_Initials, str) and A_Initials == "Default":
+            A_Initials = [0.1e10 if Seed is None else Seed[1] for Seed in Seeds]
+        if isinstance(Gamma_Initials, str) and Gamma_Initials == "Default":
+            Gamma_Initials = [400 if Seed is None else Seed[2] for Seed in Seeds]
+        TrapFreqGuesses = [freq if Seed is None else Seed[0]
+                           for freq, Seed in zip(TrapFreqs, Seeds)]
+
+        Params, ParamsErr, NoiseFloor, NoiseFloorErr, fig, ax = fit_multi_PSD(
+            self, lowerLimit, upperLimit, TrapFreqGuesses, A_Initials, Gamma_Initials,
+            NoiseFloor_Initial, NMovAveToFit, MakeFig=MakeFig, ShowFig=ShowFig)
+
+        if Silent == False:
+            for PeakParams, PeakParamsErr in zip(Params, ParamsErr):
+                _print_fit_params(PeakParams, PeakParamsErr)
+            print("Noise Floor: {} +- {}% ".format(
+                NoiseFloor, NoiseFloorErr / NoiseFloor * 100))
+
+        As = [_uncertainties.ufloat(A, AErr) for A, AErr in zip(Params[:, 0], ParamsErr[:, 0])]
+        Ftraps = [_uncertainties.ufloat(F, FErr) for F, FErr in zip(Params[:, 1], ParamsErr[:, 1])]
+        Gammas = [_uncertainties.ufloat(G, GErr) for G, GErr in zip(Params[:, 2], ParamsErr[:, 2])]
+        NoiseFloor = _uncertainties.ufloat(NoiseFloor, NoiseFloorErr)
+
+        return As, Ftraps, Gammas, NoiseFloor, fig, ax
+
+    def get_fit_tracking(self, TrapFreq, WidthOfPeakToFit, WindowTime, StepTime="Default", NPerSegment="Default", A_Initial="Default", Gamma_Initial="Default", NumProcesses=1):
+        """
+        Tracks how the A factor, trapping frequency and Gamma (damping)
+        factor drift with time by fitting to the PSDs of a window sliding
+        along the data. Each fit is started from the solution of the
+        previous window, when using several processes the windows are
+        split into one contiguous block per process.
+
+        Parameters
+        ----------
+        TrapFreq : float
+            The approximate trapping frequency to use initially
+            as the centre of the peak
+        WidthOfPeakToFit : float
+            The width of the peak to be fitted to
+        WindowTime : float
+            The duration of each window in seconds
+        StepTime : float, optional
+            The time in seconds the window slides along by each step.
+            defaults to WindowTime (windows that don't overlap)
+        NPerSegment : int, optional
+            Length of each segment used in Welch's method to calculate the
+            PSD of each window. defaults to a quarter of the window
+        A_Initial : float, optional
+            The initial value of the A parameter to use in fitting.
+            By default it is estimated from the height of the peak.
+        Gamma_Initial : float, optional
+            The initial value of the Gamma parameter to use in fitting.
+            By default it is estimated from the width of the peak.
+        NumProcesses : int, optional
+            The number of worker processes to fit the windows with.
+            defaults to 1 (fit in this process)
+
+        Returns
+        -------
+        FitTable : pandas.DataFrame
+            Table containing a row per window with the columns Time (the
+            time at the centre of the window), A, AErr, Ftrap, FtrapErr,
+            Gamma and GammaErr. Ftrap is in angular frequency as in get_fit.
+        """
+        WindowLength = int(WindowTime * self.SampleFreq)
+        if StepTime == "Default":
+            StepLength = WindowLength
+        else:
+            StepLength = int(StepTime * self.SampleFreq)
+        if NPerSegment == "Default":
+            NPerSegment = max(WindowLength // 4, 2)
+
+        freqs, PSDs, WindowStarts = calc_sliding_PSD(
+            self.voltage, self.SampleFreq, WindowLength, StepLength, NPerSegment,
+            FreqRange=[TrapFreq - WidthOfPeakToFit, TrapFreq + WidthOfPeakToFit])
+        AngFreqs = 2 * _np.pi * freqs
+        logPSDs = 10 * _np.log10(PSDs)
+
+        Blocks = [Block for Block in _np.array_split(_np.arange(len(PSDs)), NumProcesses)
+                  if len(Block) > 0]
+        ArgLists = []
+        for Block in Blocks:
+            Seed = _get_peak_seed(find_PSD_peaks(freqs, PSDs[Block[0]]),
+                                  TrapFreq - WidthOfPeakToFit / 2, TrapFreq + WidthOfPeakToFit / 2)
+            if Seed is None:
+                Seed = (TrapFreq, 0.1e10, 400)
+            p0 = _np.array([Seed[1] if A_Initial == "Default" else A_Initial,
+                            2 * _np.pi * Seed[0],
+                            Seed[2] if Gamma_Initial == "Default" else Gamma_Initial])
+            ArgLists.append([AngFreqs, logPSDs[Block], 2 * _np.pi * WidthOfPeakToFit, p0])
+
+        if NumProcesses > 1:
+            workerPool = _Pool(NumProcesses)
+            try:
+                Results = workerPool.map(_fit_PSD_track, ArgLists)
+            finally:
+                workerPool.close()
+                workerPool.join()
+        else:
+            Results = [_fit_PSD_track(ArgList) for ArgList in ArgLists]
+        Params = _np.concatenate([Result[0] for Result in Results])
+        ParamsErr = _np.concatenate([Result[1] for Result in Results])
+
+        Times = self.time[0] + (WindowStarts + (WindowLength // 2)) / self.SampleFreq
+        return _pd.DataFrame({"Time": Times,
+                              "A": Params[:, 0], "AErr": ParamsErr[:, 0],
+                              "Ftrap": Params[:, 1], "FtrapErr": ParamsErr[:, 1],
+                              "Gamma": Params[:, 2], "GammaErr": ParamsErr[:, 2]},
+                             columns=["Time", "A", "AErr", "Ftrap", "FtrapErr", "Gamma", "GammaErr"])
 
     def extract_parameters(self, P_mbar, P_Error):
         """
@@ -503,10 +930,11 @@ class DataObject():
         ZXYPeakWidths : array_like
             A sequency containing 3 elements, the widths of the
             z, x and y frequency peaks respectively.
-        subSampleFraction : int, optional
-            How much to sub-sample the data by before filtering,
+        subSampleFraction : int or "Auto", optional
+            How much to decimate the data by before filtering,
             effectively reducing the sample frequency by this 
-            fraction.
+            fraction. If "Auto" the lowest sample frequency that
+            still holds the highest filter's band is used.
 
         Returns
         -------
@@ -525,38 +953,173 @@ class DataObject():
             self, zf, xf, yf, subSampleFraction, zwidth, xwidth, ywidth)
         return self.zVolts, self.xVolts, self.yVolts
 
-    def plot_phase_space(self, zf, xf=80000, yf=120000, FractionOfSampleFreq=4, zwidth=10000, xwidth=5000, ywidth=5000, ShowFig=True):
+    def get_ZXY_envelopes(self, ApproxZXYFreqs, uncertaintyInFreqs, ZXYBandwidths, DecimationFactor="Auto"):
         """
-        author: Markus Rademacher
+        Extracts the complex envelopes of the z, x and y motion by digital
+        lock-in demodulation (see demodulate) at the frequencies of the
+        highest peaks about the approximate frequencies (found with
+        get_ZXY_freqs). The envelopes are sampled at a rate near the
+        bandwidths rather than the full sample rate, so the amplitude, phase
+        and instantaneous frequency of each axis (see
+        calc_envelope_parameters) are far cheaper to work with than the
+        signals from extract_ZXY_motion on long data.
+
+        Parameters
+        ----------
+        ApproxZXYFreqs : array_like
+            A sequency containing 3 elements, the approximate 
+            z, x and y frequency respectively.
+        uncertaintyInFreqs : float
+            The width about each approximate frequency to search
+            for the peak in.
+        ZXYBandwidths : array_like
+            A sequency containing 3 elements, the widths of the bands
+            about the z, x and y frequency to keep respectively.
+        DecimationFactor : int or "Auto", optional
+            The factor to reduce the sample rate of the envelopes by,
+            see demodulate.
+
+        Returns
+        -------
+        self.ZXYFreqs : ndarray
+            The z, x and y frequencies demodulated at
+        self.ZXYEnvelopes : ndarray
+            2D complex array containing the z, x and y envelopes
+        self.EnvelopeTime : ndarray
+            The time data to go with the envelopes
+        """
+        [zf, xf, yf] = ApproxZXYFreqs
+        self.ZXYFreqs = _np.array(get_ZXY_freqs(
+            self, zf, xf, yf, bandwidth=uncertaintyInFreqs))
+        self.ZXYEnvelopes, EnvelopeSampleFreq = demodulate(
+            self.voltage, self.SampleFreq, self.ZXYFreqs, ZXYBandwidths, DecimationFactor)
+        DecimationFactor = int(round(self.SampleFreq / EnvelopeSampleFreq))
+        self.EnvelopeTime = self.time[::DecimationFactor]
+        return self.ZXYFreqs, self.ZXYEnvelopes, self.EnvelopeTime
+
+    def calc_phase_space(self, zf, xf=80000, yf=120000, FractionOfSampleFreq="Auto", zwidth=10000, xwidth=5000, ywidth=5000):
+        """
+        Calculates the position and velocity of the z motion (in metres and
+        metres per second, using the conversion factor self.ConvFactor)
+        from the z signal filtered out by get_ZXY_data, without plotting
+        anything.
+
+        Parameters
+        ----------
+        zf : float
+            The frequency of the z peak in the PSD
+        xf : float, optional
+            The frequency of the x peak in the PSD
+        yf : float, optional
+            The frequency of the y peak in the PSD
+        FractionOfSampleFreq : integer or "Auto", optional
+            The fraction of the sample frequency to decimate the data by,
+            see get_ZXY_data.
+        zwidth : float, optional
+            The width of the pass-band of the filter for z
+        xwidth : float, optional
+            The width of the pass-band of the filter for x
+        ywidth : float, optional
+            The width of the pass-band of the filter for y
+
+        Returns
+        -------
+        ZArray : ndarray
+            The z position with time (m)
+        ZVArray : ndarray
+            The z velocity with time (m/s), between each pair of
+            positions so one element shorter than ZArray
+        VarZ : float
+            The variance of the z position
+        VarZV : float
+            The variance of the z velocity
         """
         Z, X, Y, Time = get_ZXY_data(
             self, zf, xf, yf, FractionOfSampleFreq, zwidth, xwidth, ywidth, ShowFig=False)
 
         conv = self.ConvFactor.n
         ZArray = Z / conv
-        ZVArray = _np.diff(ZArray) * (self.SampleFreq / FractionOfSampleFreq)
+        ZVArray = _np.diff(ZArray) / (Time[1] - Time[0])
         VarZ = _np.var(ZArray)
         VarZV = _np.var(ZVArray)
-        MaxZ = _np.max(ZArray)
-        MaxZV = _np.max(ZVArray)
-        if MaxZ > MaxZV / (2 * _np.pi * zf):
-            _plotlimit = MaxZ * 1.1
-        else:
-            _plotlimit = MaxZV / (2 * _np.pi * zf) * 1.1
-
-        JP1 = _sns.jointplot(_pd.Series(ZArray[1:], name="$z$(m) \n filepath=%s" % (self.filepath)), _pd.Series(
-            ZVArray / (2 * _np.pi * zf), name="$v_z$/$\omega$(m)"), stat_func=None, xlim=[-_plotlimit, _plotlimit], ylim=[-_plotlimit, _plotlimit])
-        JP1.ax_joint.text(_np.mean(ZArray), MaxZV / (2 * _np.pi * zf) * 1.15,
-                          r"$\sigma_z=$ %.2Em, $\sigma_v=$ %.2Em" % (
-                              VarZ, VarZV),
-                          horizontalalignment='center')
-        JP1.ax_joint.text(_np.mean(ZArray), MaxZV / (2 * _np.pi * zf) * 1.6,
-                          "filepath=%s" % (self.filepath),
-                          horizontalalignment='center')
-        if ShowFig == True:
-            _plt.show()
+        return ZArray, ZVArray, VarZ, VarZV
+
+    def get_phase_space_histogram(self, zf, xf=80000, yf=120000, FractionOfSampleFreq="Auto", zwidth=10000, xwidth=5000, ywidth=5000, Limit="Auto", NumBins=200, Histogram=None):
+        """
+        Bins the position z and velocity v_z/ω (calculated by
+        calc_phase_space, where ω is the angular frequency 2π*zf) into a
+        PhaseSpaceHistogram.
+
+        Parameters
+        ----------
+        zf : float
+            The frequency of the z peak in the PSD
+        xf : float, optional
+            The frequency of the x peak in the PSD
+        yf : float, optional
+            The frequency of the y peak in the PSD
+        FractionOfSampleFreq : integer or "Auto", optional
+            The fraction of the sample frequency to decimate the data by,
+            see get_ZXY_data.
+        zwidth : float, optional
+            The width of the pass-band of the filter for z
+        xwidth : float, optional
+            The width of the pass-band of the filter for x
+        ywidth : float, optional
+            The width of the pass-band of the filter for y
+        Limit : float or "Auto", optional
+            The histogram spans -Limit to Limit (in metres) in z and v_z/ω,
+            "Auto" uses 1.1 times the largest |z| or |v_z/ω| of this data.
+            Not used if Histogram is given.
+        NumBins : int, optional
+            The number of bins along each axis. Not used if Histogram
+            is given.
+        Histogram : PhaseSpaceHistogram, optional
+            If given the samples are added to this histogram (e.g. to build
+            up the phase space over many files) instead of a new one.
+
+        Returns
+        -------
+        Histogram : PhaseSpaceHistogram
+            The histogram the samples were added to
+        """
+        ZArray, ZVArray, _, _ = self.calc_phase_space(
+            zf, xf, yf, FractionOfSampleFreq, zwidth, xwidth, ywidth)
+        ZArray = ZArray[1:]
+        ZVOverOmega = ZVArray / (2 * _np.pi * zf)
+        if Histogram is None:
+            if Limit == "Auto":
+                Limit = 1.1 * max(_np.max(_np.abs(ZArray)), _np.max(_np.abs(ZVOverOmega)))
+            Histogram = PhaseSpaceHistogram(Limit, NumBins)
+        Histogram.add(ZArray, ZVOverOmega)
+        return Histogram
+
+    def plot_phase_space(self, zf, xf=80000, yf=120000, FractionOfSampleFreq="Auto", zwidth=10000, xwidth=5000, ywidth=5000, NumBins=200, ShowFig=True):
+        """
+        author: Markus Rademacher
+
+        Plots the density of the z motion in phase space, see
+        get_phase_space_histogram and PhaseSpaceHistogram.plot.
+
+        Returns
+        -------
+        VarZ : float
+            The variance of the z position (m^2)
+        VarZV : float
+            The variance of the z velocity (m^2/s^2)
+        fig : matplotlib.figure.Figure object
+            The figure object created
+        Mass : uncertainties.ufloat
+            The mass of the particle (self.Mass)
+        """
+        Histogram = self.get_phase_space_histogram(
+            zf, xf, yf, FractionOfSampleFreq, zwidth, xwidth, ywidth, NumBins=NumBins)
+        _, Covariance = Histogram.get_moments()
+        VarZ = Covariance[0, 0]
+        VarZV = Covariance[1, 1] * (2 * _np.pi * zf)**2
+        fig, ax = Histogram.plot(title="filepath=%s" % (self.filepath), ShowFig=ShowFig)
 
-        return VarZ, VarZV, JP1, self.Mass
+        return VarZ, VarZV, fig, self.Mass
 
     
 class ORGTableData():
@@ -578,12 +1141,24 @@ class ORGTableData():
     """
     def __init__(self, filename):
         """
-        Opens the org-mode table file, reads the file in as a string,
-        and runs parse_orgtable in order to read the pressure.
+        Reads in the org-mode table file (see _read_orgtable, files that
+        have already been read and haven't changed since aren't parsed
+        again).
+        """
+        self.filename = filename
+        self._Version = _get_orgtable_version(filename)
+        self.ORGTableData = _read_orgtable(filename)
+
+    def _get_table(self):
+        """
+        Returns the table, reading the file in again if it has been
+        modified since it was read.
         """
-        with open(filename, 'r') as file:
-            fileContents = file.readlines()
-        self.ORGTableData = parse_orgtable(fileContents)
+        Version = _get_orgtable_version(self.filename)
+        if Version != self._Version:
+            self._Version = Version
+            self.ORGTableData = _read_orgtable(self.filename)
+        return self.ORGTableData
 
     def get_value(self, ColumnName, RunNo):
         """
@@ -603,58 +1178,687 @@ class ORGTableData():
         Value : float
             The value for the column's name and associated run number
         """
-        Value = float(self.ORGTableData[self.ORGTableData.RunNo == '{}'.format(
-            RunNo)][ColumnName])
+        Value = float(self._get_table().at[int(RunNo), ColumnName])
         
         return Value 
-    
-def load_data(Filepath):
+
+    def get_values(self, ColumnName, RunNos):
+        """
+        Retreives the values of the collumn named ColumnName associated
+        with many run numbers at once.
+
+        Parameters
+        ----------
+        ColumnName : string
+            The name of the desired org-mode table's collumn
+        RunNos : sequence
+            The run numbers for which to retreive the values
+
+        Returns
+        -------
+        Values : ndarray
+            The values for the column's name in the order of RunNos
+        """
+        Table = self._get_table()
+        RunNos = _np.asarray(RunNos, dtype=int)
+        Indices = Table.index.get_indexer(RunNos)
+        if (Indices == -1).any() == True:
+            raise KeyError("Run numbers {} are not in {}".format(list(RunNos[Indices == -1]), self.filename))
+        Values = Table[ColumnName].to_numpy(dtype=float)[Indices]
+        return Values
+
+
+def _read_orgtable(filename):
     """
-    Parameters
-    ----------
-        Filepath : string
-            filepath to the file containing the data used to initialise
-            and create an instance of the DataObject class
+    Reads and parses (with parse_orgtable) an org-mode table file. The
+    parsed tables of the most recently read files are kept (by path,
+    modification time and size, so a changed file is read again) and a
+    copy is returned, so changing one table doesn't change the others.
+    """
+    return _read_orgtable_version(*_get_orgtable_version(filename)).copy()
 
-    Returns
-    -------
-        Data : DataObject
-            An instance of the DataObject class contaning the data
-            that you requested to be loaded.
+
+def _get_orgtable_version(filename):
     """
-    print("Loading data from {}".format(Filepath))
-    return DataObject(Filepath)
+    Returns the absolute path, modification time and size of a file,
+    which identify the version of the file read by _read_orgtable.
+    """
+    filepath = _os.path.abspath(filename)
+    FileStat = _os.stat(filepath)
+    return filepath, FileStat.st_mtime_ns, FileStat.st_size
 
 
-def multi_load_data(Channel, RunNos, RepeatNos, directoryPath='.'):
+@_lru_cache(maxsize=32)
+def _read_orgtable_version(filepath, ModificationTime, Size):
     """
-    Lets you load multiple datasets at once.
+    Reads and parses a version of an org-mode table file, see
+    _read_orgtable.
+    """
+    with open(filepath, 'r') as file:
+        fileContents = file.readlines()
+    return parse_orgtable(fileContents)
 
-    Parameters
-    ----------
-    Channel : int
-        The channel you want to load
-    RunNos : sequence
-        Sequence of run numbers you want to load
-    RepeatNos : sequence
-        Sequence of repeat numbers you want to load
-    directoryPath : string, optional
-        The path to the directory housing the data
-        The default is the current directory
 
-    Returns
-    -------
-    Data : list
-        A list containing the DataObjects that were loaded. 
+class TimeAxis(_np.lib.mixins.NDArrayOperatorsMixin):
     """
-    files = glob('{}/*'.format(directoryPath))
-    files_CorrectChannel = []
-    for file_ in files:
-        if 'CH{}'.format(Channel) in file_:
-            files_CorrectChannel.append(file_)
-    files_CorrectRunNo = []
-    for RunNo in RunNos:
-        files_match = _fnmatch.filter(
+    A uniformly sampled time axis, time[i] = Offset + i*SampleInterval,
+    which calculates times when they are needed rather than storing an
+    array of them. It can be used like the (read only) array of times,
+    indexing gives times, slicing gives another TimeAxis (without copying
+    anything) and numpy functions and arithmetic are applied to the array
+    of times. Converting from a time to an index is done arithmetically
+    by get_index and get_slice.
+
+    Attributes
+    ----------
+    N : int
+        The number of times (samples)
+    SampleInterval : float
+        The time between samples
+    Offset : float
+        The time of the first sample
+    """
+    def __init__(self, N, SampleInterval, Offset=0):
+        """
+        Parameters
+        ----------
+        N : int
+            The number of times (samples)
+        SampleInterval : float
+            The time between samples
+        Offset : float, optional
+            The time of the first sample, defaults to 0
+        """
+        self.N = int(N)
+        self.SampleInterval = float(SampleInterval)
+        self.Offset = float(Offset)
+        return None
+
+    def __len__(self):
+        return self.N
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.N)
+            return TimeAxis(len(range(start, stop, step)), self.SampleInterval * step,
+                            self.Offset + start * self.SampleInterval)
+        if _np.ndim(key) == 0 and not isinstance(key, (bool, _np.bool_)):
+            index = int(key)
+            if index < 0:
+                index += self.N
+            if not 0 <= index < self.N:
+                raise IndexError("index {} is out of bounds for TimeAxis with {} times".format(key, self.N))
+            return self.Offset + index * self.SampleInterval
+        indices = _np.asarray(key)
+        if indices.dtype.kind not in "biu":
+            # e.g. a tuple of slices or newaxis, as used on arrays
+            return _np.asarray(self)[key]
+        if indices.dtype == bool:
+            indices = _np.nonzero(indices)[0]
+        indices = _np.where(indices < 0, indices + self.N, indices)
+        if ((indices < 0) | (indices >= self.N)).any():
+            raise IndexError("index out of bounds for TimeAxis with {} times".format(self.N))
+        return self.Offset + indices * self.SampleInterval
+
+    def __iter__(self):
+        return iter(_np.asarray(self))
+
+    def __array__(self, dtype=None, copy=None):
+        # the times are calculated afresh each time so they never share
+        # memory with anything, whatever copy (numpy >= 2) asks for
+        times = _np.arange(self.N) * self.SampleInterval + self.Offset
+        if dtype is not None:
+            return times.astype(dtype, copy=False)
+        return times
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        inputs = [_np.asarray(x) if isinstance(x, TimeAxis) else x for x in inputs]
+        return getattr(ufunc, method)(*inputs, **kwargs)
+
+    def __repr__(self):
+        return "TimeAxis(N={}, SampleInterval={}, Offset={})".format(
+            self.N, self.SampleInterval, self.Offset)
+
+    @property
+    def shape(self):
+        return (self.N,)
+
+    @property
+    def size(self):
+        return self.N
+
+    @property
+    def ndim(self):
+        return 1
+
+    @property
+    def dtype(self):
+        return _np.dtype(float)
+
+    def tolist(self):
+        return _np.asarray(self).tolist()
+
+    def get_index(self, Times):
+        """
+        Gets the index of the closest time to each time given (as
+        take_closest, if two are equally close the earlier is used).
+
+        Parameters
+        ----------
+        Times : float or array_like
+            The time(s) to find the index of
+
+        Returns
+        -------
+        Index : int or ndarray
+            The index (or indices) of the closest time(s)
+        """
+        Index = _np.ceil((_np.asarray(Times) - self.Offset) / self.SampleInterval - 0.5)
+        Index = _np.clip(Index, 0, self.N - 1).astype(int)
+        if Index.ndim == 0:
+            return int(Index)
+        return Index
+
+    def get_slice(self, timeStart, timeEnd):
+        """
+        Gets the slice from the closest time to timeStart up to (but not
+        including) the closest time to timeEnd.
+
+        Parameters
+        ----------
+        timeStart : float
+            The time to start the slice at
+        timeEnd : float
+            The time to end the slice at
+
+        Returns
+        -------
+        Slice : slice
+            The slice, for indexing the time and the data sampled at them
+        """
+        return slice(self.get_index(timeStart), self.get_index(timeEnd))
+
+
+class MinMaxPyramid():
+    """
+    Pyramid of the minimum and maximum of a signal over bins of
+    BaseBinSize, 2*BaseBinSize, 4*BaseBinSize, ... samples, from which the
+    min/max envelope of any window of the signal can be read with about
+    a given number of points (e.g. the number of pixels across a plot)
+    without going through every sample in the window. Unlike sub-sampling
+    the signal by taking every Nth sample the envelope keeps spikes and
+    other short transients.
+
+    Attributes
+    ----------
+    Signal : ndarray
+        The signal (not copied)
+    BaseBinSize : int
+        The number of samples in each bin of the first level
+    Levels : list
+        The (minimums, maximums) of the bins at each level
+    """
+    def __init__(self, Signal, BaseBinSize=8):
+        """
+        Parameters
+        ----------
+        Signal : ndarray
+            The signal
+        BaseBinSize : int, optional
+            The number of samples in each bin of the first level, must be
+            a power of 2. Windows
+            shorter than BaseBinSize times the number of bins requested
+            are returned sample by sample. defaults to 8
+        """
+        self.Signal = _np.asarray(Signal)
+        self.BaseBinSize = BaseBinSize
+        self.Levels = []
+        mins, maxs = self.Signal, self.Signal
+        BinSize = 1
+        # halve the number of bins each step, the last bin is repeated if there are an odd number
+        while len(mins) > 1:
+            if len(mins) % 2 == 1:
+                mins, maxs = _np.append(mins, mins[-1]), _np.append(maxs, maxs[-1])
+            mins = _np.minimum(mins[0::2], mins[1::2])
+            maxs = _np.maximum(maxs[0::2], maxs[1::2])
+            BinSize *= 2
+            if BinSize >= BaseBinSize:
+                self.Levels.append((mins, maxs))
+        return None
+
+    def get_envelope(self, StartIndex, EndIndex, NumBins=2000):
+        """
+        Gets the min/max envelope of the signal from StartIndex up to
+        EndIndex with between NumBins and 2*NumBins bins (or every sample
+        of the window if it is shorter than BaseBinSize*NumBins).
+
+        Parameters
+        ----------
+        StartIndex : int
+            The index to start the window at
+        EndIndex : int
+            The index to end the window at (not included)
+        NumBins : int, optional
+            The minimum number of bins to split the window into
+
+        Returns
+        -------
+        Indices : ndarray
+            The index of the start of the bin of each point
+            (the index of each sample if the samples are returned)
+        Values : ndarray
+            The minimum and maximum of each bin in turn
+            (the samples if the samples are returned)
+        """
+        StartIndex, EndIndex = max(int(StartIndex), 0), min(int(EndIndex), len(self.Signal))
+        NumSamples = EndIndex - StartIndex
+        if NumSamples < self.BaseBinSize * NumBins:
+            return _np.arange(StartIndex, max(EndIndex, StartIndex)), self.Signal[StartIndex:EndIndex]
+        Level = min(int(_np.log2(NumSamples / (self.BaseBinSize * NumBins))), len(self.Levels) - 1)
+        BinSize = self.BaseBinSize * 2**Level
+        FirstBin, LastBin = StartIndex // BinSize, -(-EndIndex // BinSize)
+        mins, maxs = self.Levels[Level]
+        Indices = _np.repeat(_np.arange(FirstBin, LastBin) * BinSize, 2)
+        Indices = _np.clip(Indices, StartIndex, EndIndex - 1)
+        Values = _np.column_stack([mins[FirstBin:LastBin], maxs[FirstBin:LastBin]]).ravel()
+        return Indices, Values
+
+
+def _plot_voltage_envelope(ax, Data, StartIndex, EndIndex, NumPoints, **kwargs):
+    """
+    Plots the min/max envelope of Data's voltage (see
+    DataObject.get_voltage_envelope) with about NumPoints points and
+    re-calculates it for the visible window whenever the x limits of
+    the axes change (e.g. when zooming).
+    """
+    Indices, Values = Data._get_voltage_pyramid().get_envelope(StartIndex, EndIndex, NumPoints // 2)
+    line, = ax.plot(Data.time[Indices], Values, **kwargs)
+
+    def update_envelope(ax):
+        timeStart, timeEnd = ax.get_xlim()
+        StartIndex, EndIndex = _take_closest_index(Data.time, [timeStart, timeEnd])
+        Indices, Values = Data._get_voltage_pyramid().get_envelope(StartIndex, EndIndex + 1, NumPoints // 2)
+        line.set_data(Data.time[Indices], Values)
+        return None
+
+    ax.callbacks.connect('xlim_changed', update_envelope)
+    return line
+
+
+class StreamingStatistics():
+    """
+    Statistics of a stream of samples (e.g. the voltage, z position or z
+    velocity) which are updated a chunk at a time: the number of samples,
+    mean, variance, skewness and kurtosis (from the central moments up to
+    4th order, combined between chunks with the pairwise update of Chan
+    et al. and Pébay), the minimum and maximum and optionally a histogram
+    with fixed bins. Statistics from different chunks, files or worker
+    processes can be merged, so statistics over far more data than fits
+    in memory are calculated with constant memory.
+
+    Attributes
+    ----------
+    NumSamples : int
+        The number of samples added
+    Mean : float
+        The mean of the samples
+    M2, M3, M4 : float
+        The sums over the samples of the 2nd, 3rd and 4th powers of
+        their deviation from the mean
+    Min : float
+        The smallest sample
+    Max : float
+        The largest sample
+    Range : tuple
+        The (lower, upper) limits of the histogram (None if there is no
+        histogram)
+    Edges : ndarray
+        The edges of the bins of the histogram
+    Counts : ndarray
+        The number of samples in each bin of the histogram
+    NumOutOfRange : int
+        The number of samples outside the range of the histogram
+    """
+    def __init__(self, Range=None, NumBins=200):
+        """
+        Parameters
+        ----------
+        Range : tuple, optional
+            The (lower, upper) limits of the histogram, if None (the
+            default) no histogram is made
+        NumBins : int, optional
+            The number of bins of the histogram, defaults to 200
+        """
+        self.NumSamples = 0
+        self.Mean = 0.0
+        self.M2 = 0.0
+        self.M3 = 0.0
+        self.M4 = 0.0
+        self.Min = _np.inf
+        self.Max = -_np.inf
+        self.Range = Range
+        self.NumOutOfRange = 0
+        if Range is not None:
+            self.Range = (float(Range[0]), float(Range[1]))
+            self.Edges = _np.linspace(self.Range[0], self.Range[1], NumBins + 1)
+            self.Counts = _np.zeros(NumBins, dtype=_np.int64)
+        return None
+
+    def add(self, Samples):
+        """
+        Adds a chunk of samples to the statistics.
+
+        Parameters
+        ----------
+        Samples : ndarray
+            The samples to add
+        """
+        Samples = _np.asarray(Samples, dtype=float).ravel()
+        if len(Samples) == 0:
+            return None
+        Mean = Samples.mean()
+        Deviations = Samples - Mean
+        Deviations2 = Deviations**2
+        self._merge_moments(len(Samples), Mean, Deviations2.sum(),
+                            (Deviations2 * Deviations).sum(), (Deviations2**2).sum())
+        self.Min = min(self.Min, Samples.min())
+        self.Max = max(self.Max, Samples.max())
+        if self.Range is not None:
+            NumBins = len(self.Counts)
+            Lower, Upper = self.Range
+            BinIndices = _np.floor((Samples - Lower) * (NumBins / (Upper - Lower))).astype(_np.int64)
+            BinIndices[Samples == Upper] = NumBins - 1 # the last bin includes the upper edge, like numpy.histogram
+            InRange = (BinIndices >= 0) & (BinIndices < NumBins)
+            self.Counts += _np.bincount(BinIndices[InRange], minlength=NumBins)
+            self.NumOutOfRange += len(Samples) - _np.count_nonzero(InRange)
+        return None
+
+    def merge(self, other):
+        """
+        Adds the samples of another StreamingStatistics (e.g. one
+        calculated from another chunk, file or worker process) to these
+        statistics. If both have histograms they must have the same bins.
+        """
+        if self.Range != other.Range or (self.Range is not None and len(self.Counts) != len(other.Counts)):
+            raise ValueError("Only statistics with the same histogram Range and NumBins can be merged")
+        self._merge_moments(other.NumSamples, other.Mean, other.M2, other.M3, other.M4)
+        self.Min = min(self.Min, other.Min)
+        self.Max = max(self.Max, other.Max)
+        if self.Range is not None:
+            self.Counts += other.Counts
+            self.NumOutOfRange += other.NumOutOfRange
+        return None
+
+    def _merge_moments(self, NumSamples, Mean, M2, M3, M4):
+        """
+        Combines the mean and central moments of another set of samples
+        with those of these statistics.
+        """
+        if NumSamples == 0:
+            return None
+        na, nb = self.NumSamples, NumSamples
+        n = na + nb
+        Delta = Mean - self.Mean
+        M2a, M3a = self.M2, self.M3
+        self.M4 = (self.M4 + M4 + Delta**4 * na * nb * (na**2 - na * nb + nb**2) / n**3
+                   + 6 * Delta**2 * (na**2 * M2 + nb**2 * M2a) / n**2
+                   + 4 * Delta * (na * M3 - nb * M3a) / n)
+        self.M3 = (M3a + M3 + Delta**3 * na * nb * (na - nb) / n**2
+                   + 3 * Delta * (na * M2 - nb * M2a) / n)
+        self.M2 = M2a + M2 + Delta**2 * na * nb / n
+        self.Mean = self.Mean + Delta * nb / n
+        self.NumSamples = n
+        return None
+
+    def get_moments(self):
+        """
+        Returns
+        -------
+        Mean : float
+            The mean of the samples
+        Variance : float
+            The variance of the samples (like numpy.var)
+        Skewness : float
+            The skewness of the samples (like scipy.stats.skew)
+        Kurtosis : float
+            The excess kurtosis of the samples (like scipy.stats.kurtosis)
+
+        All are NaN if no samples were added, the skewness and kurtosis
+        are NaN if all the samples are the same.
+        """
+        n = self.NumSamples
+        if n == 0:
+            return _np.nan, _np.nan, _np.nan, _np.nan
+        Variance = self.M2 / n
+        if self.M2 == 0:
+            return self.Mean, Variance, _np.nan, _np.nan
+        Skewness = _np.sqrt(n) * self.M3 / self.M2**1.5
+        Kurtosis = n * self.M4 / self.M2**2 - 3
+        return self.Mean, Variance, Skewness, Kurtosis
+
+
+class PhaseSpaceHistogram():
+    """
+    2D histogram of the position z and the velocity divided by the angular
+    trap frequency v_z/ω (both in metres) over a fixed square range, along
+    with the mean and covariance of the samples. Samples can be added in
+    chunks and histograms of different chunks or files can be merged, so
+    the phase space of far more data than fits in memory can be built up.
+
+    Attributes
+    ----------
+    Limit : float
+        The bins span -Limit to Limit in both z and v_z/ω
+    NumBins : int
+        The number of bins along each axis
+    Edges : ndarray
+        The edges of the bins (the same along both axes)
+    Counts : ndarray
+        The number of samples in each bin, indexed by [z bin, v_z/ω bin]
+    NumSamples : int
+        The number of samples added (including those outside the range)
+    NumOutOfRange : int
+        The number of samples added that were outside the range
+    Mean : ndarray
+        The mean of z and v_z/ω
+    CoMoment : ndarray
+        The sum over the samples of the outer product of their
+        deviation from the mean, see get_moments
+    """
+    def __init__(self, Limit, NumBins=200):
+        """
+        Parameters
+        ----------
+        Limit : float
+            The bins span -Limit to Limit in both z and v_z/ω (in metres)
+        NumBins : int, optional
+            The number of bins along each axis, defaults to 200
+        """
+        self.Limit = float(Limit)
+        self.NumBins = int(NumBins)
+        self.Edges = _np.linspace(-self.Limit, self.Limit, self.NumBins + 1)
+        self.Counts = _np.zeros([self.NumBins, self.NumBins], dtype=_np.int64)
+        self.NumSamples = 0
+        self.NumOutOfRange = 0
+        self.Mean = _np.zeros(2)
+        self.CoMoment = _np.zeros([2, 2])
+        return None
+
+    def add(self, Z, ZVOverOmega):
+        """
+        Adds samples to the histogram.
+
+        Parameters
+        ----------
+        Z : ndarray
+            The positions (m)
+        ZVOverOmega : ndarray
+            The velocities divided by the angular trap frequency (m),
+            the same length as Z
+        """
+        Samples = _np.column_stack([_np.asarray(Z, dtype=float), _np.asarray(ZVOverOmega, dtype=float)])
+        if len(Samples) == 0:
+            return None
+        BinIndices = _np.floor((Samples + self.Limit) * (self.NumBins / (2 * self.Limit))).astype(_np.int64)
+        InRange = ((BinIndices >= 0) & (BinIndices < self.NumBins)).all(axis=1)
+        BinIndices = BinIndices[InRange]
+        self.Counts += _np.bincount(BinIndices[:, 0] * self.NumBins + BinIndices[:, 1],
+                                    minlength=self.NumBins**2).reshape(self.NumBins, self.NumBins)
+        self.NumOutOfRange += len(Samples) - len(BinIndices)
+        Mean = Samples.mean(axis=0)
+        Deviations = Samples - Mean
+        self._merge_moments(len(Samples), Mean, Deviations.T @ Deviations)
+        return None
+
+    def merge(self, other):
+        """
+        Adds the samples of another PhaseSpaceHistogram with the same
+        bins (e.g. one built from another chunk, file or worker process)
+        to this one.
+        """
+        if self.Limit != other.Limit or self.NumBins != other.NumBins:
+            raise ValueError("Only histograms with the same Limit and NumBins can be merged")
+        self.Counts += other.Counts
+        self.NumOutOfRange += other.NumOutOfRange
+        self._merge_moments(other.NumSamples, other.Mean, other.CoMoment)
+        return None
+
+    def _merge_moments(self, NumSamples, Mean, CoMoment):
+        """
+        Combines the mean and co-moment of another set of samples with
+        those of this histogram (Chan et al.'s pairwise update).
+        """
+        if NumSamples == 0:
+            return None
+        Total = self.NumSamples + NumSamples
+        Delta = Mean - self.Mean
+        self.Mean = self.Mean + Delta * NumSamples / Total
+        self.CoMoment = self.CoMoment + CoMoment + _np.outer(Delta, Delta) * self.NumSamples * NumSamples / Total
+        self.NumSamples = Total
+        return None
+
+    def get_moments(self):
+        """
+        Returns
+        -------
+        Mean : ndarray
+            The mean of z and v_z/ω (m)
+        Covariance : ndarray
+            The 2x2 covariance matrix of z and v_z/ω (m^2), the
+            diagonal holds the variances of z and v_z/ω
+        """
+        return self.Mean.copy(), self.CoMoment / self.NumSamples
+
+    def get_marginals(self):
+        """
+        Returns
+        -------
+        ZCounts : ndarray
+            The number of samples in each z bin
+        ZVCounts : ndarray
+            The number of samples in each v_z/ω bin
+        """
+        return self.Counts.sum(axis=1), self.Counts.sum(axis=0)
+
+    def plot(self, title=None, ShowFig=True):
+        """
+        Plots the density of samples in phase space as an image (on a
+        log colour scale) with the marginal histograms of z and v_z/ω
+        above and to the right of it.
+
+        Parameters
+        ----------
+        title : string, optional
+            The title of the figure
+        ShowFig : bool, optional
+            If True runs plt.show() before returning figure
+            if False it just returns the figure object.
+            (the default is True, it shows the figure)
+
+        Returns
+        -------
+        fig : matplotlib.figure.Figure object
+            The figure object created
+        ax : matplotlib.axes.Axes object
+            The axes of the phase space density
+        """
+        from matplotlib.colors import LogNorm
+
+        fig = _plt.figure(figsize=[8, 8])
+        ax = fig.add_axes([0.12, 0.1, 0.65, 0.65])
+        axZ = fig.add_axes([0.12, 0.77, 0.65, 0.15], sharex=ax)
+        axZV = fig.add_axes([0.79, 0.1, 0.15, 0.65], sharey=ax)
+        Counts = _np.ma.masked_equal(self.Counts, 0)
+        if Counts.count() > 0:
+            ax.pcolormesh(self.Edges, self.Edges, Counts.T, norm=LogNorm(), cmap="Blues")
+        ZCounts, ZVCounts = self.get_marginals()
+        axZ.fill_between(self.Edges, _np.append(ZCounts, 0), step="post", alpha=0.6)
+        axZV.fill_betweenx(self.Edges, _np.append(ZVCounts, 0), step="post", alpha=0.6)
+        axZ.axis("off")
+        axZV.axis("off")
+        ax.set_xlim([-self.Limit, self.Limit])
+        ax.set_ylim([-self.Limit, self.Limit])
+        ax.set_xlabel("$z$(m)")
+        ax.set_ylabel(r"$v_z$/$\omega$(m)")
+        _, Covariance = self.get_moments()
+        ax.text(0.5, 0.95, r"$\sigma_z^2=$ %.2Em$^2$, $\sigma_{v/\omega}^2=$ %.2Em$^2$" % (
+                    Covariance[0, 0], Covariance[1, 1]),
+                transform=ax.transAxes, horizontalalignment='center')
+        if title is not None:
+            fig.suptitle(title)
+        if ShowFig == True:
+            _plt.show()
+        return fig, ax
+
+
+def load_data(Filepath):
+    """
+    Parameters
+    ----------
+        Filepath : string
+            filepath to the file containing the data used to initialise
+            and create an instance of the DataObject class
+
+    Returns
+    -------
+        Data : DataObject
+            An instance of the DataObject class contaning the data
+            that you requested to be loaded.
+    """
+    print("Loading data from {}".format(Filepath))
+    return DataObject(Filepath)
+
+
+def search_data_files(Channel, RunNos, RepeatNos, directoryPath='.'):
+    """
+    Finds the filepaths of the data files for a particular channel,
+    run numbers and repeat numbers.
+
+    Parameters
+    ----------
+    Channel : int
+        The channel you want to load
+    RunNos : sequence
+        Sequence of run numbers you want to load
+    RepeatNos : sequence
+        Sequence of repeat numbers you want to load
+    directoryPath : string, optional
+        The path to the directory housing the data
+        The default is the current directory
+
+    Returns
+    -------
+    Filepaths : list
+        A list containing the filepaths of the matching files.
+    """
+    files = glob('{}/*'.format(directoryPath))
+    files_CorrectChannel = []
+    for file_ in files:
+        if 'CH{}'.format(Channel) in file_:
+            files_CorrectChannel.append(file_)
+    files_CorrectRunNo = []
+    for RunNo in RunNos:
+        files_match = _fnmatch.filter(
             files_CorrectChannel, '*RUN*0{}_*'.format(RunNo))
         for file_ in files_match:
             files_CorrectRunNo.append(file_)
@@ -664,6 +1868,31 @@ def multi_load_data(Channel, RunNos, RepeatNos, directoryPath='.'):
             files_CorrectRunNo, '*REPEAT*0{}.*'.format(RepeatNo))
         for file_ in files_match:
             files_CorrectRepeatNo.append(file_)
+    return files_CorrectRepeatNo
+
+
+def multi_load_data(Channel, RunNos, RepeatNos, directoryPath='.'):
+    """
+    Lets you load multiple datasets at once.
+
+    Parameters
+    ----------
+    Channel : int
+        The channel you want to load
+    RunNos : sequence
+        Sequence of run numbers you want to load
+    RepeatNos : sequence
+        Sequence of repeat numbers you want to load
+    directoryPath : string, optional
+        The path to the directory housing the data
+        The default is the current directory
+
+    Returns
+    -------
+    Data : list
+        A list containing the DataObjects that were loaded. 
+    """
+    files_CorrectRepeatNo = search_data_files(Channel, RunNos, RepeatNos, directoryPath)
     cpu_count = _cpu_count()
     workerPool = _Pool(cpu_count)
     # for filepath in files_CorrectRepeatNo:
@@ -672,6 +1901,460 @@ def multi_load_data(Channel, RunNos, RepeatNos, directoryPath='.'):
     data = workerPool.map(load_data, files_CorrectRepeatNo)
     return data
 
+
+_MULTI_FIT_COLUMNS = ["Filepath",
+                      "A", "AErr", "Ftrap", "FtrapErr", "Gamma", "GammaErr",
+                      "Radius", "RadiusErr", "Mass", "MassErr",
+                      "ConvFactor", "ConvFactorErr",
+                      "TotalSumSquaredError", "FitError"]
+
+
+def _fit_data_file(ArgList):
+    """
+    Loads a data file, fits its PSD and (if a pressure is given) extracts
+    the radius, mass and conversion factor, without making any figures.
+    Used by multi_fit_data as the function run by each worker process.
+
+    Parameters
+    ----------
+    ArgList : array_like
+        Contains the following elements:
+            Filepath : string
+                filepath of the data file to fit
+            Pressure : float or None
+                pressure in mbar when the data was taken, the parameters
+                are only extracted if this is not None
+            FitArgs : tuple
+                (TrapFreq, WidthOfPeakToFit, A_Initial, Gamma_Initial,
+                NMovAveToFit, P_Error, FitCachePath) passed on to
+                get_fit, extract_parameters and enable_fit_cache
+
+    Returns
+    -------
+    Row : list
+        The row of the table produced by multi_fit_data for this file,
+        with the values in the order of _MULTI_FIT_COLUMNS.
+    """
+    Filepath, Pressure, FitArgs = ArgList
+    TrapFreq, WidthOfPeakToFit, A_Initial, Gamma_Initial, NMovAveToFit, P_Error, FitCachePath = FitArgs
+    Row = [Filepath] + [_np.NaN] * (len(_MULTI_FIT_COLUMNS) - 2) + [""]
+    try:
+        Data = DataObject(Filepath)
+        if FitCachePath is not None:
+            Data.enable_fit_cache(FitCachePath)
+        A, Ftrap, Gamma, _, _ = Data.get_fit(TrapFreq, WidthOfPeakToFit, A_Initial, Gamma_Initial,
+                                             NMovAveToFit, Silent=True, MakeFig=False, ShowFig=False)
+        Row[1:7] = [A.n, A.std_dev, Ftrap.n, Ftrap.std_dev, Gamma.n, Gamma.std_dev]
+        Row[13] = (A.std_dev / A.n)**2 + (Ftrap.std_dev / Ftrap.n)**2 + (Gamma.std_dev / Gamma.n)**2
+        if Pressure is not None:
+            R, M, ConvFactor = Data.extract_parameters(Pressure, P_Error)
+            Row[7:13] = [R.n, R.std_dev, M.n, M.std_dev, ConvFactor.n, ConvFactor.std_dev]
+    except Exception as error:
+        Row[14] = "{}: {}".format(type(error).__name__, error)
+    return Row
+
+
+def multi_fit_data(Filepaths, TrapFreq, WidthOfPeakToFit, A_Initial=0.1e10, Gamma_Initial=400, NMovAveToFit=1,
+                   Pressures=None, P_Error=0.15, NumProcesses="Default", FitCachePath=None):
+    """
+    Loads, fits and extracts the parameters of many data files across a
+    pool of worker processes (without making any figures) and collects
+    the results into a single table.
+
+    Parameters
+    ----------
+    Filepaths : sequence
+        Sequence of filepaths of the data files to fit, for example
+        as found by search_data_files
+    TrapFreq : float
+        The approximate trapping frequency to use initially
+        as the centre of the peak
+    WidthOfPeakToFit : float
+        The width of the peak to be fitted to
+    A_Initial : float, optional
+        The initial value of the A parameter to use in fitting
+    Gamma_Initial : float, optional
+        The initial value of the Gamma parameter to use in fitting
+    NMovAveToFit : int, optional
+        The number of point of moving average filter to perform
+        before fitting in order to smooth out the peak.
+        defaults to 1.
+    Pressures : float or sequence, optional
+        The pressure in mbar when the data was taken, either one
+        value for all the files or one value per file. If given the
+        radius, mass and conversion factor are extracted as well.
+    P_Error : float, optional
+        The error in the pressure values (as a decimal e.g. 15% = 0.15)
+    NumProcesses : int, optional
+        The number of worker processes to use
+        defaults to the number of cpus
+    FitCachePath : string, optional
+        If given, the fits are stored in (and looked up from) this results
+        store, "Default" uses a sidecar file next to each data file.
+        See DataObject.enable_fit_cache. defaults to None (no store)
+
+    Returns
+    -------
+    FitTable : pandas.DataFrame
+        Table containing a row per file with the columns Filepath, A,
+        AErr, Ftrap, FtrapErr, Gamma, GammaErr, Radius, RadiusErr, Mass,
+        MassErr, ConvFactor, ConvFactorErr, TotalSumSquaredError (the
+        sum of the squared relative errors in A, Ftrap and Gamma) and
+        FitError (the error raised when loading or fitting that file,
+        empty if the fit succeeded).
+    """
+    if Pressures is None or _np.isscalar(Pressures):
+        Pressures = [Pressures] * len(Filepaths)
+    if len(Pressures) != len(Filepaths):
+        raise ValueError("Pressures must be a single value or contain one value per file")
+    FitArgs = (TrapFreq, WidthOfPeakToFit, A_Initial, Gamma_Initial, NMovAveToFit, P_Error, FitCachePath)
+    ArgLists = [[Filepath, Pressure, FitArgs] for Filepath, Pressure in zip(Filepaths, Pressures)]
+
+    if NumProcesses == "Default":
+        NumProcesses = _cpu_count()
+    workerPool = _Pool(NumProcesses)
+    try:
+        Rows = workerPool.map(_fit_data_file, ArgLists)
+    finally:
+        workerPool.close()
+        workerPool.join()
+    return _pd.DataFrame(Rows, columns=_MULTI_FIT_COLUMNS)
+
+
+_PSD_PLOT_COLUMNS = ["Filepath", "PlotFilepath", "PlotError"]
+
+
+class _PSDFigureTemplate():
+    """
+    The figure used by save_PSD_plots, the figure, axes and lines are
+    created once and the data of the lines is replaced for each file.
+    The figure is not registered with pyplot, so it is never shown and
+    is freed along with the template.
+    """
+    def __init__(self):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        self.fig = Figure(figsize=[10, 6])
+        self.canvas = FigureCanvasAgg(self.fig)
+        ax = self.fig.add_subplot(111)
+        self.PSDLine, = ax.semilogy([], [], color="blue")
+        self.FitLine, = ax.semilogy([], [], color="red")
+        ax.set_xlabel("Frequency (Hz)")
+        ax.grid(which="major")
+        ax.set_ylabel("$S_{xx}$ ($v^2/Hz$)")
+        self.title = ax.set_title("")
+        self.ax = ax
+        return None
+
+    def plot(self, freqs, PSD, xlim, FitPSD=None, Title=""):
+        """
+        Replaces the plotted PSD (and the fitted PSD, if given) and
+        rescales the axes to the new data.
+        """
+        self.PSDLine.set_data(freqs, PSD)
+        if FitPSD is None:
+            self.FitLine.set_data([], [])
+        else:
+            self.FitLine.set_data(freqs, FitPSD)
+        self.title.set_text(Title)
+        self.ax.set_xlim(xlim)
+        InView = (freqs >= xlim[0]) & (freqs <= xlim[1]) & (PSD > 0)
+        if InView.any() == True:
+            self.ax.set_ylim([PSD[InView].min() / 2, PSD[InView].max() * 2])
+        return None
+
+    def save(self, Filepath, dpi=100):
+        """
+        Saves the figure as it is currently plotted to Filepath.
+        """
+        self.fig.savefig(Filepath, dpi=dpi)
+        return None
+
+
+_PSDFigureWorkerTemplate = None
+
+
+def _init_PSD_plot_worker():
+    """
+    Creates the figure template of a save_PSD_plots worker process.
+    """
+    global _PSDFigureWorkerTemplate
+    _PSDFigureWorkerTemplate = _PSDFigureTemplate()
+    return None
+
+
+def _plot_PSD_file(ArgList):
+    """
+    Loads a data file, optionally fits its PSD and plots the PSD (and
+    the fit) on the figure template of the worker process and saves it.
+    Used by save_PSD_plots as the function run by each worker process.
+
+    Parameters
+    ----------
+    ArgList : array_like
+        Contains the following elements:
+            Filepath : string
+                filepath of the data file to plot
+            PlotFilepath : string
+                filepath to save the figure to
+            PlotArgs : tuple
+                (xlim, TrapFreq, WidthOfPeakToFit, A_Initial,
+                Gamma_Initial, NMovAveToFit, FitCachePath, dpi), the
+                PSD is only fitted if TrapFreq is not None
+
+    Returns
+    -------
+    Row : list
+        The row of the table produced by save_PSD_plots for this file,
+        with the values in the order of _PSD_PLOT_COLUMNS.
+    """
+    Filepath, PlotFilepath, PlotArgs = ArgList
+    xlim, TrapFreq, WidthOfPeakToFit, A_Initial, Gamma_Initial, NMovAveToFit, FitCachePath, dpi = PlotArgs
+    Row = [Filepath, PlotFilepath, ""]
+    try:
+        Data = DataObject(Filepath)
+        FitPSD = None
+        if TrapFreq is not None:
+            if FitCachePath is not None:
+                Data.enable_fit_cache(FitCachePath)
+            A, Ftrap, Gamma, _, _ = Data.get_fit(TrapFreq, WidthOfPeakToFit, A_Initial, Gamma_Initial,
+                                                 NMovAveToFit, Silent=True, MakeFig=False, ShowFig=False)
+            FitPSD = _PSD_fitting_eqn(A.n, Ftrap.n, Gamma.n, 2 * _np.pi * Data.freqs)
+        if isinstance(xlim, str) and xlim == "Default":
+            xlim = [0, Data.SampleFreq / 2]
+        _PSDFigureWorkerTemplate.plot(Data.freqs, Data.PSD, xlim, FitPSD, _os.path.basename(Filepath))
+        _PSDFigureWorkerTemplate.save(PlotFilepath, dpi)
+    except Exception as error:
+        Row[2] = "{}: {}".format(type(error).__name__, error)
+    return Row
+
+
+def _get_plot_filepaths(Filepaths, OutputDirectory):
+    """
+    Names the png of each data file after the data file. Data files with
+    the same name (in different directories) are named after their path
+    from the directory containing all of them instead, with the directory
+    separators replaced by underscores, so that no plot overwrites another.
+    """
+    Names = [_os.path.splitext(_os.path.basename(Filepath))[0] for Filepath in Filepaths]
+    if len(set(Names)) < len(Names):
+        AbsolutePaths = [_os.path.abspath(Filepath) for Filepath in Filepaths]
+        CommonDirectory = _os.path.commonpath([_os.path.dirname(Path) for Path in AbsolutePaths])
+        Names = [_os.path.splitext(_os.path.relpath(Path, CommonDirectory))[0].replace(_os.sep, "_")
+                 for Path in AbsolutePaths]
+        if len(set(Names)) < len(Names):
+            raise ValueError("Filepaths contains files which would be plotted to the same png")
+    return [_os.path.join(OutputDirectory, Name + ".png") for Name in Names]
+
+
+def save_PSD_plots(Filepaths, OutputDirectory=".", xlim="Default", TrapFreq=None, WidthOfPeakToFit=None,
+                   A_Initial=0.1e10, Gamma_Initial=400, NMovAveToFit=1, NumProcesses="Default",
+                   FitCachePath=None, dpi=100):
+    """
+    Plots the PSD of many data files (optionally along with a fit to the
+    peak, as done by DataObject.get_fit) and saves each plot as a png.
+    Each worker process creates the figure once and replaces the data of
+    its lines for each file, so many files can be plotted quickly and
+    without the memory used growing with the number of files.
+
+    Parameters
+    ----------
+    Filepaths : sequence
+        Sequence of filepaths of the data files to plot, for example
+        as found by search_data_files
+    OutputDirectory : string, optional
+        The directory to save the pngs to, each is named after the
+        data file it plots (files with the same name in different
+        directories are named after their paths, a ValueError is raised
+        if two files would still share a png). defaults to the current
+        directory
+    xlim : array_like, optional
+        The x limits of the plotted PSDs [LowerLimit, UpperLimit]
+        Default value is [0, SampleFreq/2] of each file
+    TrapFreq : float, optional
+        The approximate trapping frequency of the peak to fit, if
+        None (the default) the PSDs are plotted without a fit
+    WidthOfPeakToFit : float, optional
+        The width of the peak to be fitted to
+    A_Initial : float, optional
+        The initial value of the A parameter to use in fitting
+    Gamma_Initial : float, optional
+        The initial value of the Gamma parameter to use in fitting
+    NMovAveToFit : int, optional
+        The number of point of moving average filter to perform
+        before fitting in order to smooth out the peak.
+        defaults to 1.
+    NumProcesses : int, optional
+        The number of worker processes to use
+        defaults to the number of cpus
+    FitCachePath : string, optional
+        If given, the fits are stored in (and looked up from) this
+        results store, see DataObject.enable_fit_cache.
+        defaults to None (no store)
+    dpi : float, optional
+        The resolution of the saved pngs in dots per inch
+
+    Returns
+    -------
+    PlotTable : pandas.DataFrame
+        Table containing a row per file with the columns Filepath,
+        PlotFilepath (the png the plot was saved to) and PlotError (the
+        error raised when loading, fitting or plotting that file, empty
+        if the plot was saved).
+    """
+    if TrapFreq is not None and WidthOfPeakToFit is None:
+        raise ValueError("WidthOfPeakToFit must be given to fit the PSDs")
+    PlotArgs = (xlim, TrapFreq, WidthOfPeakToFit, A_Initial, Gamma_Initial, NMovAveToFit, FitCachePath, dpi)
+    ArgLists = [[Filepath, PlotFilepath, PlotArgs] for Filepath, PlotFilepath
+                in zip(Filepaths, _get_plot_filepaths(Filepaths, OutputDirectory))]
+
+    if NumProcesses == "Default":
+        NumProcesses = _cpu_count()
+    workerPool = _Pool(NumProcesses, initializer=_init_PSD_plot_worker)
+    try:
+        Rows = workerPool.map(_plot_PSD_file, ArgLists)
+    finally:
+        workerPool.close()
+        workerPool.join()
+    return _pd.DataFrame(Rows, columns=_PSD_PLOT_COLUMNS)
+
+
+def _calc_file_statistics(ArgList):
+    """
+    Streams the voltage of a data file a block at a time and calculates
+    the statistics of the voltage and (if a z frequency is given) of the
+    z position and velocity. Used by multi_calc_statistics as the
+    function run by each worker process.
+
+    Parameters
+    ----------
+    ArgList : array_like
+        Contains the following elements:
+            Filepath : string
+                filepath of the data file
+            ConvFactor : float or None
+                conversion factor (in Volts/Metre) of the file
+            StatsArgs : tuple
+                (SampleFreq, zf, zwidth, ztransition, VoltageRange, ZRange,
+                ZVRange, NumBins, BlockSize), z is only filtered out if zf
+                is not None
+
+    Returns
+    -------
+    Statistics : list
+        The StreamingStatistics of the voltage, z position and z velocity
+        (the last two are None if zf is None)
+    """
+    Filepath, ConvFactor, StatsArgs = ArgList
+    SampleFreq, zf, zwidth, ztransition, VoltageRange, ZRange, ZVRange, NumBins, BlockSize = StatsArgs
+    VoltageStats = StreamingStatistics(VoltageRange, NumBins)
+    ZStats, ZVStats = None, None
+    if zf is not None:
+        ZStats, ZVStats = StreamingStatistics(ZRange, NumBins), StreamingStatistics(ZVRange, NumBins)
+        sos = _cached_IIR_filter_design_sos(zf, zwidth, ztransition, SampleFreq, 40, 0.01)
+        ZFilter = IIRStreamFilter(sos, "filtfilt")
+        LastZ = _np.array([])
+
+    def add_z(Z):
+        nonlocal LastZ
+        Z = Z / ConvFactor
+        ZStats.add(Z)
+        ZVStats.add(_np.diff(_np.concatenate([LastZ, Z])) * SampleFreq)
+        if len(Z) > 0:
+            LastZ = Z[-1:]
+        return None
+
+    for voltage in datahandling.LeCroy.ReadWaveformBlocks(Filepath, BlockSize):
+        VoltageStats.add(voltage)
+        if zf is not None:
+            add_z(ZFilter.process(voltage))
+    if zf is not None:
+        add_z(ZFilter.flush())
+    return [VoltageStats, ZStats, ZVStats]
+
+
+def multi_calc_statistics(Filepaths, SampleFreq=None, zf=None, zwidth=10000, ztransition=10000, ConvFactors=None,
+                          VoltageRange=None, ZRange=None, ZVRange=None, NumBins=200, BlockSize=2**20,
+                          NumProcesses="Default"):
+    """
+    Calculates the statistics (see StreamingStatistics) of the voltage
+    and, optionally, of the z position and velocity over many data files.
+    Each file is read a block at a time by a pool of worker processes and
+    the statistics of the files are merged, so the memory used doesn't
+    depend on the size or number of the files.
+
+    Parameters
+    ----------
+    Filepaths : sequence
+        Sequence of filepaths of the data files, for example as found
+        by search_data_files
+    SampleFreq : float, optional
+        The sample frequency of the data files, needed to filter out z
+    zf : float, optional
+        The frequency of the z peak in the PSD, if None (the default)
+        only the statistics of the voltage are calculated
+    zwidth : float, optional
+        The width of the pass-band of the IIR filter for z
+    ztransition : float, optional
+        The width of the transition-band of the IIR filter for z
+    ConvFactors : float or sequence, optional
+        The conversion factor (in Volts/Metre) to convert z from volts to
+        metres, either one value for all the files or one value per file,
+        needed to filter out z
+    VoltageRange : tuple, optional
+        The (lower, upper) limits of the histogram of the voltage,
+        if None (the default) no histogram is made
+    ZRange : tuple, optional
+        The (lower, upper) limits of the histogram of z (m)
+    ZVRange : tuple, optional
+        The (lower, upper) limits of the histogram of the z velocity (m/s)
+    NumBins : int, optional
+        The number of bins of each histogram
+    BlockSize : int, optional
+        The number of samples read from a file at a time
+    NumProcesses : int, optional
+        The number of worker processes to use
+        defaults to the number of cpus
+
+    Returns
+    -------
+    VoltageStats : StreamingStatistics
+        The statistics of the voltage (V) of all the files
+    ZStats : StreamingStatistics
+        The statistics of the z position (m) of all the files
+        (None if zf is None)
+    ZVStats : StreamingStatistics
+        The statistics of the z velocity (m/s) of all the files
+        (None if zf is None)
+    """
+    if zf is not None and (SampleFreq is None or ConvFactors is None):
+        raise ValueError("SampleFreq and ConvFactors must be given to calculate the statistics of z")
+    if ConvFactors is None or _np.isscalar(ConvFactors):
+        ConvFactors = [ConvFactors] * len(Filepaths)
+    if len(ConvFactors) != len(Filepaths):
+        raise ValueError("ConvFactors must be a single value or contain one value per file")
+    StatsArgs = (SampleFreq, zf, zwidth, ztransition, VoltageRange, ZRange, ZVRange, NumBins, BlockSize)
+    ArgLists = [[Filepath, ConvFactor, StatsArgs] for Filepath, ConvFactor in zip(Filepaths, ConvFactors)]
+
+    Statistics = [StreamingStatistics(VoltageRange, NumBins), None, None]
+    if zf is not None:
+        Statistics[1:] = [StreamingStatistics(ZRange, NumBins), StreamingStatistics(ZVRange, NumBins)]
+    if NumProcesses == "Default":
+        NumProcesses = _cpu_count()
+    workerPool = _Pool(NumProcesses)
+    try:
+        for FileStatistics in workerPool.imap_unordered(_calc_file_statistics, ArgLists):
+            for Stats, FileStats in zip(Statistics, FileStatistics):
+                if Stats is not None:
+                    Stats.merge(FileStats)
+    finally:
+        workerPool.close()
+        workerPool.join()
+    VoltageStats, ZStats, ZVStats = Statistics
+    return VoltageStats, ZStats, ZVStats
+
+
 def calc_temp(Data_ref, Data):
     """
     Calculates the temperature of a data set relative to a reference.
@@ -694,6 +2377,45 @@ def calc_temp(Data_ref, Data):
     return T
 
 
+def _read_fit_cache(CachePath, Key):
+    """
+    Reads the result stored for Key in the results store at CachePath,
+    returns None if there is no result stored for Key.
+    """
+    if not _os.path.exists(CachePath):
+        return None
+    connection = _sqlite3.connect(CachePath, timeout=60)
+    try:
+        row = connection.execute(
+            "SELECT result FROM fits WHERE key = ?", (Key,)).fetchone()
+    except _sqlite3.OperationalError: # store exists but has no table yet
+        row = None
+    finally:
+        connection.close()
+    if row is None:
+        return None
+    return _json.loads(row[0])
+
+
+def _write_fit_cache(CachePath, Key, Result):
+    """
+    Stores Result for Key in the results store at CachePath, creating
+    the store if it does not exist. sqlite handles several processes
+    writing to the same store at once.
+    """
+    connection = _sqlite3.connect(CachePath, timeout=60)
+    try:
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS fits (key TEXT PRIMARY KEY, result TEXT)")
+            connection.execute(
+                "INSERT OR REPLACE INTO fits (key, result) VALUES (?, ?)",
+                (Key, _json.dumps(Result, default=float)))
+    finally:
+        connection.close()
+    return None
+
+
 def fit_curvefit(p0, datax, datay, function, **kwargs):
     """
     Fits the data to a function using scipy.optimise.curve_fit
@@ -785,6 +2507,39 @@ def take_closest(myList, myNumber):
         return before
 
 
+def _take_closest_index(myArray, myNumbers):
+    """
+    Vectorised version of take_closest which returns the index rather than
+    the value. Assumes myArray is sorted. Returns the index of the closest
+    value to myNumbers (or an array of indices if myNumbers is array_like).
+    If two numbers are equally close, returns the index of the smallest number.
+
+    Parameters
+    ----------
+    myArray : ndarray or TimeAxis
+        The sorted array in which to find the closest values to myNumbers
+    myNumbers : float or array_like
+        The number(s) to find the closest value to in myArray
+
+    Returns
+    -------
+    closestIndex : int or ndarray
+        The index (or indices) of the closest value(s) in myArray
+    """
+    if isinstance(myArray, TimeAxis):
+        return myArray.get_index(myNumbers)
+    myArray = _np.asarray(myArray)
+    myNumbers = _np.asarray(myNumbers)
+    pos = _np.searchsorted(myArray, myNumbers, side='left')
+    pos = _np.clip(pos, 1, len(myArray) - 1)
+    before = myArray[pos - 1]
+    after = myArray[pos]
+    closestIndex = _np.where(after - myNumbers < myNumbers - before, pos, pos - 1)
+    if closestIndex.ndim == 0:
+        return int(closestIndex)
+    return closestIndex
+
+
 def _PSD_fitting_eqn(A, OmegaTrap, gamma, omega):
     """
     The value of the fitting equation:
@@ -820,7 +2575,7 @@ def _PSD_fitting_eqn(A, OmegaTrap, gamma, omega):
     return A / ((OmegaTrap**2 - omega**2)**2 + (omega * gamma)**2)
 
 
-def fit_PSD(Data, bandwidth, NMovAve, TrapFreqGuess, AGuess=0.1e10, GammaGuess=400, MakeFig=True, ShowFig=True):
+def fit_PSD(Data, bandwidth, NMovAve, TrapFreqGuess, AGuess=0.1e10, GammaGuess=400, MakeFig=False, ShowFig=False):
     """
     Fits theory PSD to Data. Assumes highest point of PSD is the
     trapping frequency.
@@ -843,10 +2598,10 @@ def fit_PSD(Data, bandwidth, NMovAve, TrapFreqGuess, AGuess=0.1e10, GammaGuess=4
         The initial value of the Gamma parameter to use in fitting
     MakeFig : bool, optional
         Whether to construct and return the figure object showing
-        the fitting. defaults to True
+        the fitting. defaults to False
     ShowFig : bool, optional
-        Whether to show the figure object when it has been created.
-        defaults to True
+        Whether to show the figure object (it is made even if MakeFig is False).
+        defaults to False
 
     Returns
     -------
@@ -863,101 +2618,452 @@ def fit_PSD(Data, bandwidth, NMovAve, TrapFreqGuess, AGuess=0.1e10, GammaGuess=4
             - initial fit
             - final fit
     """
-    AngFreqs = 2 * _np.pi * Data.freqs
+    AngFreqs, freqs_smoothed, logPSD_smoothed, ftrap, indx_fit_lower, indx_fit_upper = \
+        _get_PSD_fit_region(Data, bandwidth, NMovAve, TrapFreqGuess)
     Angbandwidth = 2 * _np.pi * bandwidth
-    AngTrapFreqGuess = 2 * _np.pi * TrapFreqGuess
 
-    ClosestToAngTrapFreqGuess = take_closest(AngFreqs, AngTrapFreqGuess)
-    index_ftrap = _np.where(AngFreqs == ClosestToAngTrapFreqGuess)
-    ftrap = AngFreqs[index_ftrap]
+    datax = freqs_smoothed[indx_fit_lower:indx_fit_upper]
+    datay = logPSD_smoothed[indx_fit_lower:indx_fit_upper]
+
+    p0 = _np.array([AGuess, ftrap, GammaGuess])
 
-    f_fit_lower = take_closest(AngFreqs, ftrap - Angbandwidth / 2)
-    f_fit_upper = take_closest(AngFreqs, ftrap + Angbandwidth / 2)
+    Params_Fit, Params_Fit_Err = _fit_PSD_window(datax, datay, p0)
 
-    indx_fit_lower = int(_np.where(AngFreqs == f_fit_lower)[0])
-    indx_fit_upper = int(_np.where(AngFreqs == f_fit_upper)[0])
+    if MakeFig == True or ShowFig == True:
+        fig, ax = _plot_PSD_fit(AngFreqs, Data.PSD, freqs_smoothed, logPSD_smoothed,
+                                p0, Params_Fit, ftrap, Angbandwidth, ShowFig=ShowFig)
+        return Params_Fit, Params_Fit_Err, fig, ax
+    else:
+        return Params_Fit, Params_Fit_Err, None, None
 
-#    print(f_fit_lower, f_fit_upper)
-#    print(AngFreqs[indx_fit_lower], AngFreqs[indx_fit_upper])
+
+def _get_PSD_fit_region(Data, bandwidth, NMovAve, TrapFreqGuess):
+    """
+    Finds the region of the PSD of Data that fit_PSD fits to, centred
+    on the highest point within bandwidth/2 of TrapFreqGuess.
+
+    Returns
+    -------
+    AngFreqs : ndarray
+        The angular frequencies of the PSD
+    freqs_smoothed : ndarray
+        The moving average of AngFreqs
+    logPSD_smoothed : ndarray
+        The moving average of the PSD in dB
+    ftrap : float
+        The angular frequency of the highest point of the peak
+    indx_fit_lower : int
+        The index of the start of the region to fit
+    indx_fit_upper : int
+        The index of the end of the region to fit
+    """
+    AngFreqs = 2 * _np.pi * Data.freqs
+    Angbandwidth = 2 * _np.pi * bandwidth
+    AngTrapFreqGuess = 2 * _np.pi * TrapFreqGuess
+
+    ftrap = AngFreqs[_take_closest_index(AngFreqs, AngTrapFreqGuess)]
+
+    indx_fit_lower, indx_fit_upper = _take_closest_index(
+        AngFreqs, [ftrap - Angbandwidth / 2, ftrap + Angbandwidth / 2])
 
     # find highest point in region about guess for trap frequency - use that
     # as guess for trap frequency and recalculate region about the trap
     # frequency
-    index_ftrap = _np.where(Data.PSD == max(
-        Data.PSD[indx_fit_lower:indx_fit_upper]))
+    index_ftrap = indx_fit_lower + \
+        _np.argmax(Data.PSD[indx_fit_lower:indx_fit_upper])
 
     ftrap = AngFreqs[index_ftrap]
 
-#    print(ftrap)
-
-    f_fit_lower = take_closest(AngFreqs, ftrap - Angbandwidth / 2)
-    f_fit_upper = take_closest(AngFreqs, ftrap + Angbandwidth / 2)
-
-    indx_fit_lower = int(_np.where(AngFreqs == f_fit_lower)[0])
-    indx_fit_upper = int(_np.where(AngFreqs == f_fit_upper)[0])
+    indx_fit_lower, indx_fit_upper = _take_closest_index(
+        AngFreqs, [ftrap - Angbandwidth / 2, ftrap + Angbandwidth / 2])
 
     PSD_smoothed = moving_average(Data.PSD, NMovAve)
     freqs_smoothed = moving_average(AngFreqs, NMovAve)
 
     logPSD_smoothed = 10 * _np.log10(PSD_smoothed)
 
-    def calc_theory_PSD_curve_fit(freqs, A, TrapFreq, BigGamma):
-        Theory_PSD = 10 * \
-            _np.log10(_PSD_fitting_eqn(A, TrapFreq, BigGamma, freqs))
-        if A < 0 or TrapFreq < 0 or BigGamma < 0:
-            return 1e9
-        else:
-            return Theory_PSD
+    return AngFreqs, freqs_smoothed, logPSD_smoothed, ftrap, indx_fit_lower, indx_fit_upper
+
+
+def _multi_PSD_fitting_eqn(Params, omega):
+    """
+    The value of the sum of len(Params)//3 _PSD_fitting_eqn terms plus
+    a flat noise floor.
+
+    Parameters
+    ----------
+    Params : ndarray
+        [A_1, OmegaTrap_1, Gamma_1, ..., A_N, OmegaTrap_N, Gamma_N, NoiseFloor]
+    omega : ndarray
+        The angular frequencies to calculate the value of the
+        fitting equation at
+
+    Returns
+    -------
+    Value : ndarray
+        The value of the fitting equation
+    """
+    PeakParams = _np.reshape(Params[:-1], (-1, 3))
+    A, OmegaTrap, Gamma = PeakParams[:, 0, None], PeakParams[:, 1, None], PeakParams[:, 2, None]
+    return _np.sum(_PSD_fitting_eqn(A, OmegaTrap, Gamma, omega), axis=0) + Params[-1]
+
+
+def _multi_PSD_fitting_jacobian(Params, omega):
+    """
+    The jacobian of 10*log10(_multi_PSD_fitting_eqn) with respect to
+    Params. Each peak only depends on its own 3 parameters so the
+    jacobian is built one (len(omega), 3) block per peak.
+    """
+    PeakParams = _np.reshape(Params[:-1], (-1, 3))
+    A, OmegaTrap, Gamma = PeakParams[:, 0, None], PeakParams[:, 1, None], PeakParams[:, 2, None]
+    Detuning = OmegaTrap**2 - omega**2
+    Denominator = Detuning**2 + (omega * Gamma)**2
+    Total = _np.sum(A / Denominator, axis=0) + Params[-1]
+
+    Blocks = _np.empty([PeakParams.shape[0], 3, len(omega)])
+    Blocks[:, 0] = 1 / Denominator
+    Blocks[:, 1] = -4 * A * OmegaTrap * Detuning / Denominator**2
+    Blocks[:, 2] = -2 * A * omega**2 * Gamma / Denominator**2
+
+    Jacobian = _np.empty([len(omega), len(Params)])
+    Jacobian[:, :-1] = _np.reshape(Blocks, (-1, len(omega))).T
+    Jacobian[:, -1] = 1
+    return 10 / _np.log(10) * Jacobian / Total[:, None]
+
+
+def fit_multi_PSD(Data, lowerLimit, upperLimit, TrapFreqGuesses, AGuesses, GammaGuesses, NoiseFloorGuess="Default", NMovAve=1, MakeFig=False, ShowFig=False):
+    """
+    Fits the sum of several theory PSD peaks and a flat noise floor to
+    the region of the PSD of Data between lowerLimit and upperLimit in
+    a single least squares problem.
+
+    Parameters
+    ----------
+    Data : DataObject
+        data object to be fitted
+    lowerLimit : float
+        The lower frequency limit of the region to fit
+    upperLimit : float
+        The upper frequency limit of the region to fit
+    TrapFreqGuesses : array_like
+        The initial values of the trapping frequency of each peak (in Hz)
+    AGuesses : array_like
+        The initial values of the A parameter of each peak
+    GammaGuesses : array_like
+        The initial values of the Gamma parameter of each peak
+    NoiseFloorGuess : float, optional
+        The initial value of the noise floor.
+        By default the 5th percentile of the PSD in the region fitted.
+    NMovAve : integer, optional
+         amount of moving averages to take before the fitting
+    MakeFig : bool, optional
+        Whether to construct and return the figure object showing
+        the fitting. defaults to False
+    ShowFig : bool, optional
+        Whether to show the figure object (it is made even if MakeFig is False).
+        defaults to False
+
+    Returns
+    -------
+    ParamsFit : ndarray
+        Fitted parameters, one row of [A, TrappingFrequency, Gamma]
+        per peak
+    ParamsFitErr : ndarray
+        Error in fitted parameters, one row of
+        [AErr, TrappingFrequencyErr, GammaErr] per peak
+    NoiseFloor : float
+        Fitted noise floor
+    NoiseFloorErr : float
+        Error in the fitted noise floor
+    fig : matplotlib.figure.Figure object
+        figure object containing the plot
+    ax : matplotlib.axes.Axes object
+        axes with the data, the total fit and each peak's fit plotted
+    """
+    AngFreqs = 2 * _np.pi * Data.freqs
+    indx_fit_lower, indx_fit_upper = _take_closest_index(
+        Data.freqs, [lowerLimit, upperLimit])
+
+    PSD_smoothed = moving_average(Data.PSD, NMovAve)
+    freqs_smoothed = moving_average(AngFreqs, NMovAve)
+    logPSD_smoothed = 10 * _np.log10(PSD_smoothed)
 
     datax = freqs_smoothed[indx_fit_lower:indx_fit_upper]
     datay = logPSD_smoothed[indx_fit_lower:indx_fit_upper]
 
-    p0 = _np.array([AGuess, ftrap, GammaGuess])
+    if isinstance(NoiseFloorGuess, str) and NoiseFloorGuess == "Default":
+        NoiseFloorGuess = _np.percentile(PSD_smoothed[indx_fit_lower:indx_fit_upper], 5)
+
+    p0 = _np.column_stack([AGuesses, 2 * _np.pi * _np.asarray(TrapFreqGuesses), GammaGuesses])
+    p0 = _np.append(p0.flatten(), NoiseFloorGuess).astype(float)
+
+    def residuals(Params):
+        return 10 * _np.log10(_multi_PSD_fitting_eqn(Params, datax)) - datay
+
+    def jacobian(Params):
+        return _multi_PSD_fitting_jacobian(Params, datax)
+
+    result = _least_squares(residuals, p0, jac=jacobian, bounds=(0, _np.inf),
+                            x_scale='jac')
+    if not result.success:
+        raise RuntimeError("Optimal parameters not found: " + result.message)
+
+    # covariance from the jacobian at the solution (as curve_fit does), the
+    # columns are normalised first as A and Omega differ by ~10 orders of magnitude
+    ColumnNorms = _np.linalg.norm(result.jac, axis=0)
+    ColumnNorms[ColumnNorms == 0] = 1
+    NormedCov = _np.linalg.pinv(_np.dot((result.jac / ColumnNorms).T, result.jac / ColumnNorms))
+    DegreesOfFreedom = max(len(datay) - len(p0), 1)
+    Cov = NormedCov / _np.outer(ColumnNorms, ColumnNorms) * \
+        2 * result.cost / DegreesOfFreedom
+    Errors = _np.sqrt(_np.absolute(_np.diag(Cov)))
+
+    Params_Fit = _np.reshape(result.x[:-1], (-1, 3))
+    Params_Fit_Err = _np.reshape(Errors[:-1], (-1, 3))
+
+    if MakeFig == True or ShowFig == True:
+        fig = _plt.figure()
+        ax = fig.add_subplot(111)
+        ax.plot(AngFreqs / (2 * _np.pi), Data.PSD,
+                color="darkblue", label="Raw PSD Data", alpha=0.5)
+        ax.plot(freqs_smoothed / (2 * _np.pi), PSD_smoothed,
+                color='blue', label="smoothed", linewidth=1.5)
+        for i, PeakParams in enumerate(Params_Fit):
+            ax.plot(datax / (2 * _np.pi),
+                    _PSD_fitting_eqn(PeakParams[0], PeakParams[1], PeakParams[2], datax),
+                    '--', alpha=0.7, label="peak {}".format(i))
+        ax.plot(datax / (2 * _np.pi), _np.full(len(datax), result.x[-1]),
+                ':', color="grey", label="noise floor")
+        ax.plot(datax / (2 * _np.pi), _multi_PSD_fitting_eqn(result.x, datax),
+                color="red", label="fitted vals")
+        ax.set_xlim([lowerLimit, upperLimit])
+        ax.set_ylim([min(PSD_smoothed[indx_fit_lower:indx_fit_upper]),
+                     2 * max(PSD_smoothed[indx_fit_lower:indx_fit_upper])])
+        ax.semilogy()
+        ax.legend(loc="best")
+        ax.set_xlabel("Frequency (Hz)")
+        ax.set_ylabel("$S_{xx}$ ($v^2/Hz$)")
+        if ShowFig == True:
+            _plt.show()
+        return Params_Fit, Params_Fit_Err, result.x[-1], Errors[-1], fig, ax
+    else:
+        return Params_Fit, Params_Fit_Err, result.x[-1], Errors[-1], None, None
+
+
+def _calc_theory_PSD_curve_fit(freqs, A, TrapFreq, BigGamma):
+    """
+    The fitting equation in dB (10*log10(_PSD_fitting_eqn)) as fitted
+    by curve_fit, returns a large value for unphysical (negative) parameters.
+    """
+    Theory_PSD = 10 * \
+        _np.log10(_PSD_fitting_eqn(A, TrapFreq, BigGamma, freqs))
+    if A < 0 or TrapFreq < 0 or BigGamma < 0:
+        return 1e9
+    else:
+        return Theory_PSD
+
+
+def _fit_PSD_window(datax, datay, p0):
+    """
+    Fits the theory PSD to a window of the (log) PSD.
+
+    Parameters
+    ----------
+    datax : ndarray
+        The angular frequencies of the window to fit
+    datay : ndarray
+        The PSD in dB (10*log10(PSD)) of the window to fit
+    p0 : array_like
+        The initial values [A, OmegaTrap, Gamma] to start the fit from
+
+    Returns
+    -------
+    ParamsFit - Fitted parameters:
+        [A, TrappingFrequency, Gamma]
+    ParamsFitErr - Error in fitted parameters:
+        [AErr, TrappingFrequencyErr, GammaErr]
+    """
+    return fit_curvefit(p0, datax, datay, _calc_theory_PSD_curve_fit)
+
+
+def _plot_PSD_fit(AngFreqs, PSD, freqs_smoothed, logPSD_smoothed, p0, Params_Fit, ftrap, Angbandwidth, ShowFig=True):
+    """
+    Plots the raw and smoothed PSD along with the theory PSD for the
+    initial and fitted parameters.
+
+    Returns
+    -------
+    fig : matplotlib.figure.Figure object
+        figure object containing the plot
+    ax : matplotlib.axes.Axes object
+        axes with the data plotted of the:
+            - initial data
+            - smoothed data
+            - initial fit
+            - final fit
+    """
+    fig = _plt.figure()
+    ax = fig.add_subplot(111)
+
+    PSDTheory_fit_initial = 10 * _np.log10(
+        _PSD_fitting_eqn(p0[0], p0[1],
+                         p0[2], freqs_smoothed))
+
+    PSDTheory_fit = 10 * _np.log10(
+        _PSD_fitting_eqn(Params_Fit[0],
+                         Params_Fit[1],
+                         Params_Fit[2],
+                         freqs_smoothed))
+
+    ax.plot(AngFreqs / (2 * _np.pi), PSD,
+            color="darkblue", label="Raw PSD Data", alpha=0.5)
+    ax.plot(freqs_smoothed / (2 * _np.pi), 10**(logPSD_smoothed / 10),
+            color='blue', label="smoothed", linewidth=1.5)
+    ax.plot(freqs_smoothed / (2 * _np.pi), 10**(PSDTheory_fit_initial / 10),
+            '--', alpha=0.7, color="purple", label="initial vals")
+    ax.plot(freqs_smoothed / (2 * _np.pi), 10**(PSDTheory_fit / 10),
+            color="red", label="fitted vals")
+    ax.set_xlim([(ftrap - 5 * Angbandwidth) / (2 * _np.pi),
+                 (ftrap + 5 * Angbandwidth) / (2 * _np.pi)])
+    ax.plot([(ftrap - Angbandwidth) / (2 * _np.pi), (ftrap - Angbandwidth) / (2 * _np.pi)],
+            [min(10**(logPSD_smoothed / 10)),
+             max(10**(logPSD_smoothed / 10))], '--',
+            color="grey")
+    ax.plot([(ftrap + Angbandwidth) / (2 * _np.pi), (ftrap + Angbandwidth) / (2 * _np.pi)],
+            [min(10**(logPSD_smoothed / 10)),
+             max(10**(logPSD_smoothed / 10))], '--',
+            color="grey")
+    ax.semilogy()
+    ax.legend(loc="best")
+    ax.set_xlabel("Frequency (Hz)")
+    ax.set_ylabel("$S_{xx}$ ($v^2/Hz$)")
+    if ShowFig == True:
+        _plt.show()
+    return fig, ax
+
+
+def _print_fit_params(Params, ParamsErr):
+    """
+    Prints the fitted A, trap frequency and Gamma and thier percentage errors.
+    """
+    print("\n")
+    print("A: {} +- {}% ".format(Params[0],
+                                 ParamsErr[0] / Params[0] * 100))
+    print(
+        "Trap Frequency: {} +- {}% ".format(Params[1], ParamsErr[1] / Params[1] * 100))
+    print(
+        "Big Gamma: {} +- {}% ".format(Params[2], ParamsErr[2] / Params[2] * 100))
+    return None
+
+
+def find_PSD_peaks(freqs, PSD):
+    """
+    Finds every peak in a PSD in a single vectorised pass and calculates
+    the properties of each one.
+
+    Parameters
+    ----------
+    freqs : ndarray
+        The (sorted, evenly spaced) frequencies of the PSD
+    PSD : ndarray
+        The PSD
+
+    Returns
+    -------
+    PeakTable : pandas.DataFrame
+        Table containing a row for every peak, sorted by frequency,
+        with the columns:
+            Index : index of the highest point of the peak in freqs/PSD
+            Freq : frequency of the peak, interpolated between bins by
+                fitting a parabola to the log of the 3 highest points
+            Height : value of the PSD at the highest point of the peak
+            Prominence : height of the peak above the higher of its 2 bases
+            FWHM : full width of the peak at half its prominence,
+                linearly interpolated between bins
+            LeftFreq : frequency of the left half-maximum crossing
+            RightFreq : frequency of the right half-maximum crossing
+    """
+    Indices, _ = scipy.signal.find_peaks(PSD)
+    Prominences, LeftBases, RightBases = scipy.signal.peak_prominences(
+        PSD, Indices)
+    _, _, LeftIPs, RightIPs = scipy.signal.peak_widths(
+        PSD, Indices, rel_height=0.5,
+        prominence_data=(Prominences, LeftBases, RightBases))
+    BinIndices = _np.arange(len(freqs))
+    LeftFreqs = _np.interp(LeftIPs, BinIndices, freqs)
+    RightFreqs = _np.interp(RightIPs, BinIndices, freqs)
+
+    # parabolic interpolation of the log PSD about each maximum
+    # (find_peaks never returns the first or last point so i-1 and i+1 exist)
+    with _np.errstate(divide='ignore', invalid='ignore'):
+        logPSD_before = _np.log(PSD[Indices - 1])
+        logPSD_peak = _np.log(PSD[Indices])
+        logPSD_after = _np.log(PSD[Indices + 1])
+        Curvature = logPSD_before - 2 * logPSD_peak + logPSD_after
+        Offset = 0.5 * (logPSD_before - logPSD_after) / Curvature
+    Offset = _np.where(_np.isfinite(Offset), _np.clip(Offset, -0.5, 0.5), 0)
+    BinWidths = freqs[Indices + 1] - freqs[Indices]
+    PeakFreqs = freqs[Indices] + Offset * BinWidths
+
+    PeakTable = _pd.DataFrame({"Index": Indices,
+                               "Freq": PeakFreqs,
+                               "Height": PSD[Indices],
+                               "Prominence": Prominences,
+                               "FWHM": RightFreqs - LeftFreqs,
+                               "LeftFreq": LeftFreqs,
+                               "RightFreq": RightFreqs},
+                              columns=["Index", "Freq", "Height", "Prominence",
+                                       "FWHM", "LeftFreq", "RightFreq"])
+    return PeakTable
+
+
+def _get_highest_peak(PeakTable, lowerFreq, upperFreq):
+    """
+    Returns the row of PeakTable (as produced by find_PSD_peaks) of the
+    highest peak between lowerFreq and upperFreq, or None if there
+    is no peak in that range.
+    """
+    PeakFreqs = PeakTable.Freq.values
+    lowerPos, upperPos = _np.searchsorted(PeakFreqs, [lowerFreq, upperFreq])
+    if lowerPos == upperPos:
+        return None
+    HighestPos = lowerPos + _np.argmax(PeakTable.Height.values[lowerPos:upperPos])
+    return PeakTable.iloc[HighestPos]
+
 
-    Params_Fit, Params_Fit_Err = fit_curvefit(p0,
-                                              datax, datay, calc_theory_PSD_curve_fit)
+def _get_peak_seed(PeakTable, lowerFreq, upperFreq):
+    """
+    Finds the highest peak between lowerFreq and upperFreq in PeakTable
+    (as produced by find_PSD_peaks) and approximates its central frequency,
+    A and Gamma (from the FWHM) for use as initial values in fitting.
 
-    if MakeFig == True:
-        fig = _plt.figure()
-        ax = fig.add_subplot(111)
+    Parameters
+    ----------
+    PeakTable : pandas.DataFrame
+        The table of peaks in the PSD
+    lowerFreq : float
+        The frequency to start looking for the peak from
+    upperFreq : float
+        The frequency to stop looking for the peak at
 
-        PSDTheory_fit_initial = 10 * _np.log10(
-            _PSD_fitting_eqn(p0[0], p0[1],
-                             p0[2], freqs_smoothed))
+    Returns
+    -------
+    CentralFreq : float
+        The frequency of the peak
+    approx_A : float
+        Approximate value of the A parameter
+    approx_Gamma : float
+        Approximate value of the Gamma parameter
+    Returns None instead if there is no peak in the range.
+    """
+    Peak = _get_highest_peak(PeakTable, lowerFreq, upperFreq)
+    if Peak is None:
+        return None
 
-        PSDTheory_fit = 10 * _np.log10(
-            _PSD_fitting_eqn(Params_Fit[0],
-                             Params_Fit[1],
-                             Params_Fit[2],
-                             freqs_smoothed))
+    approx_A = Peak.Height * 1e16  # 1e16 was calibrated for a number of saves to be approximately the correct conversion factor between the height of the PSD and the A factor in the fitting
 
-        ax.plot(AngFreqs / (2 * _np.pi), Data.PSD,
-                color="darkblue", label="Raw PSD Data", alpha=0.5)
-        ax.plot(freqs_smoothed / (2 * _np.pi), 10**(logPSD_smoothed / 10),
-                color='blue', label="smoothed", linewidth=1.5)
-        ax.plot(freqs_smoothed / (2 * _np.pi), 10**(PSDTheory_fit_initial / 10),
-                '--', alpha=0.7, color="purple", label="initial vals")
-        ax.plot(freqs_smoothed / (2 * _np.pi), 10**(PSDTheory_fit / 10),
-                color="red", label="fitted vals")
-        ax.set_xlim([(ftrap - 5 * Angbandwidth) / (2 * _np.pi),
-                     (ftrap + 5 * Angbandwidth) / (2 * _np.pi)])
-        ax.plot([(ftrap - Angbandwidth) / (2 * _np.pi), (ftrap - Angbandwidth) / (2 * _np.pi)],
-                [min(10**(logPSD_smoothed / 10)),
-                 max(10**(logPSD_smoothed / 10))], '--',
-                color="grey")
-        ax.plot([(ftrap + Angbandwidth) / (2 * _np.pi), (ftrap + Angbandwidth) / (2 * _np.pi)],
-                [min(10**(logPSD_smoothed / 10)),
-                 max(10**(logPSD_smoothed / 10))], '--',
-                color="grey")
-        ax.semilogy()
-        ax.legend(loc="best")
-        ax.set_xlabel("Frequency (Hz)")
-        ax.set_ylabel("$S_{xx}$ ($v^2/Hz$)")
-        if ShowFig == True:
-            _plt.show()
-        return Params_Fit, Params_Fit_Err, fig, ax
-    else:
-        return Params_Fit, Params_Fit_Err, None, None
+    approx_Gamma = Peak.FWHM/4
+    return Peak.Freq, approx_A, approx_Gamma
 
 
 def extract_parameters(Pressure, PressureErr, A, AErr, Gamma0, Gamma0Err):
@@ -1031,6 +3137,9 @@ def get_ZXY_freqs(Data, zfreq, xfreq, yfreq, bandwidth=5000):
     frequencies by finding the highest peak in the PSD "close to" the
     approximate peak frequency. By "close to" I mean within the range:
     approxFreq - bandwidth/2 to approxFreq + bandwidth/2
+    The peaks are looked up in the DataObject's table of peaks (see
+    DataObject.get_peaks) and so the frequencies returned are interpolated
+    between the bins of the PSD.
 
     Parameters
     ----------
@@ -1051,34 +3160,91 @@ def get_ZXY_freqs(Data, zfreq, xfreq, yfreq, bandwidth=5000):
     trapfreqs : list
         List containing the trap frequencies in the following order (z, x, y)
     """
+    PeakTable = Data.get_peaks()
     trapfreqs = []
     for freq in [zfreq, xfreq, yfreq]:
-        z_f_fit_lower = take_closest(Data.freqs, freq - bandwidth / 2)
-        z_f_fit_upper = take_closest(Data.freqs, freq + bandwidth / 2)
-        z_indx_fit_lower = int(_np.where(Data.freqs == z_f_fit_lower)[0])
-        z_indx_fit_upper = int(_np.where(Data.freqs == z_f_fit_upper)[0])
-
-        z_index_ftrap = _np.where(Data.PSD == max(
-            Data.PSD[z_indx_fit_lower:z_indx_fit_upper]))
-        # find highest point in region about guess for trap frequency
-        # use that as guess for trap frequency and recalculate region
-        # about the trap frequency
-        z_ftrap = Data.freqs[z_index_ftrap]
+        Peak = _get_highest_peak(PeakTable, freq - bandwidth / 2, freq + bandwidth / 2)
+        if Peak is not None:
+            z_ftrap = Peak.Freq
+        else:
+            # no local maximum in range (e.g. it's on a slope), fall back
+            # to the highest point in the region
+            z_indx_fit_lower, z_indx_fit_upper = _take_closest_index(
+                Data.freqs, [freq - bandwidth / 2, freq + bandwidth / 2])
+            z_ftrap = Data.freqs[z_indx_fit_lower +
+                                 _np.argmax(Data.PSD[z_indx_fit_lower:z_indx_fit_upper])]
         trapfreqs.append(z_ftrap)
     return trapfreqs
 
 
+def calc_decimation_factor(SampleFreq, MaxFreq, PassbandFraction=0.8):
+    """
+    Calculates the largest integer factor a signal can be decimated by
+    (with decimate_signal) while keeping all frequencies up to MaxFreq
+    clear of the anti-aliasing filter's transition band.
+
+    Parameters
+    ----------
+    SampleFreq : float
+        The sample frequency of the signal
+    MaxFreq : float
+        The highest frequency of interest in the signal, e.g. the upper
+        edge of the highest band to be filtered out afterwards.
+    PassbandFraction : float, optional
+        The fraction of the new Nyquist frequency the anti-aliasing filter
+        passes without attenuation, MaxFreq is kept below this.
+        defaults to 0.8 which suits the filter used by
+        scipy.signal.resample_poly.
+
+    Returns
+    -------
+    DecimationFactor : int
+        The factor to decimate the signal by, 1 if it cannot be decimated
+    """
+    DecimationFactor = int(_np.floor(PassbandFraction * SampleFreq / (2 * MaxFreq)))
+    return max(DecimationFactor, 1)
+
+
+def decimate_signal(Signal, DecimationFactor):
+    """
+    Reduces the sample rate of a signal by an integer factor using
+    polyphase resampling (scipy.signal.resample_poly), which low-pass
+    filters the signal before sub-sampling it so that noise above the
+    new Nyquist frequency is not aliased into the remaining band. The
+    filter has zero phase, so element i of the output lines up with
+    element i*DecimationFactor of the input.
+
+    Parameters
+    ----------
+    Signal : ndarray
+        Signal to be decimated
+    DecimationFactor : int
+        The factor to reduce the sample rate by
+
+    Returns
+    -------
+    DecimatedSignal : ndarray
+        The decimated signal, with ceil(len(Signal)/DecimationFactor)
+        elements.
+    """
+    if DecimationFactor == 1:
+        return _np.asarray(Signal)
+    return scipy.signal.resample_poly(Signal, 1, DecimationFactor)
+
+
 def get_ZXY_data(Data, zf, xf, yf, FractionOfSampleFreq=1,
                  zwidth=10000, xwidth=5000, ywidth=5000,
                  ztransition=10000, xtransition=5000, ytransition=5000,
                  filterImplementation="filtfilt",
                  timeStart="Default", timeEnd="Default",
-                 ShowFig=True):
+                 NumChunks=1, ShowFig=False):
     """
     Given a Data object and the frequencies of the z, x and y peaks (and some
     optional parameters for the created filters) this function extracts the
     individual z, x and y signals (in volts) by creating IIR filters and filtering
-    the Data.
+    the Data. The filters are designed as second-order sections by an
+    IIRFilterBank, so filters already designed for the same frequencies
+    and sample frequency are reused.
 
     Parameters
     ----------
@@ -1091,14 +3257,17 @@ def get_ZXY_data(Data, zf, xf, yf, FractionOfSampleFreq=1,
         The frequency of the x peak in the PSD
     yf : float
         The frequency of the y peak in the PSD
-    FractionOfSampleFreq : integer, optional
-        The fraction of the sample frequency to sub-sample the data by.
+    FractionOfSampleFreq : integer or "Auto", optional
+        The fraction of the sample frequency to decimate the data by (see
+        decimate_signal) before filtering it.
         This sometimes needs to be done because a filter with the appropriate
         frequency response may not be generated using the sample rate at which
         the data was taken. Increasing this number means the x, y and z signals
         produced by this function will be sampled at a lower rate but a higher
         number means a higher chance that the filter produced will have a nice
-        frequency response.
+        frequency response. If "Auto" the largest factor that keeps the upper
+        edge of the highest filter's transition band below the new Nyquist
+        frequency is used (see calc_decimation_factor).
     zwidth : float, optional
         The width of the pass-band of the IIR filter to be generated to
         filter Z.
@@ -1118,15 +3287,19 @@ def get_ZXY_data(Data, zf, xf, yf, FractionOfSampleFreq=1,
         The width of the transition-band of the IIR filter to be generated to
         filter Y.
     filterImplementation : string, optional
-        filtfilt or lfilter - use scipy.filtfilt or lfilter
+        filtfilt or lfilter - use scipy.sosfiltfilt or sosfilt
         default: filtfilt
     timeStart : float, optional
         Starting time for filtering
     timeEnd : float, optional
         Ending time for filtering
+    NumChunks : int, optional
+        If greater than 1 the filtfilt filtering of each of z, x and y is
+        split into this many overlapping chunks which are filtered in
+        parallel (see chunked_sosfiltfilt), for very long data.
     ShowFig : bool, optional
         If True - plot unfiltered and filtered PSD for z, x and y.
-        If False - don't plot anything
+        If False - don't plot anything (the default)
 
     Returns
     -------
@@ -1144,62 +3317,31 @@ def get_ZXY_data(Data, zf, xf, yf, FractionOfSampleFreq=1,
     if timeEnd == "Default":
         timeEnd = Data.time[-1]
 
-    StartIndex = list(Data.time).index(take_closest(Data.time, timeStart))
-    EndIndex = list(Data.time).index(take_closest(Data.time, timeEnd))
-
-    SAMPLEFREQ = Data.SampleFreq / FractionOfSampleFreq
-
-    if filterImplementation == "filtfilt":
-        ApplyFilter = scipy.signal.filtfilt
-    elif filterImplementation == "lfilter":
-        ApplyFilter = scipy.signal.lfilter
-    else:
-        raise ValueError("filterImplementation must be one of [filtfilt, lfilter] you entered: {}".format(
-            filterImplementation))
-
-    input_signal = Data.voltage[StartIndex: EndIndex][0::FractionOfSampleFreq]
-
-    bZ, aZ = IIRFilterDesign(zf, zwidth, ztransition, SAMPLEFREQ, GainStop=100)
-
-    zdata = ApplyFilter(bZ, aZ, input_signal)
-
-    if(_np.isnan(zdata).any()):
-        raise ValueError(
-            "Value Error: FractionOfSampleFreq must be higher, a sufficiently small sample frequency should be used to produce a working IIR filter.")
+    StartIndex, EndIndex = _take_closest_index(Data.time, [timeStart, timeEnd])
 
-    bX, aX = IIRFilterDesign(xf, xwidth, xtransition, SAMPLEFREQ, GainStop=100)
+    if FractionOfSampleFreq == "Auto":
+        MaxFreq = max(zf + zwidth / 2 + ztransition,
+                      xf + xwidth / 2 + xtransition,
+                      yf + ywidth / 2 + ytransition)
+        FractionOfSampleFreq = calc_decimation_factor(Data.SampleFreq, MaxFreq)
 
-    xdata = ApplyFilter(bX, aX, input_signal)
+    SAMPLEFREQ = Data.SampleFreq / FractionOfSampleFreq
 
-    if(_np.isnan(xdata).any()):
-        raise ValueError(
-            "Value Error: FractionOfSampleFreq must be higher, a sufficiently small sample frequency should be used to produce a working IIR filter.")
+    input_signal = decimate_signal(Data.voltage[StartIndex: EndIndex], FractionOfSampleFreq)
 
-    bY, aY = IIRFilterDesign(yf, ywidth, ytransition, SAMPLEFREQ, GainStop=100)
+    FilterBank = IIRFilterBank([zf, xf, yf], [zwidth, xwidth, ywidth],
+                               [ztransition, xtransition, ytransition],
+                               SAMPLEFREQ, GainStop=100)
 
-    ydata = ApplyFilter(bY, aY, input_signal)
+    zdata, xdata, ydata = FilterBank.filter(input_signal, filterImplementation, NumChunks)
 
-    if(_np.isnan(ydata).any()):
+    if(_np.isnan(zdata).any() or _np.isnan(xdata).any() or _np.isnan(ydata).any()):
         raise ValueError(
             "Value Error: FractionOfSampleFreq must be higher, a sufficiently small sample frequency should be used to produce a working IIR filter.")
 
     if ShowFig == True:
-        NPerSegment = len(Data.time)
-        if NPerSegment > 1e5:
-            NPerSegment = int(1e5)
-        f, PSD = scipy.signal.welch(
-            input_signal, SAMPLEFREQ, nperseg=NPerSegment)
-        f_z, PSD_z = scipy.signal.welch(zdata, SAMPLEFREQ, nperseg=NPerSegment)
-        f_y, PSD_y = scipy.signal.welch(ydata, SAMPLEFREQ, nperseg=NPerSegment)
-        f_x, PSD_x = scipy.signal.welch(xdata, SAMPLEFREQ, nperseg=NPerSegment)
-        _plt.plot(f, PSD)
-        _plt.plot(f_z, PSD_z, label="z")
-        _plt.plot(f_x, PSD_x, label="x")
-        _plt.plot(f_y, PSD_y, label="y")
-        _plt.legend(loc="best")
-        _ply.semilogy
-        _plt.xlim([zf - zwidth - ztransition, yf + ywidth + ytransition])
-        _plt.show()
+        plot_ZXY_PSDs(input_signal, zdata, xdata, ydata, SAMPLEFREQ,
+                      xlim=[zf - zwidth - ztransition, yf + ywidth + ytransition])
 
     timedata = Data.time[StartIndex: EndIndex][0::FractionOfSampleFreq]
     return zdata, xdata, ydata, timedata
@@ -1208,12 +3350,13 @@ def get_ZXY_data(Data, zf, xf, yf, FractionOfSampleFreq=1,
 def get_ZXY_data_IFFT(Data, zf, xf, yf,
                       zwidth=10000, xwidth=5000, ywidth=5000,
                       timeStart="Default", timeEnd="Default",
-                      ShowFig=True):
+                      EdgeWidth=0, ShowFig=False):
     """
     Given a Data object and the frequencies of the z, x and y peaks (and some
     optional parameters for the created filters) this function extracts the
-    individual z, x and y signals (in volts) by creating IIR filters and filtering
-    the Data.
+    individual z, x and y signals (in volts) by taking a single FFT of the
+    data and transforming the bins in the band about each peak back to the
+    time domain (see multi_IFFT_filter).
 
     Parameters
     ----------
@@ -1239,9 +3382,12 @@ def get_ZXY_data_IFFT(Data, zf, xf, yf,
         Starting time for filtering
     timeEnd : float, optional
         Ending time for filtering
+    EdgeWidth : float, optional
+        Width (in Hz) of a raised-cosine roll-off outside the edges of
+        each band, 0 gives a sharp cut-off. default: 0
     ShowFig : bool, optional
         If True - plot unfiltered and filtered PSD for z, x and y.
-        If False - don't plot anything
+        If False - don't plot anything (the default)
 
     Returns
     -------
@@ -1259,55 +3405,93 @@ def get_ZXY_data_IFFT(Data, zf, xf, yf,
     if timeEnd == "Default":
         timeEnd = Data.time[-1]
 
-    StartIndex = list(Data.time).index(take_closest(Data.time, timeStart))
-    EndIndex = list(Data.time).index(take_closest(Data.time, timeEnd))
+    StartIndex, EndIndex = _take_closest_index(Data.time, [timeStart, timeEnd])
 
     SAMPLEFREQ = Data.SampleFreq
 
     input_signal = Data.voltage[StartIndex: EndIndex]
 
-    zdata = IFFT_filter(input_signal, SAMPLEFREQ, zf -
-                        zwidth / 2, zf + zwidth / 2)
-
-    xdata = IFFT_filter(input_signal, SAMPLEFREQ, xf -
-                        zwidth / 2, xf + zwidth / 2)
-
-    ydata = IFFT_filter(input_signal, SAMPLEFREQ, yf -
-                        zwidth / 2, yf + zwidth / 2)
+    zdata, xdata, ydata = multi_IFFT_filter(
+        input_signal, SAMPLEFREQ,
+        [zf - zwidth / 2, xf - xwidth / 2, yf - ywidth / 2],
+        [zf + zwidth / 2, xf + xwidth / 2, yf + ywidth / 2],
+        EdgeWidth)
 
     if ShowFig == True:
-        NPerSegment = len(Data.time)
-        if NPerSegment > 1e5:
-            NPerSegment = int(1e5)
-        f, PSD = scipy.signal.welch(
-            input_signal, SAMPLEFREQ, nperseg=NPerSegment)
-        f_z, PSD_z = scipy.signal.welch(zdata, SAMPLEFREQ, nperseg=NPerSegment)
-        f_y, PSD_y = scipy.signal.welch(ydata, SAMPLEFREQ, nperseg=NPerSegment)
-        f_x, PSD_x = scipy.signal.welch(xdata, SAMPLEFREQ, nperseg=NPerSegment)
-        _plt.plot(f, PSD)
-        _plt.plot(f_z, PSD_z, label="z")
-        _plt.plot(f_x, PSD_x, label="x")
-        _plt.plot(f_y, PSD_y, label="y")
-        _plt.legend(loc="best")
-        _plt.xlim([zf - zwidth, yf + ywidth])
-        _plt.xlabel('Frequency (Hz)')
-        _plt.ylabel(r'$S_{xx}$')
-        _plt.semilogy()
-        _plt.title("filepath = %s" % (Data.filepath))
-        _plt.show()
+        plot_ZXY_PSDs(input_signal, zdata, xdata, ydata, SAMPLEFREQ,
+                      xlim=[zf - zwidth, yf + ywidth], title="filepath = %s" % (Data.filepath))
 
     timedata = Data.time[StartIndex: EndIndex]
     return zdata, xdata, ydata, timedata
 
 
+def plot_ZXY_PSDs(Signal, zdata, xdata, ydata, SampleFreq, xlim="Default", title=None, ShowFig=True):
+    """
+    Plots the PSD of a signal together with the PSDs of the z, x and y
+    signals filtered out of it (e.g. by get_ZXY_data or get_ZXY_data_IFFT),
+    to check the filtering.
+
+    Parameters
+    ----------
+    Signal : ndarray
+        The signal the z, x and y signals were filtered from
+    zdata : ndarray
+        The z signal
+    xdata : ndarray
+        The x signal
+    ydata : ndarray
+        The y signal
+    SampleFreq : float
+        The sample frequency of the signals
+    xlim : array_like, optional
+        The x limits of the plot
+    title : string, optional
+        The title of the plot
+    ShowFig : bool, optional
+        Whether to show the figure or not
+
+    Returns
+    -------
+    fig : matplotlib.figure.Figure object
+        The figure object created
+    ax : matplotlib.axes.Axes object
+        The subplot object created
+    """
+    NPerSegment = len(Signal)
+    if NPerSegment > 1e5:
+        NPerSegment = int(1e5)
+    fig = _plt.figure()
+    ax = fig.add_subplot(111)
+    f, PSD = scipy.signal.welch(Signal, SampleFreq, nperseg=NPerSegment)
+    ax.plot(f, PSD)
+    for data, label in zip([zdata, xdata, ydata], ["z", "x", "y"]):
+        f, PSD = scipy.signal.welch(data, SampleFreq, nperseg=NPerSegment)
+        ax.plot(f, PSD, label=label)
+    ax.legend(loc="best")
+    if xlim != "Default":
+        ax.set_xlim(xlim)
+    ax.set_xlabel('Frequency (Hz)')
+    ax.set_ylabel(r'$S_{xx}$')
+    ax.semilogy()
+    if title is not None:
+        ax.set_title(title)
+    if ShowFig == True:
+        _plt.show()
+    return fig, ax
+
+
 def animate(zdata, xdata, ydata,
             conversionFactor, timedata,
             BoxSize,
-            timeSteps=100, filename="particle"):
+            timeSteps=100, filename="particle", NumProcesses="Default"):
     """
     Animates the particle's motion given the z, x and y signal (in Volts)
     and the conversion factor (to convert between V and nm).
 
+    The artists are created once and updated for each frame, and the frames
+    are drawn to image buffers by a pool of worker processes and piped to
+    ffmpeg in order as they arrive.
+
     Parameters
     ----------
     zdata : ndarray
@@ -1326,159 +3510,704 @@ def animate(zdata, xdata, ydata,
         Number of time steps to animate
     filename : string, optional
         filename to create the mp4 under (<filename>.mp4)
+    NumProcesses : int, optional
+        The number of processes to draw the frames with, defaults to
+        the number of CPUs
 
     """
-    timePerFrame = 0.203
-    print("This will take ~ {} minutes".format(timePerFrame * timeSteps / 60))
+    import subprocess
+
+    FrameInterval = 1  # how many timesteps = 1 frame in animation
+    myFPS = 7
+    myBitrate = 1e6
 
     conv = conversionFactor * 1e-9
+    NumSamples = min(timeSteps + 2, len(zdata))
+    Positions = _np.array([_np.asarray(xdata[:NumSamples]), _np.asarray(ydata[:NumSamples]),
+                           _np.asarray(zdata[:NumSamples])]) / conv
+    Times = _np.asarray(timedata[:NumSamples])
+    FrameIndices = _np.arange(0, timeSteps, FrameInterval)
+
+    ArgList = [Positions, Times, BoxSize]
+    Renderer = _AnimationFrameRenderer(ArgList)
+    Width, Height = Renderer.get_size()
+
+    _plt.rcParams['animation.ffmpeg_path'] = '/usr/bin/ffmpeg'
+    ffmpeg = subprocess.Popen([_plt.rcParams['animation.ffmpeg_path'], '-y', '-f', 'rawvideo', '-vcodec', 'rawvideo',
+                               '-s', '{}x{}'.format(Width, Height), '-pix_fmt', 'rgba',
+                               '-r', str(myFPS), '-i', '-', '-an', '-vcodec', 'h264',
+                               '-pix_fmt', 'yuv420p', '-b', str(int(myBitrate)),
+                               '{}.mp4'.format(filename)],
+                              stdin=subprocess.PIPE)
+
+    if NumProcesses == "Default":
+        NumProcesses = _cpu_count()
+    # a few frames per task, with at most 2 tasks per process rendered ahead
+    # of ffmpeg so that frames don't pile up in memory if ffmpeg is slower
+    Tasks = [FrameIndices[i:i + 10] for i in range(0, len(FrameIndices), 10)]
+    try:
+        if NumProcesses > 1:
+            workerPool = _Pool(NumProcesses, initializer=_init_animation_worker, initargs=(ArgList,))
+            try:
+                for Frames in _bounded_imap(workerPool, _render_animation_frames, Tasks, 2 * NumProcesses):
+                    for Frame in Frames:
+                        ffmpeg.stdin.write(Frame)
+            finally:
+                workerPool.close()
+                workerPool.join()
+        else:
+            for Task in Tasks:
+                for i in Task:
+                    print("Frame: {}".format(i), end="\r")
+                    ffmpeg.stdin.write(Renderer.render(i))
+    finally:
+        ffmpeg.stdin.close()
+        ffmpeg.wait()
+    return None
+
+
+class _AnimationFrameRenderer():
+    """
+    Draws the frames of the animation made by animate, the figure and the
+    artists are created once and are moved for each frame.
+    """
+    TrailLength = 10 # the length of the trails of the projections on the walls
+    PathLength = 15 # the length of the path drawn behind the particle
+
+    def __init__(self, ArgList):
+        """
+        ArgList contains the positions (a 3 x N array of the x, y and z
+        positions in nm), the times (in s) and the size of the box (in nm).
+        """
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from mpl_toolkits.mplot3d.axes3d import Axes3D # registers the 3d projection
+
+        self.Positions, self.Times, BoxSize = ArgList
+        self.BoxEnd = BoxSize
+
+        a = 20
+        b = 0.6 * a
+        self.fig = Figure(figsize=(a, b))
+        self.canvas = FigureCanvasAgg(self.fig)
+        ax = self.fig.add_subplot(111, projection='3d')
+        ax.set_xlabel('X (nm)')
+        ax.set_xlim([-BoxSize, BoxSize])
+        ax.set_ylabel('Y (nm)')
+        ax.set_ylim([-BoxSize, BoxSize])
+        ax.set_zlabel('Z (nm)')
+        ax.set_zlim([-BoxSize, BoxSize])
+        ax.view_init(20, -30)
+        self.ax = ax
+
+        self.particle, = ax.plot([0], [0], [0], 'o')
+        self.projections = [ax.plot([0], [0], [0], 'o', color='k', alpha=0.9)[0] for _ in range(3)]
+        self.TrailColours = _np.zeros((self.TrailLength, 4))
+        self.TrailColours[:, :3] = 0.5 # grey
+        self.TrailColours[:, 3] = 0.5 - 0.05 * _np.arange(self.TrailLength)
+        self.trails = [None, None, None] # scatters have no public way to move them in 3d, so they are re-created for each frame
+        self.trailLines = [ax.plot([0], [0], [0], color='grey')[0] for _ in range(3)]
+        self.path, = ax.plot([0], [0], [0], alpha=0.4)
+        self.title = ax.set_title("")
+        return None
+
+    def get_size(self):
+        """
+        Returns the width and height of the frames in pixels.
+        """
+        self.canvas.draw()
+        Width, Height = self.canvas.get_width_height()
+        return Width, Height
+
+    def render(self, i):
+        """
+        Moves the artists to frame i and returns the frame as RGBA bytes.
+        """
+        X, Y, Z = self.Positions[:, i]
+        BoxEnd = self.BoxEnd
+        self.title.set_text("{} us".format(self.Times[i] * 1e6))
+        _set_line_data_3d(self.particle, [X], [Y], [Z])
+        for projection, (Xp, Yp, Zp) in zip(self.projections, [(X, 0, -BoxEnd), (-BoxEnd, Y, 0), (0, BoxEnd, Z)]):
+            _set_line_data_3d(projection, [Xp], [Yp], [Zp])
+
+        j = _np.arange(self.TrailLength)
+        Xlast, Ylast, Zlast = self.Positions[:, _np.maximum(i - j, 0)]
+        Const = _np.ones(self.TrailLength)
+        TrailPositions = [(Xlast, j * 10, -BoxEnd * Const),
+                          (-BoxEnd * Const, Ylast, -j * 10),
+                          (-j * 2, BoxEnd * Const, Zlast)]
+        for k, (trailLine, Position) in enumerate(zip(self.trailLines, TrailPositions)):
+            if self.trails[k] is not None:
+                self.trails[k].remove()
+            self.trails[k] = self.ax.scatter(*Position, c=self.TrailColours, depthshade=False)
+            _set_line_data_3d(trailLine, *Position)
+
+        PathIndices = _np.clip(_np.arange(i - self.PathLength + 1, i + 2), 0, self.Positions.shape[1] - 1)
+        _set_line_data_3d(self.path, *self.Positions[:, PathIndices])
+
+        self.canvas.draw()
+        return bytes(self.canvas.buffer_rgba())
+
+
+def _bounded_imap(workerPool, function, Tasks, MaxInFlight):
+    """
+    Like workerPool.imap, returns the results of function applied to each
+    of Tasks in order, but only submits a task once fewer than MaxInFlight
+    results are waiting to be collected, so results which are consumed
+    slowly don't pile up in memory.
+    """
+    from collections import deque
+    Pending = deque()
+    for Task in Tasks:
+        Pending.append(workerPool.apply_async(function, (Task,)))
+        if len(Pending) >= MaxInFlight:
+            yield Pending.popleft().get()
+    while len(Pending) > 0:
+        yield Pending.popleft().get()
+
+
+def _set_line_data_3d(Line, X, Y, Z):
+    """
+    Moves a 3d line (as made by Axes3D.plot) to the points X, Y, Z.
+    """
+    Line.set_data(X, Y)
+    Line.set_3d_properties(Z)
+    return None
+
+
+_AnimationWorkerRenderer = None
+
+
+def _init_animation_worker(ArgList):
+    """
+    Creates the frame renderer of an animate worker process.
+    """
+    global _AnimationWorkerRenderer
+    _AnimationWorkerRenderer = _AnimationFrameRenderer(ArgList)
+    return None
+
+
+def _render_animation_frames(FrameIndices):
+    """
+    Renders frames of the animation in an animate worker process.
+    """
+    return [_AnimationWorkerRenderer.render(i) for i in FrameIndices]
+
+
+def IFFT_filter(Signal, SampleFreq, lowerFreq, upperFreq, EdgeWidth=0):
+    """
+    Filters data using fft -> zeroing out fft bins -> ifft
+
+    Parameters
+    ----------
+    Signal : ndarray
+        Signal to be filtered
+    SampleFreq : float
+        Sample frequency of signal
+    lowerFreq : float
+        Lower frequency of bandpass to allow through filter
+    upperFreq : float
+       Upper frequency of bandpass to allow through filter
+    EdgeWidth : float, optional
+        Width (in Hz) of a raised-cosine roll-off outside each edge of
+        the band, 0 gives a sharp cut-off. default: 0
+
+    Returns
+    -------
+    FilteredData : ndarray
+        Array containing the filtered data
+    """
+    return multi_IFFT_filter(Signal, SampleFreq, [lowerFreq], [upperFreq], EdgeWidth)[0]
+
+
+def multi_IFFT_filter(Signal, SampleFreq, lowerFreqs, upperFreqs, EdgeWidth=0):
+    """
+    Filters data into several frequency bands at once using a single
+    rfft -> masking the bins outside each band -> one batched irfft.
+    With EdgeWidth=0 the result is the same as the fft -> zeroing out
+    the negative frequency bins and those outside the band -> 2*ifft
+    that IFFT_filter used to do.
+
+    Parameters
+    ----------
+    Signal : ndarray
+        Signal to be filtered
+    SampleFreq : float
+        Sample frequency of signal
+    lowerFreqs : array_like
+        Lower frequency of each bandpass to allow through filter
+    upperFreqs : array_like
+       Upper frequency of each bandpass to allow through filter
+    EdgeWidth : float, optional
+        Width (in Hz) of a raised-cosine roll-off outside each edge of
+        the bands, 0 gives a sharp cut-off. default: 0
+
+    Returns
+    -------
+    FilteredData : ndarray
+        2D array containing the data filtered into each band, one
+        row per band
+    """
+    Signal = _np.asarray(Signal)
+    NumSamples = len(Signal)
+    Signalfft = _np.fft.rfft(Signal)
+    freqs = _np.fft.rfftfreq(NumSamples) * SampleFreq
+    lowerFreqs = _np.atleast_1d(lowerFreqs)[:, None]
+    upperFreqs = _np.atleast_1d(upperFreqs)[:, None]
+    if EdgeWidth > 0:
+        # distance of each bin outside of each band (negative inside)
+        Distance = _np.maximum(lowerFreqs - freqs, freqs - upperFreqs)
+        Gains = 0.5 * (1 + _np.cos(_np.pi * _np.clip(Distance / EdgeWidth, 0, 1)))
+    else:
+        Gains = (freqs >= lowerFreqs) & (freqs <= upperFreqs)
+    Gains = Gains.astype(float)
+    # as in the fft -> 2*ifft filter, the DC bin is doubled and the Nyquist bin
+    # (a negative frequency in fftfreq) is always removed
+    Gains[:, 0] *= 2
+    if NumSamples % 2 == 0:
+        Gains[:, -1] = 0
+    FilteredSignals = _np.fft.irfft(Signalfft * Gains, NumSamples, axis=1)
+    return FilteredSignals
+
+
+def IIR_filter_design(CentralFreq, bandwidth, transitionWidth, SampleFreq, GainStop=40, GainPass=0.01, output="ba"):
+    """
+    Function to calculate the coefficients of an IIR filter.
+
+    Parameters
+    ----------
+    CentralFreq : float
+        Central frequency of the IIR filter to be designed
+    bandwidth : float
+        The width of the passband to be created about the central frequency
+    transitionWidth : float
+        The width of the transition band between the pass-band and stop-band
+    SampleFreq : float
+        The sample frequency (rate) of the data to be filtered
+    GainStop : float, optional
+        The dB of attenuation within the stopband (i.e. outside the passband)
+    GainPass : float, optional
+        The dB attenuation inside the passband (ideally close to 0 for a bandpass filter)
+    output : string, optional
+        "ba" to return the transfer function coefficients or "sos" to return
+        second-order sections, which stay numerically stable for the high
+        order filters needed for narrow pass-bands. default: "ba"
+
+    Returns
+    -------
+    b : ndarray
+        coefficients multiplying the current and past inputs (feedforward coefficients)
+    a : ndarray
+        coefficients multiplying the past outputs (feedback coefficients)
+
+    or if output is "sos"
+
+    sos : ndarray
+        Array of second-order filter coefficients, with shape (n_sections, 6)
+    """
+    NyquistFreq = SampleFreq / 2
+    if (CentralFreq + bandwidth / 2 + transitionWidth > NyquistFreq):
+        raise ValueError(
+            "Need a higher Sample Frequency for this Central Freq, Bandwidth and transition Width")
+
+    CentralFreqNormed = CentralFreq / NyquistFreq
+    bandwidthNormed = bandwidth / NyquistFreq
+    transitionWidthNormed = transitionWidth / NyquistFreq
+    bandpass = [CentralFreqNormed - bandwidthNormed /
+                2, CentralFreqNormed + bandwidthNormed / 2]
+    bandstop = [CentralFreqNormed - bandwidthNormed / 2 - transitionWidthNormed,
+                CentralFreqNormed + bandwidthNormed / 2 + transitionWidthNormed]
+    if output == "sos":
+        sos = scipy.signal.iirdesign(bandpass, bandstop, GainPass, GainStop, output="sos")
+        return sos
+    b, a = scipy.signal.iirdesign(bandpass, bandstop, GainPass, GainStop)
+    return b, a
+
+
+@_lru_cache(maxsize=256)
+def _cached_IIR_filter_design_sos(CentralFreq, bandwidth, transitionWidth, SampleFreq, GainStop, GainPass):
+    """
+    IIR_filter_design with output="sos", remembering the filters already
+    designed so that they are not designed again for every call and file.
+    The arrays returned are shared between callers and must not be modified.
+    """
+    return IIR_filter_design(CentralFreq, bandwidth, transitionWidth, SampleFreq,
+                             GainStop=GainStop, GainPass=GainPass, output="sos")
+
+
+class IIRFilterBank():
+    """
+    A bank of IIR band-pass filters (e.g. one each for the z, x and y
+    signals) designed as second-order sections, which are applied to the
+    same signal together.
+
+    Filters are designed by IIR_filter_design and remembered by their
+    (CentralFreq, bandwidth, transitionWidth, SampleFreq, GainStop, GainPass)
+    so that creating a bank for another call or file with the same
+    parameters does not design the filters again.
+
+    Attributes
+    ----------
+    SampleFreq : float
+        The sample frequency (rate) of the data to be filtered
+    sos : list
+        The second-order sections of each filter in the bank
+    """
+    def __init__(self, CentralFreqs, bandwidths, transitionWidths, SampleFreq, GainStop=40, GainPass=0.01):
+        """
+        Designs (or retrieves the already designed) filters for the bank.
+
+        Parameters
+        ----------
+        CentralFreqs : array_like
+            Central frequency of each filter
+        bandwidths : array_like
+            The width of the passband of each filter
+        transitionWidths : array_like
+            The width of the transition band between the pass-band and stop-band
+            of each filter
+        SampleFreq : float
+            The sample frequency (rate) of the data to be filtered
+        GainStop : float, optional
+            The dB of attenuation within the stopband (i.e. outside the passband)
+        GainPass : float, optional
+            The dB attenuation inside the passband (ideally close to 0 for a bandpass filter)
+        """
+        self.SampleFreq = SampleFreq
+        self.sos = [_cached_IIR_filter_design_sos(float(CentralFreq), float(bandwidth),
+                                                  float(transitionWidth), float(SampleFreq),
+                                                  float(GainStop), float(GainPass)).copy()
+                    for CentralFreq, bandwidth, transitionWidth
+                    in zip(CentralFreqs, bandwidths, transitionWidths)]
+        return None
+
+    def filter(self, Signal, filterImplementation="filtfilt", NumChunks=1):
+        """
+        Filters the signal with every filter in the bank, each filter
+        is run in its own thread (or, with NumChunks > 1, each chunk of
+        each filter is run on a single pool of as many threads as CPUs).
+
+        Parameters
+        ----------
+        Signal : ndarray
+            Signal to be filtered
+        filterImplementation : string, optional
+            filtfilt or lfilter - use scipy.sosfiltfilt (zero-phase) or
+            sosfilt
+            default: filtfilt
+        NumChunks : int, optional
+            If greater than 1 (and filterImplementation is filtfilt) each
+            filter is applied in this many overlapping chunks in parallel,
+            see chunked_sosfiltfilt. Worth doing for very long signals.
+            defaults to 1
+
+        Returns
+        -------
+        FilteredSignals : ndarray
+            2D array containing the signal filtered by each filter in the
+            bank, one row per filter
+        """
+        if filterImplementation == "filtfilt" and NumChunks > 1:
+            # one pool over every (filter, chunk) pair rather than a pool per filter
+            Signal = _np.asarray(Signal)
+            Edges = _np.linspace(0, len(Signal), NumChunks + 1).astype(int)
+            Tasks = [(sos, Start, End, calc_IIR_decay_length(sos))
+                     for sos in self.sos for Start, End in zip(Edges[:-1], Edges[1:])]
+            with _ThreadPoolExecutor(max_workers=_cpu_count()) as executor:
+                FilteredChunks = list(executor.map(
+                    lambda Task: _sosfiltfilt_chunk(Task[0], Signal, *Task[1:]), Tasks))
+            return _np.array([_np.concatenate(FilteredChunks[i:i + NumChunks])
+                              for i in range(0, len(FilteredChunks), NumChunks)])
+        elif filterImplementation == "filtfilt":
+            ApplyFilter = scipy.signal.sosfiltfilt
+        elif filterImplementation == "lfilter":
+            ApplyFilter = scipy.signal.sosfilt
+        else:
+            raise ValueError("filterImplementation must be one of [filtfilt, lfilter] you entered: {}".format(
+                filterImplementation))
+        with _ThreadPoolExecutor(max_workers=len(self.sos)) as executor:
+            FilteredSignals = list(executor.map(
+                lambda sos: ApplyFilter(sos, Signal), self.sos))
+        return _np.array(FilteredSignals)
+
+    def stream_filter(self, filterImplementation="lfilter", Lookahead="Default"):
+        """
+        Creates an IIRStreamFilter which applies the filters in the bank
+        to a signal arriving in chunks.
 
-    ZBoxStart = -BoxSize  # 1/conv*(_np.mean(zdata)-0.06)
-    ZBoxEnd = BoxSize  # 1/conv*(_np.mean(zdata)+0.06)
-    XBoxStart = -BoxSize  # 1/conv*(_np.mean(xdata)-0.06)
-    XBoxEnd = BoxSize  # 1/conv*(_np.mean(xdata)+0.06)
-    YBoxStart = -BoxSize  # 1/conv*(_np.mean(ydata)-0.06)
-    YBoxEnd = BoxSize  # 1/conv*(_np.mean(ydata)+0.06)
+        Parameters
+        ----------
+        filterImplementation : string, optional
+            lfilter or filtfilt, see IIRStreamFilter
+            default: lfilter
+        Lookahead : int, optional
+            see IIRStreamFilter
 
-    FrameInterval = 1  # how many timesteps = 1 frame in animation
+        Returns
+        -------
+        StreamFilter : IIRStreamFilter
+            The stream filter
+        """
+        return IIRStreamFilter(self.sos, filterImplementation, Lookahead)
 
-    a = 20
-    b = 0.6 * a
-    myFPS = 7
-    myBitrate = 1e6
 
-    fig = _plt.figure(figsize=(a, b))
-    ax = fig.add_subplot(111, projection='3d')
-    ax.set_title("{} us".format(timedata[0] * 1e6))
-    ax.set_xlabel('X (nm)')
-    ax.set_xlim([XBoxStart, XBoxEnd])
-    ax.set_ylabel('Y (nm)')
-    ax.set_ylim([YBoxStart, YBoxEnd])
-    ax.set_zlabel('Z (nm)')
-    ax.set_zlim([ZBoxStart, ZBoxEnd])
-    ax.view_init(20, -30)
-
-    #ax.view_init(0, 0)
-
-    def setup_plot():
-        XArray = 1 / conv * xdata[0]
-        YArray = 1 / conv * ydata[0]
-        ZArray = 1 / conv * zdata[0]
-        scatter = ax.scatter(XArray, YArray, ZArray)
-        return scatter,
-
-    def animate(i):
-        # print "\r {}".format(i),
-        print("Frame: {}".format(i), end="\r")
-        ax.clear()
-        ax.view_init(20, -30)
-        ax.set_title("{} us".format(timedata[i] * 1e6))
-        ax.set_xlabel('X (nm)')
-        ax.set_xlim([XBoxStart, XBoxEnd])
-        ax.set_ylabel('Y (nm)')
-        ax.set_ylim([YBoxStart, YBoxEnd])
-        ax.set_zlabel('Z (nm)')
-        ax.set_zlim([ZBoxStart, ZBoxEnd])
-        XArray = 1 / conv * xdata[i]
-        YArray = 1 / conv * ydata[i]
-        ZArray = 1 / conv * zdata[i]
-        scatter = ax.scatter(XArray, YArray, ZArray)
-        ax.scatter([XArray], [0], [-ZBoxEnd], c='k', alpha=0.9)
-        ax.scatter([-XBoxEnd], [YArray], [0], c='k', alpha=0.9)
-        ax.scatter([0], [YBoxEnd], [ZArray], c='k', alpha=0.9)
-
-        Xx, Yx, Zx, Xy, Yy, Zy, Xz, Yz, Zz = [], [], [], [], [], [], [], [], []
-
-        for j in range(0, 30):
-
-            Xlast = 1 / conv * xdata[i - j]
-            Ylast = 1 / conv * ydata[i - j]
-            Zlast = 1 / conv * zdata[i - j]
-
-            Alpha = 0.5 - 0.05 * j
-            if Alpha > 0:
-                ax.scatter([Xlast], [0 + j * 10],
-                           [-ZBoxEnd], c='grey', alpha=Alpha)
-                ax.scatter([-XBoxEnd], [Ylast], [0 - j * 10],
-                           c='grey', alpha=Alpha)
-                ax.scatter([0 - j * 2], [YBoxEnd],
-                           [Zlast], c='grey', alpha=Alpha)
-
-                Xx.append(Xlast)
-                Yx.append(0 + j * 10)
-                Zx.append(-ZBoxEnd)
-
-                Xy.append(-XBoxEnd)
-                Yy.append(Ylast)
-                Zy.append(0 - j * 10)
-
-                Xz.append(0 - j * 2)
-                Yz.append(YBoxEnd)
-                Zz.append(Zlast)
-
-            if j < 15:
-                XCur = 1 / conv * xdata[i - j + 1]
-                YCur = 1 / conv * ydata[i - j + 1]
-                ZCur = 1 / conv * zdata[i - j + 1]
-                ax.plot([Xlast, XCur], [Ylast, YCur], [Zlast, ZCur], alpha=0.4)
-
-        ax.plot_wireframe(Xx, Yx, Zx, color='grey')
-        ax.plot_wireframe(Xy, Yy, Zy, color='grey')
-        ax.plot_wireframe(Xz, Yz, Zz, color='grey')
-
-        return scatter,
-
-    anim = _animation.FuncAnimation(fig, animate, int(
-        timeSteps / FrameInterval), init_func=setup_plot, blit=True)
+def calc_IIR_decay_length(sos, Tolerance=1e-6):
+    """
+    Calculates the number of samples after which the impulse response
+    of an IIR filter has decayed below Tolerance times its peak, i.e.
+    how far the effect of a sample (or of the initial state of the filter)
+    reaches.
 
-    _plt.rcParams['animation.ffmpeg_path'] = '/usr/bin/ffmpeg'
-    mywriter = _animation.FFMpegWriter(fps=myFPS, bitrate=myBitrate)
-    # , fps = myFPS, bitrate = myBitrate)
-    anim.save('{}.mp4'.format(filename), writer=mywriter)
-    return None
+    Parameters
+    ----------
+    sos : ndarray
+        The second-order sections of the filter
+    Tolerance : float, optional
+        The fraction of the peak of the impulse response to decay to
 
-def IFFT_filter(Signal, SampleFreq, lowerFreq, upperFreq):
+    Returns
+    -------
+    DecayLength : int
+        The length in samples of the impulse response above Tolerance
     """
-    Filters data using fft -> zeroing out fft bins -> ifft
+    _, poles, _ = scipy.signal.sos2zpk(sos)
+    MaxPoleRadius = _np.max(_np.abs(poles))
+    if MaxPoleRadius >= 1:
+        raise ValueError("The filter is unstable")
+    # estimate from the slowest decaying pole, then check the impulse response over twice that
+    NEstimate = int(_np.ceil(_np.log(Tolerance) / _np.log(MaxPoleRadius))) + 1
+    Impulse = _np.zeros(2 * NEstimate)
+    Impulse[0] = 1
+    ImpulseResponse = _np.abs(scipy.signal.sosfilt(sos, Impulse))
+    DecayLength = _np.nonzero(ImpulseResponse > Tolerance * ImpulseResponse.max())[0][-1] + 1
+    return int(DecayLength)
+
+
+def chunked_sosfiltfilt(sos, Signal, NumChunks="Default", Overlap="Default", NumThreads="Default"):
+    """
+    Applies scipy.signal.sosfiltfilt to a long signal in overlapping
+    chunks, filtered in parallel on a pool of threads (sosfilt releases the
+    GIL, so the threads run on separate cores). Each chunk is extended by
+    Overlap samples either side, which are then thrown away, so as long as
+    Overlap is longer than the decay of the filter's impulse response the
+    result matches filtering the whole signal at once to within the
+    tolerance the overlap was sized for.
 
     Parameters
     ----------
+    sos : ndarray
+        The second-order sections of the filter
     Signal : ndarray
         Signal to be filtered
-    SampleFreq : float
-        Sample frequency of signal
-    lowerFreq : float
-        Lower frequency of bandpass to allow through filter
-    upperFreq : float
-       Upper frequency of bandpass to allow through filter
+    NumChunks : int, optional
+        The number of chunks to split the signal into, defaults to the
+        number of threads
+    Overlap : int, optional
+        The number of samples each chunk is extended by on either side,
+        defaults to the decay length of the filter (calc_IIR_decay_length)
+    NumThreads : int, optional
+        The number of threads to use, defaults to the number of CPUs
 
     Returns
     -------
-    FilteredData : ndarray
-        Array containing the filtered data
+    FilteredSignal : ndarray
+        The filtered signal
+    """
+    if NumThreads == "Default":
+        NumThreads = _cpu_count()
+    if NumChunks == "Default":
+        NumChunks = NumThreads
+    if Overlap == "Default":
+        Overlap = calc_IIR_decay_length(sos)
+    Signal = _np.asarray(Signal)
+    Edges = _np.linspace(0, len(Signal), NumChunks + 1).astype(int)
+
+    with _ThreadPoolExecutor(max_workers=NumThreads) as executor:
+        FilteredChunks = list(executor.map(
+            lambda Bounds: _sosfiltfilt_chunk(sos, Signal, Bounds[0], Bounds[1], Overlap),
+            zip(Edges[:-1], Edges[1:])))
+    return _np.concatenate(FilteredChunks)
+
+
+def _sosfiltfilt_chunk(sos, Signal, Start, End, Overlap):
     """
-    print("starting fft")
-    Signalfft = scipy.fftpack.fft(Signal)
-    print("starting freq calc")
-    freqs = _np.fft.fftfreq(len(Signal)) * SampleFreq
-    print("starting bin zeroing")
-    for i, freq in enumerate(freqs):
-        if freq < lowerFreq or freq > upperFreq:
-            Signalfft[i] = 0
-    print("starting ifft")
-    FilteredSignal = 2 * scipy.fftpack.ifft(Signalfft)
-    print("done")
-    return _np.real(FilteredSignal)
+    Applies scipy.signal.sosfiltfilt to Signal[Start:End] extended by
+    Overlap samples either side (where the signal allows) and returns
+    the filtered Signal[Start:End], used by chunked_sosfiltfilt and
+    IIRFilterBank.filter.
+    """
+    PaddedStart = max(Start - Overlap, 0)
+    PaddedEnd = min(End + Overlap, len(Signal))
+    Filtered = scipy.signal.sosfiltfilt(sos, Signal[PaddedStart:PaddedEnd])
+    return Filtered[Start - PaddedStart: End - PaddedStart]
 
 
-def IIR_filter_design(CentralFreq, bandwidth, transitionWidth, SampleFreq, GainStop=40, GainPass=0.01):
+class IIRStreamFilter():
     """
-    Function to calculate the coefficients of an IIR filter.
+    Filters a signal which arrives in chunks (e.g. buffers from an
+    acquisition) with one or more IIR filters (as second-order sections),
+    keeping the state of each filter between chunks so that the output
+    doesn't depend on how the signal is split up.
+
+    The state is initialised from the first sample of the signal
+    (scipy.signal.sosfilt_zi) so there is no transient from switching
+    the filter on at the start of the signal.
+
+    With filterImplementation="lfilter" each chunk is filtered forwards
+    only (scipy.signal.sosfilt) and returned straight away. With
+    filterImplementation="filtfilt" the forward filtered signal is also
+    filtered backwards to give (close to) zero phase, like
+    scipy.signal.sosfiltfilt. As the backward pass needs the signal that
+    comes later, the last Lookahead samples are held back until the next
+    chunk (or flush), the latency is therefore bounded by Lookahead samples.
+    The backward pass is started from a steady state Lookahead samples
+    ahead of the samples returned, so the result matches filtering the
+    whole signal to within roughly the tolerance Lookahead was sized for.
+
+    Attributes
+    ----------
+    sos : list
+        The second-order sections of each filter
+    filterImplementation : string
+        lfilter or filtfilt
+    Lookahead : int
+        The number of samples held back for the backward pass (0 for lfilter)
+    """
+    def __init__(self, sos, filterImplementation="lfilter", Lookahead="Default"):
+        """
+        Parameters
+        ----------
+        sos : ndarray or list
+            The second-order sections of the filter, or a list of the
+            second-order sections of several filters (e.g. the sos
+            attribute of an IIRFilterBank)
+        filterImplementation : string, optional
+            lfilter or filtfilt
+            default: lfilter
+        Lookahead : int, optional
+            The number of samples held back for the backward pass of
+            filtfilt, defaults to the decay length of the slowest filter
+            (calc_IIR_decay_length).
+        """
+        self._SingleFilter = _np.ndim(sos) == 2
+        self.sos = [_np.asarray(sos)] if self._SingleFilter else [_np.asarray(s) for s in sos]
+        if filterImplementation not in ["filtfilt", "lfilter"]:
+            raise ValueError("filterImplementation must be one of [filtfilt, lfilter] you entered: {}".format(
+                filterImplementation))
+        self.filterImplementation = filterImplementation
+        if filterImplementation == "lfilter":
+            Lookahead = 0
+        elif Lookahead == "Default":
+            Lookahead = max(calc_IIR_decay_length(sos) for sos in self.sos)
+        self.Lookahead = Lookahead
+        self._zi_steps = [scipy.signal.sosfilt_zi(sos) for sos in self.sos]
+        self.reset()
+        return None
+
+    def reset(self):
+        """
+        Clears the state of the filters, so that the next chunk is treated
+        as the start of a new signal.
+        """
+        self._zi = None
+        self._pending = _np.zeros((len(self.sos), 0))
+        return None
+
+    def _backward(self, ForwardFiltered):
+        """
+        Filters each row of ForwardFiltered backwards, starting from the
+        steady state for its last sample.
+        """
+        return _np.array([scipy.signal.sosfilt(sos, Row[::-1], zi=zi_step * Row[-1])[0][::-1]
+                          for sos, zi_step, Row in zip(self.sos, self._zi_steps, ForwardFiltered)])
+
+    def process(self, Chunk):
+        """
+        Filters the next chunk of the signal.
+
+        Parameters
+        ----------
+        Chunk : ndarray
+            The next samples of the signal
+
+        Returns
+        -------
+        FilteredChunk : ndarray
+            The filtered signal, for filtfilt this ends Lookahead samples
+            before the end of the signal received so far. 2D, one row per
+            filter, if there are several filters.
+        """
+        Chunk = _np.asarray(Chunk, dtype=float)
+        if len(Chunk) == 0:
+            return self._output(_np.zeros((len(self.sos), 0)))
+        if self._zi is None:
+            self._zi = [zi_step * Chunk[0] for zi_step in self._zi_steps]
+        ForwardFiltered = []
+        for i, sos in enumerate(self.sos):
+            Filtered, self._zi[i] = scipy.signal.sosfilt(sos, Chunk, zi=self._zi[i])
+            ForwardFiltered.append(Filtered)
+        ForwardFiltered = _np.array(ForwardFiltered)
+        if self.filterImplementation == "lfilter":
+            return self._output(ForwardFiltered)
+
+        self._pending = _np.concatenate([self._pending, ForwardFiltered], axis=1)
+        NumReady = self._pending.shape[1] - self.Lookahead
+        if NumReady <= 0:
+            return self._output(_np.zeros((len(self.sos), 0)))
+        FilteredChunk = self._backward(self._pending)[:, :NumReady]
+        self._pending = self._pending[:, NumReady:]
+        return self._output(FilteredChunk)
+
+    def flush(self):
+        """
+        Returns the filtered samples held back for the backward pass of
+        filtfilt and resets the filter ready for a new signal.
+
+        Returns
+        -------
+        FilteredChunk : ndarray
+            The filtered signal for the remaining samples
+        """
+        if self._pending.shape[1] > 0:
+            FilteredChunk = self._backward(self._pending)
+        else:
+            FilteredChunk = self._pending
+        self.reset()
+        return self._output(FilteredChunk)
+
+    def filter_chunks(self, Chunks):
+        """
+        Filters an iterable of chunks of a signal.
+
+        Parameters
+        ----------
+        Chunks : iterable
+            The successive chunks of the signal
+
+        Yields
+        ------
+        FilteredChunk : ndarray
+            The filtered signal, as returned by process and (at the end) flush
+        """
+        for Chunk in Chunks:
+            yield self.process(Chunk)
+        yield self.flush()
+
+    def _output(self, FilteredChunk):
+        if self._SingleFilter:
+            return FilteredChunk[0]
+        return FilteredChunk
+
+
+def FIR_filter_design(CentralFreq, bandwidth, transitionWidth, SampleFreq, GainStop=60):
+    """
+    Function to calculate the coefficients (taps) of a linear-phase FIR
+    band-pass filter using the Kaiser window method.
 
     Parameters
     ----------
     CentralFreq : float
-        Central frequency of the IIR filter to be designed
+        Central frequency of the FIR filter to be designed
     bandwidth : float
         The width of the passband to be created about the central frequency
     transitionWidth : float
@@ -1487,31 +4216,198 @@ def IIR_filter_design(CentralFreq, bandwidth, transitionWidth, SampleFreq, GainS
         The sample frequency (rate) of the data to be filtered
     GainStop : float, optional
         The dB of attenuation within the stopband (i.e. outside the passband)
-    GainPass : float, optional
-        The dB attenuation inside the passband (ideally close to 0 for a bandpass filter)
 
     Returns
     -------
-    b : ndarray
-        coefficients multiplying the current and past inputs (feedforward coefficients)
-    a : ndarray
-        coefficients multiplying the past outputs (feedback coefficients)
+    taps : ndarray
+        The coefficients of the FIR filter, there are an odd number of them
+        so that the filter delays the signal by a whole number of samples,
+        (len(taps) - 1)/2.
     """
     NyquistFreq = SampleFreq / 2
     if (CentralFreq + bandwidth / 2 + transitionWidth > NyquistFreq):
         raise ValueError(
             "Need a higher Sample Frequency for this Central Freq, Bandwidth and transition Width")
 
-    CentralFreqNormed = CentralFreq / NyquistFreq
-    bandwidthNormed = bandwidth / NyquistFreq
-    transitionWidthNormed = transitionWidth / NyquistFreq
-    bandpass = [CentralFreqNormed - bandwidthNormed /
-                2, CentralFreqNormed + bandwidthNormed / 2]
-    bandstop = [CentralFreqNormed - bandwidthNormed / 2 - transitionWidthNormed,
-                CentralFreqNormed + bandwidthNormed / 2 + transitionWidthNormed]
-    print(bandpass, bandstop)
-    b, a = scipy.signal.iirdesign(bandpass, bandstop, GainPass, GainStop)
-    return b, a
+    NumTaps, beta = scipy.signal.kaiserord(GainStop, transitionWidth / NyquistFreq)
+    NumTaps = NumTaps | 1
+    # firwin's cutoffs are the middle of the transition bands
+    cutoffs = [(CentralFreq - bandwidth / 2 - transitionWidth / 2) / NyquistFreq,
+               (CentralFreq + bandwidth / 2 + transitionWidth / 2) / NyquistFreq]
+    taps = scipy.signal.firwin(NumTaps, cutoffs, window=('kaiser', beta), pass_zero=False)
+    return taps
+
+
+class FIRStreamFilter():
+    """
+    Filters a signal which arrives in chunks (e.g. blocks read from a file
+    or buffers from an acquisition) with one or more FIR filters by
+    overlap-save FFT convolution. Only the last len(taps)-1 samples and any
+    samples not yet making up a whole block are kept between chunks, so the
+    memory used doesn't depend on the length of the signal.
+
+    Feeding a signal through process in any number of chunks and then
+    calling flush gives the same output as scipy.signal.lfilter(taps, 1, signal)
+    (to within floating point rounding), i.e. the filtered signal delayed by
+    Delay samples.
+
+    Attributes
+    ----------
+    taps : ndarray
+        The taps of the filters, one row per filter
+    NFFT : int
+        The length of the FFTs used
+    BlockLength : int
+        The number of new samples filtered by each FFT
+    Delay : int
+        The delay in samples of a linear-phase filter, (len(taps)-1)//2
+    """
+    def __init__(self, taps, NFFT="Default"):
+        """
+        Parameters
+        ----------
+        taps : ndarray
+            The taps of the filter, or a 2D array with the taps of one
+            filter per row to filter the signal with several filters at once
+            (e.g. as designed by FIR_filter_design)
+        NFFT : int, optional
+            The length of the FFTs to use, must be longer than the filters.
+            defaults to a fast length about 8 times the length of the filters
+        """
+        self._SingleFilter = _np.ndim(taps) == 1
+        self.taps = _np.atleast_2d(taps)
+        NumTaps = self.taps.shape[1]
+        if NFFT == "Default":
+            NFFT = scipy.fftpack.next_fast_len(8 * NumTaps)
+        if NFFT < NumTaps:
+            raise ValueError("NFFT must be at least as long as the filters")
+        self.NFFT = NFFT
+        self.BlockLength = NFFT - NumTaps + 1
+        self.Delay = (NumTaps - 1) // 2
+        self._tapsfft = _np.fft.rfft(self.taps, NFFT, axis=1)
+        self.reset()
+        return None
+
+    def reset(self):
+        """
+        Clears the stored samples, so that the next chunk is treated as
+        the start of a new signal.
+        """
+        self._history = _np.zeros(self.taps.shape[1] - 1)
+        self._pending = _np.zeros(0)
+        return None
+
+    def process(self, Chunk):
+        """
+        Filters the next chunk of the signal.
+
+        Parameters
+        ----------
+        Chunk : ndarray
+            The next samples of the signal
+
+        Returns
+        -------
+        FilteredChunk : ndarray
+            The filtered signal for every whole block of samples received
+            so far (samples making up a partial block are kept until the
+            next call to process or flush). 2D, one row per filter, if
+            there are several filters.
+        """
+        Data = _np.concatenate([self._pending, _np.asarray(Chunk, dtype=float)])
+        NumBlocks = len(Data) // self.BlockLength
+        NumProcessed = NumBlocks * self.BlockLength
+        Input = _np.concatenate([self._history, Data[:NumProcessed]])
+        self._pending = Data[NumProcessed:]
+        self._history = Input[len(Input) - len(self._history):]
+
+        Segments = _np.lib.stride_tricks.as_strided(
+            Input, shape=(NumBlocks, self.NFFT),
+            strides=(self.BlockLength * Input.strides[0], Input.strides[0]), writeable=False)
+        Segmentsfft = _np.fft.rfft(Segments, axis=1)
+        Outputs = _np.fft.irfft(Segmentsfft[:, None, :] * self._tapsfft[None, :, :],
+                                self.NFFT, axis=2)[:, :, self.NFFT - self.BlockLength:]
+        FilteredChunk = _np.transpose(Outputs, (1, 0, 2)).reshape(len(self.taps), NumProcessed)
+        if self._SingleFilter:
+            return FilteredChunk[0]
+        return FilteredChunk
+
+    def flush(self):
+        """
+        Filters the samples kept back as a partial block and resets the
+        filter ready for a new signal.
+
+        Returns
+        -------
+        FilteredChunk : ndarray
+            The filtered signal for the remaining samples
+        """
+        NumPending = len(self._pending)
+        FilteredChunk = self.process(_np.zeros(self.BlockLength - NumPending))
+        self.reset()
+        return FilteredChunk[..., :NumPending]
+
+    def filter_chunks(self, Chunks):
+        """
+        Filters an iterable of chunks of a signal, such as the blocks
+        yielded by LeCroy.ReadWaveformBlocks.
+
+        Parameters
+        ----------
+        Chunks : iterable
+            The successive chunks of the signal
+
+        Yields
+        ------
+        FilteredChunk : ndarray
+            The filtered signal, as returned by process and (at the end) flush
+        """
+        for Chunk in Chunks:
+            yield self.process(Chunk)
+        yield self.flush()
+
+
+def FIR_filter(Signal, taps, CompensateDelay=True):
+    """
+    Filters a whole signal with one or more FIR filters, using the same
+    overlap-save implementation as FIRStreamFilter.
+
+    Parameters
+    ----------
+    Signal : ndarray
+        Signal to be filtered
+    taps : ndarray
+        The taps of the filter, or a 2D array with the taps of one
+        filter per row
+    CompensateDelay : bool, optional
+        Whether to remove the (len(taps)-1)//2 sample delay of a
+        linear-phase filter so that the output lines up with the input.
+        defaults to True
+
+    Returns
+    -------
+    FilteredSignal : ndarray
+        The filtered signal, the same length as Signal (2D, one row per
+        filter, if there are several filters)
+    """
+    StreamFilter = FIRStreamFilter(taps)
+    Delay = StreamFilter.Delay if CompensateDelay == True else 0
+    # the signal is fed in chunks of a fixed number of blocks so the FFTs
+    # are only ever of one chunk at a time, whatever the length of the signal
+    ChunkLength = 64 * StreamFilter.BlockLength
+    Chunks = [Signal[i:i + ChunkLength] for i in range(0, len(Signal), ChunkLength)] + [_np.zeros(Delay)]
+    FilteredSignal = _np.empty((len(StreamFilter.taps), len(Signal)))
+    Position = -Delay # the index in the signal of the next filtered sample
+    for FilteredChunk in StreamFilter.filter_chunks(Chunks):
+        FilteredChunk = _np.atleast_2d(FilteredChunk)
+        Start = max(Position, 0)
+        End = min(Position + FilteredChunk.shape[1], len(Signal))
+        if End > Start:
+            FilteredSignal[:, Start:End] = FilteredChunk[:, Start - Position:End - Position]
+        Position += FilteredChunk.shape[1]
+    if _np.ndim(taps) == 1:
+        return FilteredSignal[0]
+    return FilteredSignal
 
 
 #def IIR_filter_design_New(Order, btype, CriticalFreqs, SampleFreq, StopbandAttenuation=40, ftype='cheby2'):
@@ -1613,7 +4509,6 @@ def get_freq_response(a, b, ShowFig=True, SampleFreq=(2 * _np.pi), NumOfFreqs=50
     """
     w, h = scipy.signal.freqz(b=b, a=a, worN=NumOfFreqs, whole=whole)
     freqList = w / (_np.pi) * SampleFreq / 2.0
-    himag = _np.array([hi.imag for hi in h])
     GainArray = 20 * _np.log10(_np.abs(h))
     PhaseDiffArray = _np.unwrap(_np.arctan2(_np.imag(h), _np.real(h)))
     if ShowFig == True:
@@ -1693,7 +4588,7 @@ def multi_plot_PSD(DataArray, xlim=[0, 500e3], LabelArray=[], ShowFig=True):
     return fig, ax
 
 
-def multi_plot_time(DataArray, SubSampleN=1, xlim="default", ylim="default", LabelArray=[], ShowFig=True):
+def multi_plot_time(DataArray, SubSampleN=1, xlim="default", ylim="default", LabelArray=[], NumPoints=4000, ShowFig=True):
     """
     plot the time trace for multiple data sets on the same axes.
 
@@ -1704,12 +4599,18 @@ def multi_plot_time(DataArray, SubSampleN=1, xlim="default", ylim="default", Lab
     SubSampleN : int, optional
         Number of intervals between points to remove (to sub-sample data so
         that you effectively have lower sample rate to make plotting easier
-        and quicker.
+        and quicker. Only used if NumPoints is None.
     xlim : array-like, optional
         2 element array specifying the lower and upper x limit for which to
         plot the time signal
     LabelArray : array-like, optional
         array of labels for each data-set to be plotted
+    NumPoints : int, optional
+        The approximate number of points to plot for each data set, the
+        min/max envelope of the voltage is plotted (see
+        DataObject.get_voltage_envelope) and is re-calculated for the
+        visible window when zooming. If None every SubSampleN-th sample is
+        plotted instead. defaults to 4000
     ShowFig : bool, optional
        If True runs plt.show() before returning figure
        if False it just returns the figure object.
@@ -1729,8 +4630,12 @@ def multi_plot_time(DataArray, SubSampleN=1, xlim="default", ylim="default", Lab
     ax = fig.add_subplot(111)
 
     for i, data in enumerate(DataArray):
-        ax.plot(data.time[::SubSampleN], data.voltage[::SubSampleN],
-                alpha=0.8, label=LabelArray[i])
+        if NumPoints is None:
+            ax.plot(data.time[::SubSampleN], data.voltage[::SubSampleN],
+                    alpha=0.8, label=LabelArray[i])
+        else:
+            _plot_voltage_envelope(ax, data, 0, len(data.voltage), NumPoints,
+                                   alpha=0.8, label=LabelArray[i])
     ax.set_xlabel("time (s)")
     if xlim != "default":
         ax.set_xlim(xlim)
@@ -1744,7 +4649,7 @@ def multi_plot_time(DataArray, SubSampleN=1, xlim="default", ylim="default", Lab
     return fig, ax
 
 
-def multi_subplots_time(DataArray, SubSampleN=1, xlim="default", ylim="default", LabelArray=[], ShowFig=True):
+def multi_subplots_time(DataArray, SubSampleN=1, xlim="default", ylim="default", LabelArray=[], NumPoints=4000, ShowFig=True):
     """
     plot the time trace on multiple axes
 
@@ -1755,12 +4660,18 @@ def multi_subplots_time(DataArray, SubSampleN=1, xlim="default", ylim="default",
     SubSampleN : int, optional
         Number of intervals between points to remove (to sub-sample data so
         that you effectively have lower sample rate to make plotting easier
-        and quicker.
+        and quicker. Only used if NumPoints is None.
     xlim : array-like, optional
         2 element array specifying the lower and upper x limit for which to
         plot the time signal
     LabelArray : array-like, optional
         array of labels for each data-set to be plotted
+    NumPoints : int, optional
+        The approximate number of points to plot for each data set, the
+        min/max envelope of the voltage is plotted (see
+        DataObject.get_voltage_envelope) and is re-calculated for the
+        visible window when zooming. If None every SubSampleN-th sample is
+        plotted instead. defaults to 4000
     ShowFig : bool, optional
        If True runs plt.show() before returning figure
        if False it just returns the figure object.
@@ -1782,8 +4693,12 @@ def multi_subplots_time(DataArray, SubSampleN=1, xlim="default", ylim="default",
     fig, axs = _plt.subplots(NumDataSets, 1)
 
     for i, data in enumerate(DataArray):
-        axs[i].plot(data.time[::SubSampleN], data.voltage[::SubSampleN],
-                    alpha=0.8, label=LabelArray[i])
+        if NumPoints is None:
+            axs[i].plot(data.time[::SubSampleN], data.voltage[::SubSampleN],
+                        alpha=0.8, label=LabelArray[i])
+        else:
+            _plot_voltage_envelope(axs[i], data, 0, len(data.voltage), NumPoints,
+                                   alpha=0.8, label=LabelArray[i])
         axs[i].set_xlabel("time (s)")
         axs[i].grid(which="major")
         axs[i].legend(loc="best")
@@ -1837,46 +4752,189 @@ def calc_PSD(Signal, SampleFreq, NPerSegment='Default', window="hann"):
     return freqs, PSD
 
 
-def _GetRealImagArray(Array):
+def calc_sliding_PSD(Signal, SampleFreq, WindowLength, StepLength, NPerSegment, window="hann", FreqRange="Default"):
     """
-    Returns the real and imaginary components of each element in an array and returns them in 2 resulting arrays.
+    Calculates the PSD (by Welch's method, with segments overlapping by
+    NPerSegment//2 samples as in scipy.signal.welch) of every window of
+    WindowLength samples, sliding along the signal by StepLength samples at
+    a time. The periodogram of each segment is
+    calculated once, in batches sharing the same FFT length, and the PSD of each
+    window is the mean of the periodograms of the segments inside it.
 
     Parameters
     ----------
-    Array : ndarray
-        Input array
+    Signal : ndarray
+        Array containing the signal to have the PSDs calculated for
+    SampleFreq : float
+        Sample frequency of the signal array
+    WindowLength : int
+        The number of samples in each window, the PSD of each window is
+        the same as scipy.signal.welch gives for those samples
+    StepLength : int
+        The number of samples the window slides along by each step,
+        this is rounded down to a whole number of segment steps
+        (NPerSegment - NPerSegment//2 samples)
+    NPerSegment : int
+        Length of each segment used in Welch's method
+    window : str or tuple or array_like, optional
+        Desired window to use. See get_window for a list of windows
+        and required parameters.
+        default = "hann"
+    FreqRange : array_like, optional
+        [lowerFreq, upperFreq], if given only the PSDs between these
+        frequencies are kept (which saves memory when there are many windows).
+        default = all frequencies
 
     Returns
     -------
-    RealArray : ndarray
-        The real components of the input array
-    ImagArray : ndarray
-        The imaginary components of the input array
+    freqs : ndarray
+        Array containing the frequencies at which the PSDs have been
+        calculated
+    PSDs : ndarray
+        2D array containing one PSD (in V**2/Hz) per row, one row per window
+    WindowStarts : ndarray
+        The index of the first sample of each window
     """
-    ImagArray = _np.array([num.imag for num in Array])
-    RealArray = _np.array([num.real for num in Array])
-    return RealArray, ImagArray
-
-
-def _GetComplexConjugateArray(Array):
+    Signal = _np.asarray(Signal, dtype=float)
+    Step = NPerSegment - NPerSegment // 2
+    SegmentsPerWindow = max((WindowLength - NPerSegment) // Step + 1, 1)
+    SegmentsPerStep = max(StepLength // Step, 1)
+    NSegments = (len(Signal) - NPerSegment) // Step + 1
+    NWindows = (NSegments - SegmentsPerWindow) // SegmentsPerStep + 1
+    if NWindows < 1:
+        raise ValueError("WindowLength must be shorter than the Signal")
+
+    freqs = _np.fft.rfftfreq(NPerSegment, 1 / SampleFreq)
+    if isinstance(FreqRange, str) and FreqRange == "Default":
+        lowerIndex, upperIndex = 0, len(freqs)
+    else:
+        lowerIndex, upperIndex = _np.searchsorted(freqs, FreqRange)
+        upperIndex = min(upperIndex + 1, len(freqs))
+    WindowArray = scipy.signal.get_window(window, NPerSegment)
+    Scale = 2 / (SampleFreq * _np.sum(WindowArray**2))
+    OneSidedScale = _np.full(len(freqs), Scale)
+    OneSidedScale[0] = Scale / 2
+    if NPerSegment % 2 == 0:
+        OneSidedScale[-1] = Scale / 2
+    OneSidedScale = OneSidedScale[lowerIndex:upperIndex]
+
+    Segments = _np.lib.stride_tricks.as_strided(
+        Signal, shape=(NSegments, NPerSegment),
+        strides=(Step * Signal.strides[0], Signal.strides[0]), writeable=False)
+
+    # running sum of the periodograms, recorded at the segments where windows
+    # start and end so that each window's PSD is a difference of 2 sums
+    WindowStartSegments = _np.arange(NWindows) * SegmentsPerStep
+    Boundaries = _np.union1d(WindowStartSegments, WindowStartSegments + SegmentsPerWindow)
+    CumulativeSums = _np.empty([len(Boundaries), upperIndex - lowerIndex])
+    RunningSum = _np.zeros(upperIndex - lowerIndex)
+    BoundaryIndex = 0
+    BatchSize = max(int(2**22 // NPerSegment), 1)
+    for BatchStart in range(0, Boundaries[-1], BatchSize):
+        Batch = Segments[BatchStart:min(BatchStart + BatchSize, Boundaries[-1])]
+        Batch = (Batch - _np.mean(Batch, axis=1)[:, None]) * WindowArray
+        Periodograms = _np.abs(_np.fft.rfft(Batch, axis=1)[:, lowerIndex:upperIndex])**2 * OneSidedScale
+        BatchSums = RunningSum + _np.cumsum(Periodograms, axis=0)
+        while BoundaryIndex < len(Boundaries) and Boundaries[BoundaryIndex] <= BatchStart + len(Batch):
+            Offset = Boundaries[BoundaryIndex] - BatchStart
+            CumulativeSums[BoundaryIndex] = RunningSum if Offset == 0 else BatchSums[Offset - 1]
+            BoundaryIndex += 1
+        RunningSum = BatchSums[-1]
+    while BoundaryIndex < len(Boundaries):
+        CumulativeSums[BoundaryIndex] = RunningSum
+        BoundaryIndex += 1
+
+    StartRows = _np.searchsorted(Boundaries, WindowStartSegments)
+    EndRows = _np.searchsorted(Boundaries, WindowStartSegments + SegmentsPerWindow)
+    PSDs = (CumulativeSums[EndRows] - CumulativeSums[StartRows]) / SegmentsPerWindow
+    return freqs[lowerIndex:upperIndex], PSDs, WindowStartSegments * Step
+
+
+def _fit_PSD_track(ArgList):
     """
-    Calculates the complex conjugate of each element in an array and returns the resulting array.
+    Fits a sequence of PSDs one after another, starting each fit from the
+    solution of the previous one and centring its fitting region on the
+    previous trap frequency. Used by DataObject.get_fit_tracking as the
+    function run by each worker process.
 
     Parameters
     ----------
-    Array : ndarray
-        Input array
+    ArgList : array_like
+        Contains the following elements:
+            AngFreqs : ndarray
+                The angular frequencies of the PSDs
+            logPSDs : ndarray
+                2D array of the PSDs in dB, one per row
+            Angbandwidth : float
+                The (angular) width of the region to fit
+            p0 : ndarray
+                The initial values [A, OmegaTrap, Gamma] for the first PSD
 
     Returns
     -------
-    ConjArray : ndarray
-        The complex conjugate of the input array.
+    Params : ndarray
+        Fitted parameters, one row of [A, OmegaTrap, Gamma] per PSD
+    ParamsErr : ndarray
+        Error in fitted parameters, one row per PSD
+    """
+    AngFreqs, logPSDs, Angbandwidth, p0 = ArgList
+    Params = _np.full([len(logPSDs), 3], _np.NaN)
+    ParamsErr = _np.full([len(logPSDs), 3], _np.NaN)
+    for i, logPSD in enumerate(logPSDs):
+        indx_fit_lower, indx_fit_upper = _take_closest_index(
+            AngFreqs, [p0[1] - Angbandwidth / 2, p0[1] + Angbandwidth / 2])
+        try:
+            Params[i], ParamsErr[i] = _fit_PSD_window(
+                AngFreqs[indx_fit_lower:indx_fit_upper],
+                logPSD[indx_fit_lower:indx_fit_upper], p0)
+        except (RuntimeError, TypeError):
+            continue
+        if _np.all(_np.isfinite(Params[i])):
+            p0 = Params[i]
+    return Params, ParamsErr
+
+
+def calc_analytic_signal(Signal, ChunkLength="Default", Overlap=10000):
     """
-    ConjArray = _np.array([num.conj() for num in Array])
-    return ConjArray
+    Calculates the analytic signal, by default with a single FFT of the
+    whole signal exactly as scipy.signal.hilbert. For signals too long for
+    one FFT the signal can be split into chunks which overlap by Overlap
+    samples either side, of which only the central parts are kept. These
+    agree with the single FFT away from the ends of the signal to within
+    the leakage of the edge effects across Overlap samples.
 
+    Parameters
+    ----------
+    Signal : array-like
+        A real-valued time signal
+    ChunkLength : int, optional
+        The number of samples of the signal to transform at a time (the
+        FFTs are Overlap samples either side longer than this), defaults
+        to transforming the whole signal in one FFT.
+    Overlap : int, optional
+        The number of samples the chunks are extended by on either side to
+        keep the edge effects of each FFT out of the samples kept, must be
+        several periods of the slowest frequency of interest. Defaults to 10000
 
-def fm_discriminator(Signal):
+    Returns
+    -------
+    S_analytic : ndarray
+        The analytic signal of the argument signal
+    """
+    Signal = _np.asarray(Signal)
+    if (isinstance(ChunkLength, str) and ChunkLength == "Default") or ChunkLength >= len(Signal):
+        return _hilbert(Signal)
+    S_analytic = _np.empty(len(Signal), dtype=complex)
+    for Start in range(0, len(Signal), ChunkLength):
+        End = min(Start + ChunkLength, len(Signal))
+        PaddedStart = max(Start - Overlap, 0)
+        PaddedEnd = min(End + Overlap, len(Signal))
+        S_chunk = _hilbert(Signal[PaddedStart:PaddedEnd])
+        S_analytic[Start:End] = S_chunk[Start - PaddedStart: End - PaddedStart]
+    return S_analytic
+
+
+def fm_discriminator(Signal, ChunkLength="Default", Overlap=10000):
     """
     Calculates the digital FM discriminator from a real-valued time signal.
 
@@ -1884,62 +4942,116 @@ def fm_discriminator(Signal):
     ----------
     Signal : array-like
         A real-valued time signal
+    ChunkLength : int, optional
+        The number of samples to calculate the analytic signal for at a
+        time, for signals too long for one FFT, see calc_analytic_signal.
+        Defaults to the whole signal.
+    Overlap : int, optional
+        The overlap either side of each chunk, see calc_analytic_signal
 
     Returns
     -------
     fmDiscriminator : array-like
         The digital FM discriminator of the argument signal
     """
-    S_analytic = _hilbert(Signal)
-    S_analytic_star = _GetComplexConjugateArray(S_analytic)
-    S_analytic_hat = S_analytic[1:] * S_analytic_star[:-1]
-    R, I = _GetRealImagArray(S_analytic_hat)
-    fmDiscriminator = _np.arctan2(I, R)
+    S_analytic = calc_analytic_signal(Signal, ChunkLength, Overlap)
+    fmDiscriminator = _np.angle(S_analytic[1:] * _np.conj(S_analytic[:-1]))
     return fmDiscriminator
 
 
-def _approx_equal(a, b, tol):
+def demodulate(Signal, SampleFreq, CentralFreqs, bandwidths, DecimationFactor="Auto", GainStop=60):
     """
-    Returns if b is approximately equal to be a within a certain percentage tolerance.
+    Digital lock-in: mixes the signal down to baseband at each of the
+    central frequencies and low-pass filters and decimates the result
+    (with scipy.signal.resample_poly), giving the complex envelope of the
+    signal in a band about each frequency at a rate close to the bandwidth
+    instead of the full sample rate.
+
+    For a component A*cos(2*pi*(CentralFreq + df)*t + phi) of the signal
+    the envelope is A*exp(i*(2*pi*df*t + phi)) (see calc_envelope_parameters).
 
     Parameters
     ----------
-    a : float
-        first value
-    b : float
-        second value
-    tol : float
-        tolerance in percentage
+    Signal : ndarray
+        Signal to be demodulated
+    SampleFreq : float
+        Sample frequency of signal
+    CentralFreqs : array_like
+        The frequencies to demodulate the signal at (e.g. the z, x and y
+        frequencies from get_ZXY_freqs)
+    bandwidths : array_like
+        The width of the band about each central frequency to keep, the
+        low-pass filter passes frequencies within bandwidth/2 of the
+        central frequency.
+    DecimationFactor : int or "Auto", optional
+        The factor to reduce the sample rate of the envelopes by. If "Auto"
+        the envelopes are sampled at about twice the largest bandwidth.
+    GainStop : float, optional
+        The dB of attenuation of the low-pass filter above 3/4 of the
+        bandwidth from the central frequency
+
+    Returns
+    -------
+    Envelopes : ndarray
+        2D complex array with the envelope for each central frequency
+        in each row
+    EnvelopeSampleFreq : float
+        The sample frequency of the envelopes, element i of each envelope
+        lines up with element i*DecimationFactor of the signal
     """
-    return abs(a - b) / a * 100 < tol
+    CentralFreqs = _np.atleast_1d(CentralFreqs)
+    bandwidths = _np.atleast_1d(bandwidths) * _np.ones(len(CentralFreqs))
+    if DecimationFactor == "Auto":
+        DecimationFactor = max(int(SampleFreq // (2 * max(bandwidths))), 1)
+    EnvelopeSampleFreq = SampleFreq / DecimationFactor
+    if 0.75 * max(bandwidths) > EnvelopeSampleFreq / 2:
+        raise ValueError(
+            "DecimationFactor too large, the decimated envelopes would alias")
+
+    Signal = _np.asarray(Signal)
+    n = _np.arange(len(Signal))
+    Envelopes = []
+    for CentralFreq, bandwidth in zip(CentralFreqs, bandwidths):
+        # low-pass with the passband edge at bandwidth/2 and stopband edge at 3*bandwidth/4
+        NumTaps, beta = scipy.signal.kaiserord(GainStop, (bandwidth / 4) / (SampleFreq / 2))
+        taps = scipy.signal.firwin(NumTaps | 1, 5 * bandwidth / 8, window=('kaiser', beta), fs=SampleFreq)
+        Mixed = Signal * _np.exp(-2j * _np.pi * (CentralFreq / SampleFreq) * n)
+        Envelopes.append(2 * scipy.signal.resample_poly(Mixed, 1, DecimationFactor, window=taps))
+    return _np.array(Envelopes), EnvelopeSampleFreq
 
 
-def _is_this_a_collision(ArgList):
+def calc_envelope_parameters(Envelopes, EnvelopeSampleFreq, CentralFreqs):
     """
-    Detects if a particular point is during collision after effect (i.e. a phase shift) or not.
+    Calculates the amplitude, phase and instantaneous frequency from
+    complex envelopes (as returned by demodulate).
 
     Parameters
     ----------
-    ArgList : array_like
-        Contains the following elements:
-            value : float
-                value of the FM discriminator
-            mean_fmd : float
-                the mean value of the FM discriminator
-            tolerance : float
-                The tolerance in percentage that it must be away from the mean value for it
-                to be counted as a collision event.
+    Envelopes : ndarray
+        complex envelope or 2D array of complex envelopes, one per row
+    EnvelopeSampleFreq : float
+        The sample frequency of the envelopes
+    CentralFreqs : float or array_like
+        The frequency each envelope was demodulated at
 
     Returns
     -------
-    is_this_a_collision : bool
-        True if this is a collision event, false if not.
+    Amplitudes : ndarray
+        The amplitude of the signal in each band with time
+    Phases : ndarray
+        The (unwrapped) phase of the signal relative to the central
+        frequency with time
+    InstFreqs : ndarray
+        The instantaneous frequency of the signal in each band with time
     """
-    value, mean_fmd, tolerance = ArgList
-    if not _approx_equal(mean_fmd, value, tolerance):
-        return True
-    else:
-        return False
+    Envelopes = _np.asarray(Envelopes)
+    Amplitudes = _np.abs(Envelopes)
+    Phases = _np.unwrap(_np.angle(Envelopes), axis=-1)
+    CentralFreqs = _np.asarray(CentralFreqs)
+    if Envelopes.ndim == 2:
+        CentralFreqs = CentralFreqs.reshape(-1, 1)
+    InstFreqs = CentralFreqs + _np.gradient(Phases, axis=-1) * EnvelopeSampleFreq / (2 * _np.pi)
+    return Amplitudes, Phases, InstFreqs
 
 
 def find_collisions(Signal, tolerance=50):
@@ -1962,12 +5074,33 @@ def find_collisions(Signal, tolerance=50):
     fmd = fm_discriminator(Signal)
     mean_fmd = _np.mean(fmd)
 
-    Collisions = [_is_this_a_collision(
-        [value, mean_fmd, tolerance]) for value in fmd]
+    Collisions = ~(_calc_fmd_deviation(fmd, mean_fmd) < tolerance)
 
     return Collisions
 
 
+def _calc_fmd_deviation(fmd, mean_fmd):
+    """
+    Calculates the deviation of the FM discriminator from its mean
+    as a percentage of the mean (as used by _approx_equal).
+    """
+    return _np.abs(mean_fmd - fmd) / mean_fmd * 100
+
+
+def _find_collision_runs(Collisions):
+    """
+    Finds the start and (exclusive) end indicies of each run of Trues in
+    Collisions which begins with a change from False to True (as counted
+    by count_collisions), a run still going at the end ends at len(Collisions).
+    """
+    # a True before the start means a run already going at index 0 isn't counted
+    Padded = _np.concatenate([[True], _np.asarray(Collisions, dtype=bool), [False]])
+    Changes = _np.diff(Padded.astype(_np.int8))
+    Starts = _np.nonzero(Changes == 1)[0]
+    Ends = _np.nonzero(Changes == -1)[0][1:]
+    return Starts, Ends
+
+
 def count_collisions(Collisions):
     """
     Counts the number of unique collisions and gets the collision index.
@@ -1984,17 +5117,314 @@ def count_collisions(Collisions):
     CollisionIndicies : list
         Indicies of collision occurance
     """
-    CollisionCount = 0
-    CollisionIndicies = []
-    lastval = True
-    for i, val in enumerate(Collisions):
-        if val == True and lastval == False:
-            CollisionIndicies.append(i)
-            CollisionCount += 1
-        lastval = val
+    Starts, _ = _find_collision_runs(Collisions)
+    CollisionCount = len(Starts)
+    CollisionIndicies = Starts.tolist()
     return CollisionCount, CollisionIndicies
 
 
+def find_collision_events(Signal, SampleFreq, tolerance=50):
+    """
+    Finds collision events in the signal from the shift in phase of the
+    signal (as find_collisions) and tabulates them.
+
+    Parameters
+    ----------
+    Signal : array_like
+        Array containing the values of the signal of interest containing a single frequency.
+    SampleFreq : float
+        The sample frequency of the signal
+    tolerance : float
+        Percentage tolerance, if the value of the FM Discriminator varies from the mean by this
+        percentage it is counted as being during a collision event (or the aftermath of an event).
+
+    Returns
+    -------
+    EventTable : pandas.DataFrame
+        Table with a row for each collision event (those counted by
+        count_collisions) and the columns:
+            StartIndex : the index of the first sample of the event
+            EndIndex : the index after the last sample of the event
+            StartTime : the time of the start of the event from the start of the signal
+            Duration : the duration of the event in seconds
+            PeakDeviation : the largest deviation of the FM discriminator from its
+                mean during the event, as a percentage of the mean
+    """
+    fmd = fm_discriminator(Signal)
+    Deviation = _calc_fmd_deviation(fmd, _np.mean(fmd))
+    Starts, Ends = _find_collision_runs(~(Deviation < tolerance))
+    return _make_collision_event_table(Starts, Ends, _calc_run_peaks(Deviation, Starts, Ends), SampleFreq)
+
+
+def _calc_run_peaks(Deviation, Starts, Ends):
+    """
+    Calculates the maximum of Deviation between each start and (exclusive)
+    end index.
+    """
+    if len(Starts) == 0:
+        return _np.zeros(0)
+    # Deviation is extended so that Ends can be len(Deviation)
+    Bounds = _np.column_stack([Starts, Ends]).ravel()
+    return _np.maximum.reduceat(_np.append(Deviation, 0), Bounds)[::2]
+
+
+def _make_collision_event_table(Starts, Ends, PeakDeviations, SampleFreq):
+    """
+    Makes the table of collision events returned by find_collision_events
+    from the start and end indicies and peak deviation of each event.
+    """
+    Starts = _np.asarray(Starts, dtype=int)
+    Ends = _np.asarray(Ends, dtype=int)
+    EventTable = _pd.DataFrame({"StartIndex": Starts,
+                                "EndIndex": Ends,
+                                "StartTime": Starts / SampleFreq,
+                                "Duration": (Ends - Starts) / SampleFreq,
+                                "PeakDeviation": _np.asarray(PeakDeviations, dtype=float)},
+                               columns=["StartIndex", "EndIndex", "StartTime", "Duration", "PeakDeviation"])
+    return EventTable
+
+
+class CollisionMonitor():
+    """
+    Detects collision events in a signal which arrives in chunks (e.g.
+    buffers from an acquisition or blocks read from a long file) as
+    find_collision_events does for a whole signal, in constant memory.
+
+    The baseline instantaneous frequency, which find_collisions takes as
+    the mean of the whole FM discriminator, is instead updated as each
+    sample arrives, either as the mean of all the samples so far
+    (Baseline="Welford") or as an exponentially weighted moving average
+    with time constant BaselineTime (Baseline="EWMA"), which follows slow
+    drifts e.g. during a pressure ramp. A sample is during a collision if
+    the instantaneous frequency differs from the baseline by more than
+    tolerance percent of the baseline.
+
+    The chunks can either be the real signal, in which case the analytic
+    signal is calculated over blocks of BlockLength samples (at fixed
+    positions in the signal, so the events found don't depend on how the
+    signal is split into chunks) extended by Overlap samples either side,
+    and the samples are held back until the block after them has arrived,
+    or complex envelopes from demodulate (with CentralFreq given) which
+    need no lookahead.
+
+    Attributes
+    ----------
+    SampleFreq : float
+        The sample frequency of the chunks
+    tolerance : float
+        Percentage tolerance for a sample to be during a collision
+    BaselineMean : float
+        The current baseline instantaneous frequency
+    BaselineStd : float
+        The current standard deviation of the instantaneous frequency
+        about the baseline
+    CollisionCount : int
+        The number of collision events finished so far
+    """
+    def __init__(self, SampleFreq, tolerance=50, Baseline="Welford", BaselineTime=0.1, CentralFreq=None, Overlap=10000, BlockLength=2**16):
+        """
+        Parameters
+        ----------
+        SampleFreq : float
+            The sample frequency of the chunks
+        tolerance : float, optional
+            Percentage tolerance, if the instantaneous frequency varies from the baseline by this
+            percentage it is counted as being during a collision event (or the aftermath of an event).
+        Baseline : string, optional
+            Welford or EWMA - how the baseline is estimated, see above.
+            default: Welford
+        BaselineTime : float, optional
+            The time constant in seconds of the EWMA baseline
+        CentralFreq : float, optional
+            If given the chunks are complex envelopes demodulated at this
+            frequency, otherwise they are the real signal.
+        Overlap : int, optional
+            The number of samples of the real signal held back (and overlapped)
+            to calculate the analytic signal of each block, see calc_analytic_signal.
+        BlockLength : int, optional
+            The number of samples of the real signal to calculate the analytic
+            signal of at a time (each FFT is 2*Overlap samples longer).
+        """
+        if Baseline not in ["Welford", "EWMA"]:
+            raise ValueError("Baseline must be one of [Welford, EWMA] you entered: {}".format(Baseline))
+        self.SampleFreq = SampleFreq
+        self.tolerance = tolerance
+        self.Baseline = Baseline
+        self._alpha = 1 - _np.exp(-1 / (BaselineTime * SampleFreq))
+        self.CentralFreq = CentralFreq
+        self.Overlap = Overlap
+        self.BlockLength = BlockLength
+        self.reset()
+        return None
+
+    def reset(self):
+        """
+        Clears the baseline and any partial event, so that the next chunk
+        is treated as the start of a new signal.
+        """
+        self.BaselineMean = _np.nan
+        self.BaselineStd = _np.nan
+        self.CollisionCount = 0
+        self._N = 0
+        self._M2 = 0
+        self._zi = _np.zeros((3, 1))
+        self._buffer = _np.zeros(0)
+        self._bufferStart = 0
+        self._nextIndex = 0
+        self._lastAnalytic = None
+        self._lastCollision = True
+        self._eventStart = None
+        self._eventPeak = 0
+        return None
+
+    def process(self, Chunk):
+        """
+        Processes the next chunk of the signal (or envelope).
+
+        Parameters
+        ----------
+        Chunk : ndarray
+            The next samples of the signal, or complex envelope
+
+        Returns
+        -------
+        EventTable : pandas.DataFrame
+            The collision events which finished in this chunk, with the
+            same columns as returned by find_collision_events (indicies
+            are of the FM discriminator of the whole signal so far).
+        """
+        if self.CentralFreq is not None:
+            return self._process_analytic(_np.asarray(Chunk))
+        self._buffer = _np.concatenate([self._buffer, _np.asarray(Chunk, dtype=float)])
+        return self._process_buffer()
+
+    def flush(self):
+        """
+        Processes the samples held back and finishes any event still
+        going at the end of the signal. Call reset before processing
+        another signal.
+
+        Returns
+        -------
+        EventTable : pandas.DataFrame
+            The collision events which finished, as returned by process
+        """
+        EventTable = self._process_buffer(Final=True)
+        if self._eventStart is not None:
+            LastEvent = _make_collision_event_table([self._eventStart], [self._N],
+                                                    [self._eventPeak], self.SampleFreq)
+            EventTable = _pd.concat([EventTable, LastEvent], ignore_index=True)
+            self.CollisionCount += 1
+            self._eventStart = None
+        return EventTable
+
+    def _process_buffer(self, Final=False):
+        """
+        Calculates the analytic signal of each block of the buffered real
+        signal which has the Overlap samples after it buffered (or of all
+        the rest of the signal if Final) and processes it, keeping Overlap
+        samples before the next block.
+        """
+        BufferEnd = self._bufferStart + len(self._buffer)
+        EventTables = [_make_collision_event_table([], [], [], self.SampleFreq)]
+        while self.CentralFreq is None and self._nextIndex < BufferEnd:
+            EndIndex = self._nextIndex + self.BlockLength
+            if EndIndex + self.Overlap > BufferEnd:
+                if Final == False:
+                    break
+                EndIndex = min(EndIndex, BufferEnd)
+            WindowStart = max(self._nextIndex - self.Overlap, 0)
+            WindowEnd = min(EndIndex + self.Overlap, BufferEnd)
+            S_analytic = _hilbert(self._buffer[WindowStart - self._bufferStart: WindowEnd - self._bufferStart])
+            EventTables.append(self._process_analytic(
+                S_analytic[self._nextIndex - WindowStart: EndIndex - WindowStart]))
+            self._nextIndex = EndIndex
+        KeepFrom = max(self._nextIndex - self.Overlap - self._bufferStart, 0)
+        self._buffer = self._buffer[KeepFrom:]
+        self._bufferStart += KeepFrom
+        return _pd.concat(EventTables, ignore_index=True)
+
+    def _update_baseline(self, InstFreqs):
+        """
+        Updates the baseline with the next instantaneous frequencies and
+        returns the baseline at each of them.
+        """
+        if len(InstFreqs) == 0:
+            return InstFreqs
+        if self.Baseline == "Welford":
+            Counts = self._N + _np.arange(1, len(InstFreqs) + 1)
+            PreviousSum = 0 if self._N == 0 else self._N * self.BaselineMean
+            BaselineMeans = (PreviousSum + _np.cumsum(InstFreqs)) / Counts
+            # combine the variance of the chunk with the running variance (Chan et al.)
+            ChunkMean = _np.mean(InstFreqs)
+            ChunkM2 = _np.sum((InstFreqs - ChunkMean)**2)
+            if self._N > 0:
+                delta = ChunkMean - self.BaselineMean
+                ChunkM2 += delta**2 * self._N * len(InstFreqs) / Counts[-1]
+            self._M2 += ChunkM2
+            self.BaselineStd = _np.sqrt(self._M2 / Counts[-1])
+        else:
+            # exponentially weighted sums normalised by the sum of the weights,
+            # so the baseline starts as the mean of the first samples
+            b, a = [self._alpha], [1, self._alpha - 1]
+            WeightedSums, self._zi[0] = scipy.signal.lfilter(b, a, InstFreqs, zi=self._zi[0])
+            Weights, self._zi[1] = scipy.signal.lfilter(b, a, _np.ones(len(InstFreqs)), zi=self._zi[1])
+            BaselineMeans = WeightedSums / Weights
+            WeightedSquares, self._zi[2] = scipy.signal.lfilter(
+                b, a, (InstFreqs - BaselineMeans)**2, zi=self._zi[2])
+            self.BaselineStd = _np.sqrt(WeightedSquares[-1] / Weights[-1])
+        self.BaselineMean = BaselineMeans[-1]
+        self._N += len(InstFreqs)
+        return BaselineMeans
+
+    def _process_analytic(self, S_analytic):
+        """
+        Updates the baseline and finds the collision events from the
+        next samples of the analytic signal (or envelope).
+        """
+        if self._lastAnalytic is not None:
+            S_analytic = _np.concatenate([[self._lastAnalytic], S_analytic])
+        if len(S_analytic) > 0:
+            self._lastAnalytic = S_analytic[-1]
+        InstFreqs = _np.angle(S_analytic[1:] * _np.conj(S_analytic[:-1])) * self.SampleFreq / (2 * _np.pi)
+        if self.CentralFreq is not None:
+            InstFreqs += self.CentralFreq
+        IndexOffset = self._N
+        BaselineMeans = self._update_baseline(InstFreqs)
+        Deviation = _np.abs(BaselineMeans - InstFreqs) / BaselineMeans * 100
+        Collisions = ~(Deviation < self.tolerance)
+        if len(Collisions) == 0:
+            return _make_collision_event_table([], [], [], self.SampleFreq)
+
+        Previous = _np.concatenate([[self._lastCollision], Collisions[:-1]])
+        Starts = _np.nonzero(Collisions & ~Previous)[0]
+        Ends = _np.nonzero(~Collisions & Previous)[0]
+        EventStarts, EventEnds, PeakDeviations = [], [], []
+        if self._lastCollision == True:
+            # the first end finishes the run carried over from the last chunk
+            FirstEnd = Ends[0] if len(Ends) > 0 else len(Collisions)
+            Ends = Ends[1:]
+            if self._eventStart is not None:
+                self._eventPeak = max(self._eventPeak, _np.max(Deviation[:FirstEnd], initial=0))
+                if FirstEnd < len(Collisions):
+                    EventStarts.append(self._eventStart)
+                    EventEnds.append(FirstEnd + IndexOffset)
+                    PeakDeviations.append(self._eventPeak)
+                    self._eventStart = None
+        if len(Starts) > len(Ends):
+            # an event still going at the end of the chunk
+            self._eventStart = Starts[-1] + IndexOffset
+            self._eventPeak = _np.max(Deviation[Starts[-1]:])
+            Starts = Starts[:-1]
+        self._lastCollision = Collisions[-1]
+
+        EventStarts = _np.concatenate([EventStarts, Starts + IndexOffset])
+        EventEnds = _np.concatenate([EventEnds, Ends + IndexOffset])
+        PeakDeviations = _np.concatenate([PeakDeviations, _calc_run_peaks(Deviation, Starts, Ends)])
+        self.CollisionCount += len(EventStarts)
+        return _make_collision_event_table(EventStarts, EventEnds, PeakDeviations, self.SampleFreq)
+
+
 def parse_orgtable(lines):
     """
     Parse an org-table (input as a list of strings split by newline)
@@ -2008,7 +5438,9 @@ def parse_orgtable(lines):
     Returns
     -------
     dataframe : pandas.DataFrame
-        A data frame containing the org-table's data
+        A data frame containing the org-table's data, indexed by RunNo
+        (if the table has a RunNo column). Columns where every entry is
+        a number are converted to numbers.
     """
     def parseline(l):
         w = l.split('|')[1:-1]
@@ -2017,7 +5449,15 @@ def parse_orgtable(lines):
 
     data = []
     for line in lines[2:]:
-        data.append(map(str, parseline(line)))
+        if line.strip().startswith('|') and not line.strip().startswith('|-'):
+            data.append(parseline(line))
     dataframe = _pd.DataFrame(data=data, columns=columns)
-    dataframe.set_index("RunNo")
+    # columns where every entry is a number are converted to numbers
+    for column in dataframe.columns:
+        try:
+            dataframe[column] = _pd.to_numeric(dataframe[column])
+        except (ValueError, TypeError):
+            pass
+    if "RunNo" in dataframe.columns:
+        dataframe = dataframe.set_index("RunNo")
     return dataframe
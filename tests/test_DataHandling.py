@@ -36,7 +36,7 @@ def test_get_fit():
     """
     Tests that DataObject.get_fit works and therefore tests fitPSD, fit_curvefit and PSD_Fitting as these are dependancies. It tests that the output values of the fitting are correct (both the values and thier errors) and that the plot looks the same as the baseline, within a certain tolerance.
     """
-    A, F, Gamma, fig, ax = GlobalData.get_fit(75000, 10000, ShowFig=False)
+    A, F, Gamma, fig, ax = GlobalData.get_fit(75000, 10000, MakeFig=True)
     assert A.n == pytest.approx(584418711252, rel=0.0001)
     assert F.n == pytest.approx(466604, rel=0.0001)
     assert Gamma.n == pytest.approx(3951.716, rel=0.0001)
@@ -65,3 +65,683 @@ def test_extract_parameters():
     assert ConvFactor.std_dev == pytest.approx(58179.9, rel=0.0001)
 
     return None
+
+def test_get_fit_auto():
+    """
+    Tests that DataObject.get_fit_auto returns the fit with the least error from the widths it tried and that the table of fits it returns contains a row per width.
+    """
+    Ftrap, A, Gamma, FitTable = GlobalData.get_fit_auto(75000, MaxWidth=15000, MinWidth=5000, WidthIntervals=5000, Silent=True, ShowFig=False, ReturnTable=True)
+    assert list(FitTable.Width) == [15000, 10000, 5000]
+    BestRow = FitTable.loc[FitTable.TotalSumSquaredError.idxmin()]
+    assert Ftrap.n == pytest.approx(BestRow.Ftrap)
+    assert A.n == pytest.approx(BestRow.A)
+    assert Gamma.n == pytest.approx(BestRow.Gamma)
+
+    return None
+
+def test_get_peaks():
+    """
+    Tests that DataObject.get_peaks returns a table of the peaks in the PSD sorted by frequency, with each peak's height matching the PSD and its centre lying between its half-maximum crossings.
+    """
+    PeakTable = GlobalData.get_peaks()
+    assert len(PeakTable) > 0
+    assert (np.diff(PeakTable.Freq) > 0).all()
+    np.testing.assert_array_equal(PeakTable.Height, GlobalData.PSD[PeakTable.Index])
+    assert (PeakTable.LeftFreq <= PeakTable.Freq).all()
+    assert (PeakTable.Freq <= PeakTable.RightFreq).all()
+    assert (PeakTable.Prominence >= 0).all()
+    LargePeaks = GlobalData.get_peaks(MinProminence=PeakTable.Prominence.max()/2)
+    assert 0 < len(LargePeaks) <= len(PeakTable)
+
+    return None
+
+def test_fit_cache(tmpdir):
+    """
+    Tests that the results of DataObject.get_fit are stored by enable_fit_cache and are returned unchanged when the same fit is done on a fresh DataObject loaded from the same file.
+    """
+    CachePath = str(tmpdir.join("fits.sqlite"))
+    data = datahandling.load_data("testData.raw")
+    assert data.enable_fit_cache(CachePath) == CachePath
+    A, F, Gamma, _, _ = data.get_fit(75000, 10000, Silent=True, MakeFig=False)
+
+    data = datahandling.load_data("testData.raw")
+    data.enable_fit_cache(CachePath)
+    key = data._get_fit_cache_key("get_fit", [75000, 10000, 0.1e10, 400, 1])
+    assert data._get_cached_fit(key) is not None
+    ACached, FCached, GammaCached, _, _ = data.get_fit(75000, 10000, Silent=True, MakeFig=False)
+    for value, cachedValue in zip([A, F, Gamma], [ACached, FCached, GammaCached]):
+        assert cachedValue.n == value.n
+        assert cachedValue.std_dev == value.std_dev
+
+    return None
+
+def test_fit_memory_cache():
+    """
+    Tests that DataObject.get_fit only remembers its results once enable_fit_cache has been called, and that enable_fit_cache(None) remembers them in memory without a results store on disk.
+    """
+    import scipy.signal
+    np.random.seed(5)
+    SampleFreq = 2e6
+    r = np.exp(-np.pi * 2000 / SampleFreq)
+    Data = datahandling.DataObject.__new__(datahandling.DataObject)
+    Data.SampleFreq = SampleFreq
+    Data.voltage = scipy.signal.lfilter([1 - r], [1, -2 * r * np.cos(2 * np.pi * 75e3 / SampleFreq), r**2], np.random.normal(size=2**18))
+    Data.time = datahandling.TimeAxis(len(Data.voltage), 1 / SampleFreq)
+    Data.get_PSD(NPerSegment=2**14)
+    key = Data._get_fit_cache_key("get_fit", [75000, 10000, 1e14, 1e4, 1])
+
+    Data.get_fit(75000, 10000, 1e14, 1e4, Silent=True)
+    assert Data._get_cached_fit(key) is None
+    assert Data.enable_fit_cache(None) is None
+    Data.get_fit(75000, 10000, 1e14, 1e4, Silent=True)
+    assert Data._get_cached_fit(key) is not None
+    Data._set_cached_fit(key, [[1, 2, 3], [0.1, 0.2, 0.3]])
+    ACached, FCached, GammaCached, _, _ = Data.get_fit(75000, 10000, 1e14, 1e4, Silent=True)
+    assert (ACached.n, FCached.n, GammaCached.n) == (1, 2, 3)
+
+    return None
+
+def test_FIRStreamFilter():
+    """
+    Tests that filtering a signal in chunks of varying length with FIRStreamFilter gives the same result as filtering it all at once with scipy.signal.lfilter and that FIR_filter removes the delay of the filter.
+    """
+    import scipy.signal
+    taps = datahandling.FIR_filter_design(75000, 10000, 5000, GlobalData.SampleFreq)
+    Signal = GlobalData.voltage[:200000]
+    StreamFilter = datahandling.FIRStreamFilter(taps)
+    Chunks = np.split(Signal, [10, 5000, 5001, 60000, 150000])
+    FilteredSignal = np.concatenate(list(StreamFilter.filter_chunks(Chunks)))
+    np.testing.assert_allclose(FilteredSignal, scipy.signal.lfilter(taps, 1, Signal), atol=1e-9)
+    Delay = (len(taps) - 1)//2
+    np.testing.assert_allclose(datahandling.FIR_filter(Signal, taps)[:-Delay], FilteredSignal[Delay:], atol=1e-9)
+
+    return None
+
+def test_FIR_filter():
+    """
+    Tests that FIR_filter, which feeds the signal to FIRStreamFilter in chunks, gives the same result as scipy.signal.lfilter for one and several filters, with and without removing the delay of the filters, for a signal many chunks long.
+    """
+    import scipy.signal
+    np.random.seed(3)
+    SampleFreq = 1e6
+    Signal = np.random.normal(0, 1, 700001)
+    taps = np.array([datahandling.FIR_filter_design(CentralFreq, 10000, 5000, SampleFreq) for CentralFreq in [75e3, 120e3]])
+    Delay = (taps.shape[1] - 1)//2
+    Expected = np.array([scipy.signal.lfilter(filterTaps, 1, np.concatenate([Signal, np.zeros(Delay)])) for filterTaps in taps])
+    np.testing.assert_allclose(datahandling.FIR_filter(Signal, taps), Expected[:, Delay:], atol=1e-9)
+    np.testing.assert_allclose(datahandling.FIR_filter(Signal, taps[0], CompensateDelay=False), Expected[0, :len(Signal)], atol=1e-9)
+
+    return None
+
+def test_IIRStreamFilter():
+    """
+    Tests that filtering a signal in chunks with IIRStreamFilter gives the same result as filtering it in one go, both forwards only and forwards-backwards (away from the ends of the signal, where scipy.signal.sosfiltfilt pads the signal).
+    """
+    import scipy.signal
+    FilterBank = datahandling.IIRFilterBank([75000], [10000], [10000], GlobalData.SampleFreq/4, GainStop=100)
+    sos = FilterBank.sos[0]
+    Signal = GlobalData.voltage[:400000:4]
+    Chunks = np.split(Signal, [10, 5000, 5001, 60000])
+    StreamFilter = datahandling.IIRStreamFilter(sos)
+    FilteredSignal = np.concatenate(list(StreamFilter.filter_chunks(Chunks)))
+    zi = scipy.signal.sosfilt_zi(sos) * Signal[0]
+    np.testing.assert_allclose(FilteredSignal, scipy.signal.sosfilt(sos, Signal, zi=zi)[0])
+    StreamFilter = datahandling.IIRStreamFilter(sos, "filtfilt")
+    FilteredSignal = np.concatenate(list(StreamFilter.filter_chunks(Chunks)))
+    assert len(FilteredSignal) == len(Signal)
+    Edge = StreamFilter.Lookahead
+    Expected = scipy.signal.sosfiltfilt(sos, Signal)
+    np.testing.assert_allclose(FilteredSignal[Edge:-Edge], Expected[Edge:-Edge], atol=1e-5*np.max(np.abs(Expected)))
+
+    return None
+
+def test_chunked_sosfiltfilt():
+    """
+    Tests that filtering a signal in overlapping chunks, with chunked_sosfiltfilt and with IIRFilterBank.filter, gives the same result as scipy.signal.sosfiltfilt on the whole signal.
+    """
+    import scipy.signal
+    np.random.seed(2)
+    SampleFreq = 1e6
+    t = np.arange(200000) / SampleFreq
+    Signal = np.sin(2 * np.pi * 75e3 * t) + 0.5 * np.sin(2 * np.pi * 120e3 * t) + np.random.normal(0, 1, len(t))
+    FilterBank = datahandling.IIRFilterBank([75e3, 120e3], [10e3, 5e3], [10e3, 5e3], SampleFreq)
+    Expected = np.array([scipy.signal.sosfiltfilt(sos, Signal) for sos in FilterBank.sos])
+    for sos, ExpectedSignal in zip(FilterBank.sos, Expected):
+        FilteredSignal = datahandling.chunked_sosfiltfilt(sos, Signal, NumChunks=7, NumThreads=3)
+        np.testing.assert_allclose(FilteredSignal, ExpectedSignal, atol=1e-5 * np.max(np.abs(ExpectedSignal)))
+    FilteredSignals = FilterBank.filter(Signal, NumChunks=5)
+    assert FilteredSignals.shape == Expected.shape
+    np.testing.assert_allclose(FilteredSignals, Expected, atol=1e-5 * np.max(np.abs(Expected)))
+
+    return None
+
+def make_ZXY_data():
+    """
+    Makes a DataObject (without a file) holding z, x and y sinusoids at 40, 80 and 120kHz with amplitudes of 1, 0.5 and 0.3 V and a little noise.
+    """
+    np.random.seed(7)
+    SampleFreq = 1e6
+    t = np.arange(200000) / SampleFreq
+    Data = datahandling.DataObject.__new__(datahandling.DataObject)
+    Data.SampleFreq = SampleFreq
+    Data.voltage = (np.sin(2 * np.pi * 40e3 * t) + 0.5 * np.sin(2 * np.pi * 80e3 * t)
+                    + 0.3 * np.sin(2 * np.pi * 120e3 * t) + 0.1 * np.random.normal(size=len(t)))
+    Data.time = datahandling.TimeAxis(len(t), 1 / SampleFreq)
+    return Data
+
+def test_get_ZXY_data():
+    """
+    Tests that get_ZXY_data filters out the z, x and y signals with the same filters as designing each one with IIR_filter_design, and that the filters are only designed once for repeated calls.
+    """
+    import importlib
+    import scipy.signal
+    _cached_IIR_filter_design_sos = importlib.import_module("datahandling.datahandling")._cached_IIR_filter_design_sos
+    Data = make_ZXY_data()
+    zdata, xdata, ydata, timedata = datahandling.get_ZXY_data(Data, 40e3, 80e3, 120e3)
+    for FilteredSignal, CentralFreq, Width, Amplitude in [(zdata, 40e3, 10000, 1), (xdata, 80e3, 5000, 0.5), (ydata, 120e3, 5000, 0.3)]:
+        sos = datahandling.IIR_filter_design(CentralFreq, Width, Width, Data.SampleFreq, GainStop=100, output="sos")
+        np.testing.assert_allclose(FilteredSignal, scipy.signal.sosfiltfilt(sos, Data.voltage[:-1]), atol=1e-12)
+        assert np.sqrt(2) * np.std(FilteredSignal[5000:-5000]) == pytest.approx(Amplitude, rel=0.01)
+    assert len(timedata) == len(zdata)
+
+    Hits = _cached_IIR_filter_design_sos.cache_info().hits
+    datahandling.get_ZXY_data(Data, 40e3, 80e3, 120e3)
+    assert _cached_IIR_filter_design_sos.cache_info().hits == Hits + 3
+
+    return None
+
+def test_decimate_signal():
+    """
+    Tests that calc_decimation_factor keeps the highest frequency of interest inside the band passed by decimate_signal, that decimate_signal keeps a tone in that band and removes one which would alias into it, and that get_ZXY_data on the decimated data matches it on the full data.
+    """
+    assert datahandling.calc_decimation_factor(1e6, 130e3) == 3
+    assert datahandling.calc_decimation_factor(1e6, 450e3) == 1
+
+    SampleFreq = 1e6
+    t = np.arange(200000) / SampleFreq
+    DecimatedSignal = datahandling.decimate_signal(np.sin(2 * np.pi * 50e3 * t) + np.sin(2 * np.pi * 230e3 * t), 4)
+    assert len(DecimatedSignal) == 50000
+    np.testing.assert_allclose(DecimatedSignal[100:-100], np.sin(2 * np.pi * 50e3 * t[::4])[100:-100], atol=1e-3)
+
+    Data = make_ZXY_data()
+    ZXYData = datahandling.get_ZXY_data(Data, 40e3, 80e3, 120e3)
+    DecimatedZXYData = datahandling.get_ZXY_data(Data, 40e3, 80e3, 120e3, FractionOfSampleFreq="Auto")
+    np.testing.assert_array_equal(DecimatedZXYData[3], ZXYData[3][::3])
+    for FilteredSignal, DecimatedFilteredSignal in zip(ZXYData[:3], DecimatedZXYData[:3]):
+        assert len(DecimatedFilteredSignal) == len(FilteredSignal[::3])
+        np.testing.assert_allclose(DecimatedFilteredSignal[2000:-2000], FilteredSignal[::3][2000:-2000], atol=3e-3)
+
+    return None
+
+def test_demodulate():
+    """
+    Tests that demodulate recovers the amplitude, phase and frequency of tones near each central frequency, with the envelopes sampled at about twice the bandwidth.
+    """
+    SampleFreq = 1e6
+    t = np.arange(200000) / SampleFreq
+    Signal = np.cos(2 * np.pi * 75.2e3 * t + 0.3) + 0.5 * np.cos(2 * np.pi * 120e3 * t - 1.0)
+    Envelopes, EnvelopeSampleFreq = datahandling.demodulate(Signal, SampleFreq, [75e3, 120e3], [5e3, 5e3])
+    assert EnvelopeSampleFreq == 10e3
+    assert Envelopes.shape == (2, 2000)
+    EnvelopeTime = np.arange(Envelopes.shape[1]) / EnvelopeSampleFreq
+    np.testing.assert_allclose(Envelopes[0, 50:-50], np.exp(1j * (2 * np.pi * 200 * EnvelopeTime + 0.3))[50:-50], atol=1e-3)
+    np.testing.assert_allclose(Envelopes[1, 50:-50], 0.5 * np.exp(-1j), atol=1e-3)
+
+    Amplitudes, Phases, InstFreqs = datahandling.calc_envelope_parameters(Envelopes, EnvelopeSampleFreq, [75e3, 120e3])
+    np.testing.assert_allclose(Amplitudes[:, 50:-50] - [[1], [0.5]], 0, atol=1e-3)
+    np.testing.assert_allclose(InstFreqs[:, 50:-50] - [[75.2e3], [120e3]], 0, atol=1)
+
+    return None
+
+def test_find_collision_events():
+    """
+    Tests that the table of collision events returned by find_collision_events has one event for each collision counted by count_collisions from find_collisions, starting at the same indicies, and that every event is at least one sample long.
+    """
+    Signal = GlobalData.voltage[:100000]
+    Collisions = datahandling.find_collisions(Signal)
+    CollisionCount, CollisionIndicies = datahandling.count_collisions(Collisions)
+    EventTable = datahandling.find_collision_events(Signal, GlobalData.SampleFreq)
+    assert len(EventTable) == CollisionCount
+    np.testing.assert_array_equal(EventTable.StartIndex, CollisionIndicies)
+    assert (EventTable.EndIndex > EventTable.StartIndex).all()
+    assert Collisions[EventTable.StartIndex].all()
+
+    return None
+
+def test_import_time():
+    """
+    Tests that importing datahandling in a fresh interpreter doesn't import the plotting libraries or pandas, which are only imported when a function using them is first called, and that the import takes less than 5 s.
+    """
+    import subprocess
+    import sys
+    Script = ("import sys, time\n"
+              "start = time.perf_counter()\n"
+              "import datahandling\n"
+              "print(time.perf_counter() - start)\n"
+              "print(','.join(m for m in ['matplotlib.pyplot', 'matplotlib.animation', 'seaborn', 'pandas'] if m in sys.modules))")
+    Output = subprocess.check_output([sys.executable, "-c", Script]).decode().splitlines()
+    assert float(Output[0]) < 5
+    assert Output[-1] == ""
+
+    return None
+
+def test_TimeAxis():
+    """
+    Tests that the TimeAxis of the loaded data gives the same times as the array of times calculated from the wave description, when indexed, sliced and used in numpy functions, and that get_index finds the same index as take_closest.
+    """
+    Time = GlobalData.time
+    assert type(Time) == datahandling.TimeAxis
+    TimeArray = np.arange(len(GlobalData.voltage)) * GlobalData.waveDescription["HORIZ_INTERVAL"] + GlobalData.waveDescription["HORIZ_OFFSET"]
+    np.testing.assert_array_equal(np.asarray(Time), TimeArray)
+    np.testing.assert_array_equal(np.array(Time, dtype=np.float32, copy=True), TimeArray.astype(np.float32))
+    assert Time.__array__(copy=False).dtype == TimeArray.dtype
+    assert Time[-1] == TimeArray[-1]
+    np.testing.assert_allclose(np.asarray(Time[100:50000:7]), TimeArray[100:50000:7])
+    np.testing.assert_allclose(np.diff(Time[:1000]), np.diff(TimeArray[:1000]))
+    for t in [TimeArray[0] - 1, TimeArray[1234] + 0.3 * GlobalData.waveDescription["HORIZ_INTERVAL"], TimeArray[-1] + 1]:
+        assert TimeArray[Time.get_index(t)] == datahandling.take_closest(TimeArray, t)
+
+    return None
+
+def test_get_voltage_envelope():
+    """
+    Tests that the min/max envelope of the voltage returned by DataObject.get_voltage_envelope has about the requested number of points and keeps the largest and smallest voltage in the window.
+    """
+    time, voltage = GlobalData.get_voltage_envelope(NumPoints=1000)
+    assert 1000 <= len(voltage) <= 2002
+    assert len(time) == len(voltage)
+    assert voltage.max() == GlobalData.voltage.max()
+    assert voltage.min() == GlobalData.voltage.min()
+    assert (np.diff(time) >= 0).all()
+
+    return None
+
+def test_save_PSD_plots(tmpdir):
+    """
+    Tests that save_PSD_plots saves a png of the PSD (and fit) of each file named after the data file and records the files that could not be loaded rather than stopping.
+    """
+    PlotTable = datahandling.save_PSD_plots(["testData.raw", "missingData.raw"], str(tmpdir), xlim=[0, 400e3],
+                                            TrapFreq=75000, WidthOfPeakToFit=10000, NumProcesses=1)
+    assert list(PlotTable["PlotFilepath"]) == [str(tmpdir.join("testData.png")), str(tmpdir.join("missingData.png"))]
+    assert PlotTable["PlotError"][0] == ""
+    assert tmpdir.join("testData.png").check()
+    assert PlotTable["PlotError"][1] != ""
+    assert not tmpdir.join("missingData.png").check()
+
+    return None
+
+def test_PhaseSpaceHistogram():
+    """
+    Tests that PhaseSpaceHistogram bins samples the same as numpy.histogram2d, counts the samples outside its range and that merging histograms of chunks of the samples gives the same counts and moments as adding all the samples at once.
+    """
+    np.random.seed(0)
+    Z = np.random.normal(0, 1e-8, 100000)
+    ZV = np.random.normal(0, 2e-8, 100000) + 0.5 * Z
+    Histogram = datahandling.PhaseSpaceHistogram(5e-8, 50)
+    Histogram.add(Z, ZV)
+    Counts, _, _ = np.histogram2d(Z, ZV, bins=[Histogram.Edges, Histogram.Edges])
+    np.testing.assert_array_equal(Histogram.Counts, Counts)
+    assert Histogram.NumOutOfRange == len(Z) - Counts.sum()
+
+    Merged = datahandling.PhaseSpaceHistogram(5e-8, 50)
+    for i in range(0, len(Z), 30000):
+        Chunk = datahandling.PhaseSpaceHistogram(5e-8, 50)
+        Chunk.add(Z[i:i+30000], ZV[i:i+30000])
+        Merged.merge(Chunk)
+    np.testing.assert_array_equal(Merged.Counts, Histogram.Counts)
+    Mean, Covariance = Merged.get_moments()
+    np.testing.assert_allclose(Mean, [Z.mean(), ZV.mean()], atol=1e-20)
+    np.testing.assert_allclose(Covariance, np.cov(Z, ZV, bias=True), rtol=1e-10)
+
+    return None
+
+def test_StreamingStatistics():
+    """
+    Tests that merging the StreamingStatistics of chunks of a signal gives the same moments, minimum, maximum and histogram as calculating them from the whole signal at once.
+    """
+    np.random.seed(0)
+    Signal = np.random.gamma(2, 1, 100001) - 2
+    Stats = datahandling.StreamingStatistics((-3, 3), 60)
+    for Chunk in np.array_split(Signal, 7):
+        ChunkStats = datahandling.StreamingStatistics((-3, 3), 60)
+        ChunkStats.add(Chunk)
+        Stats.merge(ChunkStats)
+    Mean, Variance, Skewness, Kurtosis = Stats.get_moments()
+    Deviations = Signal - Signal.mean()
+    assert Stats.NumSamples == len(Signal)
+    assert Mean == pytest.approx(Signal.mean(), rel=1e-10)
+    assert Variance == pytest.approx(Signal.var(), rel=1e-10)
+    assert Skewness == pytest.approx(np.mean(Deviations**3) / Signal.var()**1.5, rel=1e-10)
+    assert Kurtosis == pytest.approx(np.mean(Deviations**4) / Signal.var()**2 - 3, rel=1e-10)
+    assert (Stats.Min, Stats.Max) == (Signal.min(), Signal.max())
+    np.testing.assert_array_equal(Stats.Counts, np.histogram(Signal, Stats.Edges)[0])
+    assert Stats.NumOutOfRange == len(Signal) - Stats.Counts.sum()
+
+    assert np.isnan(datahandling.StreamingStatistics().get_moments()).all()
+    ConstantStats = datahandling.StreamingStatistics()
+    ConstantStats.add(np.ones(10))
+    Mean, Variance, Skewness, Kurtosis = ConstantStats.get_moments()
+    assert (Mean, Variance) == (1, 0)
+    assert np.isnan(Skewness) and np.isnan(Kurtosis)
+
+    return None
+
+def write_LeCroy_waveform(Filepath, Ints, Gain, Offset, UserText=b"", SampleInterval=0.5e-6):
+    """
+    Writes a waveform file of 16 bit integers (as saved from a LeCroy oscilloscope) with the given vertical gain and offset, sample interval and optionally a user text block between the descriptor and the data, the rest of the descriptor is zeros.
+    """
+    import struct
+    Ints = np.asarray(Ints, dtype="<i2")
+    Descriptor = bytearray(346)
+    Descriptor[32:36] = struct.pack("<HH", 1, 1) # 16 bit samples, least significant byte first
+    Descriptor[36:44] = struct.pack("<ll", 346, len(UserText))
+    Descriptor[60:64] = struct.pack("<l", 2 * len(Ints))
+    Descriptor[156:164] = struct.pack("<ff", Gain, Offset)
+    Descriptor[176:180] = struct.pack("<f", SampleInterval)
+    Body = bytes(Descriptor) + UserText + Ints.tobytes()
+    with open(Filepath, "wb") as file:
+        file.write(b"#9" + "{:09d}".format(len(Body)).encode() + Body)
+    return None
+
+def test_ReadWaveformBlocks(tmpdir):
+    """
+    Tests that LeCroy.ReadWaveformBlocks reads the same voltage in blocks as InterpretWaveform reads all at once, and that it finds the data after a user text block from the lengths in the descriptor.
+    """
+    np.random.seed(4)
+    Ints = np.random.randint(-30000, 30000, 10001)
+    Filepath = str(tmpdir.join("waveform.trc"))
+    write_LeCroy_waveform(Filepath, Ints, 1e-3, 0.1)
+    with open(Filepath, "rb") as file:
+        _, _, Voltage, _ = datahandling.LeCroy.InterpretWaveform(file.read())
+    Blocks = list(datahandling.LeCroy.ReadWaveformBlocks(Filepath, BlockSize=1000))
+    assert [len(Block) for Block in Blocks] == [1000] * 10 + [1]
+    np.testing.assert_array_equal(np.concatenate(Blocks), Voltage)
+
+    write_LeCroy_waveform(Filepath, Ints, 1e-3, 0.1, UserText=b"a comment")
+    np.testing.assert_array_equal(np.concatenate(list(datahandling.LeCroy.ReadWaveformBlocks(Filepath))), Voltage)
+
+    return None
+
+def test_multi_fit_data(tmpdir):
+    """
+    Tests that multi_fit_data fitting files on a pool of processes gives the same fits as DataObject.get_fit on each file in turn, and records a file that can't be loaded rather than stopping.
+    """
+    import scipy.signal
+    np.random.seed(6)
+    SampleFreq = 2e6
+    r = np.exp(-np.pi * 2000 / SampleFreq)
+    Filepaths = []
+    for i, TrapFreq in enumerate([75e3, 76e3]):
+        Signal = scipy.signal.lfilter([1 - r], [1, -2 * r * np.cos(2 * np.pi * TrapFreq / SampleFreq), r**2], np.random.normal(size=2**18))
+        Filepath = str(tmpdir.join("{}.trc".format(i)))
+        write_LeCroy_waveform(Filepath, np.round(Signal / np.abs(Signal).max() * 30000), 1e-3, 0, SampleInterval=1 / SampleFreq)
+        Filepaths.append(Filepath)
+
+    FitTable = datahandling.multi_fit_data(Filepaths + [str(tmpdir.join("missing.trc"))], 75000, 10000, 1e14, 1e4, NumProcesses=2)
+    assert list(FitTable.Filepath) == Filepaths + [str(tmpdir.join("missing.trc"))]
+    for Filepath, Row in zip(Filepaths, FitTable.itertuples()):
+        A, Ftrap, Gamma, _, _ = datahandling.DataObject(Filepath).get_fit(75000, 10000, 1e14, 1e4, Silent=True)
+        assert Row.FitError == ""
+        assert (Row.A, Row.Ftrap, Row.Gamma) == (A.n, Ftrap.n, Gamma.n)
+        assert (Row.AErr, Row.FtrapErr, Row.GammaErr) == (A.std_dev, Ftrap.std_dev, Gamma.std_dev)
+    assert FitTable.Ftrap[1] / (2 * np.pi) == pytest.approx(76e3, rel=5e-3)
+    assert FitTable.FitError[2] != ""
+
+    return None
+
+def test_multi_calc_statistics(tmpdir):
+    """
+    Tests that multi_calc_statistics of LeCroy files read in blocks gives the statistics of the whole voltage, z position and z velocity of the files (the velocity is continuous across the blocks of a file but not between files).
+    """
+    import scipy.signal
+    SampleFreq = 2e6
+    zf = 75e3
+    ConvFactors = [1e5, 2e5, 1e5]
+    Gain, Offset = np.float32(1e-3), np.float32(0.1)
+    np.random.seed(1)
+    Filepaths, Voltages = [], []
+    for i in range(3):
+        t = np.arange(100000) / SampleFreq
+        Signal = np.sin(2 * np.pi * zf * t + np.cumsum(np.random.normal(0, 0.05, len(t)))) + 0.3 * np.random.normal(0, 1, len(t))
+        Ints = np.round(Signal / np.abs(Signal).max() * 30000).astype("<i2")
+        Filepath = str(tmpdir.join("{}.trc".format(i)))
+        write_LeCroy_waveform(Filepath, Ints, Gain, Offset)
+        Filepaths.append(Filepath)
+        Voltages.append(Ints * float(Gain) - float(Offset))
+
+    VoltageStats, ZStats, ZVStats = datahandling.multi_calc_statistics(
+        Filepaths, SampleFreq, zf, ConvFactors=ConvFactors, VoltageRange=(-20, 20), BlockSize=2**14, NumProcesses=2)
+    Voltage = np.concatenate(Voltages)
+    assert VoltageStats.NumSamples == len(Voltage)
+    np.testing.assert_allclose(VoltageStats.get_moments()[:2], [Voltage.mean(), Voltage.var()], rtol=1e-8)
+    assert (VoltageStats.Min, VoltageStats.Max) == (Voltage.min(), Voltage.max())
+    np.testing.assert_array_equal(VoltageStats.Counts, np.histogram(Voltage, VoltageStats.Edges)[0])
+
+    sos = datahandling.IIR_filter_design(zf, 10000, 10000, SampleFreq, output="sos")
+    Zs = [scipy.signal.sosfiltfilt(sos, voltage) / ConvFactor for voltage, ConvFactor in zip(Voltages, ConvFactors)]
+    Z = np.concatenate(Zs)
+    ZV = np.concatenate([np.diff(z) * SampleFreq for z in Zs])
+    assert ZStats.NumSamples == len(Z)
+    assert ZVStats.NumSamples == len(ZV)
+    assert ZStats.get_moments()[1] == pytest.approx(Z.var(), rel=1e-3)
+    assert ZVStats.get_moments()[1] == pytest.approx(ZV.var(), rel=1e-3)
+
+    return None
+
+def test_ORGTableData(tmpdir):
+    """
+    Tests that ORGTableData parses the columns of numbers into numbers indexed by the run number, that get_value and get_values look up the values of run numbers and that the table is read in again when the file changes.
+    """
+    TableFile = tmpdir.join("table.org")
+    TableFile.write("| RunNo | Pressure | Comment |\n"
+                    "|-------+----------+---------|\n"
+                    "|   3   |  15e-3   |  first  |\n"
+                    "|   5   |   2.5    |  second |\n")
+    Table = datahandling.ORGTableData(str(TableFile))
+    assert Table.get_value("Pressure", 3) == 15e-3
+    np.testing.assert_array_equal(Table.get_values("Pressure", [5, 3]), [2.5, 15e-3])
+    with pytest.raises(KeyError):
+        Table.get_values("Pressure", [3, 4])
+
+    TableFile.write("|   7   |   1e-6   |  third  |\n", mode="a")
+    assert Table.get_value("Pressure", 7) == 1e-6
+
+    Table.ORGTableData.loc[7, "Pressure"] = 0 # changing one table doesn't change the others read from the file
+    assert datahandling.ORGTableData(str(TableFile)).get_value("Pressure", 7) == 1e-6
+
+    return None
+
+def test_IFFT_filter():
+    """
+    Tests that IFFT_filter gives the same result as the original fft -> zeroing out bins -> ifft filter, for signals with an odd and even number of samples and for bands including 0Hz.
+    """
+    def reference_IFFT_filter(Signal, SampleFreq, lowerFreq, upperFreq):
+        Signalfft = np.fft.fft(Signal)
+        freqs = np.fft.fftfreq(len(Signal)) * SampleFreq
+        Signalfft[(freqs < lowerFreq) | (freqs > upperFreq)] = 0
+        return np.real(2 * np.fft.ifft(Signalfft))
+
+    np.random.seed(0)
+    SampleFreq = 1e6
+    for NumSamples in [100003, 100000]:
+        t = np.arange(NumSamples) / SampleFreq
+        Signal = np.sin(2 * np.pi * 50e3 * t) + 0.5 * np.random.normal(size=NumSamples)
+        for lowerFreq, upperFreq in [(40e3, 60e3), (0, 60e3)]:
+            Filtered = datahandling.IFFT_filter(Signal, SampleFreq, lowerFreq, upperFreq)
+            np.testing.assert_allclose(Filtered, reference_IFFT_filter(Signal, SampleFreq, lowerFreq, upperFreq), atol=1e-10)
+
+    return None
+
+def test_fit_multi_PSD():
+    """
+    Tests that fit_multi_PSD recovers the parameters of two overlapping peaks on a noise floor from a synthetic PSD when the initial values are given as numpy arrays.
+    """
+    from types import SimpleNamespace
+    np.random.seed(0)
+    freqs = np.linspace(1, 200e3, 20000)
+    AngFreqs = 2 * np.pi * freqs
+    TrueParams = [[1e21, 2 * np.pi * 75e3, 3000], [5e20, 2 * np.pi * 82e3, 4000]]
+    PSD = 0.05 + sum(A / ((OmegaTrap**2 - AngFreqs**2)**2 + (AngFreqs * Gamma)**2) for A, OmegaTrap, Gamma in TrueParams)
+    PSD *= np.random.gamma(100, 1 / 100, len(freqs))
+    Data = SimpleNamespace(freqs=freqs, PSD=PSD)
+
+    Params, ParamsErr, NoiseFloor, NoiseFloorErr, fig, ax = datahandling.fit_multi_PSD(
+        Data, 60e3, 100e3, np.array([74e3, 83e3]), np.array([0.5e21, 0.5e21]), np.array([2000, 2000]),
+        NoiseFloorGuess=np.float64(0.1), MakeFig=False)
+    for PeakParams, TruePeakParams in zip(Params, TrueParams):
+        assert PeakParams[1] == pytest.approx(TruePeakParams[1], rel=1e-3)
+        assert PeakParams[2] == pytest.approx(TruePeakParams[2], rel=0.1)
+        assert PeakParams[0] == pytest.approx(TruePeakParams[0], rel=0.1)
+    assert NoiseFloor == pytest.approx(0.05, rel=0.1)
+    assert fig is None
+
+    return None
+
+def test_calc_sliding_PSD():
+    """
+    Tests that the PSD of each window calculated by calc_sliding_PSD is the same as scipy.signal.welch gives for the samples in that window, for even and odd segment lengths.
+    """
+    import scipy.signal
+    np.random.seed(0)
+    SampleFreq = 1e6
+    Signal = np.random.normal(size=50000)
+    for NPerSegment, WindowLength, StepLength in [(256, 3000, 1000), (255, 3001, 777)]:
+        freqs, PSDs, WindowStarts = datahandling.calc_sliding_PSD(Signal, SampleFreq, WindowLength, StepLength, NPerSegment)
+        assert len(PSDs) == len(WindowStarts) > 1
+        for PSD, WindowStart in zip(PSDs, WindowStarts):
+            welchfreqs, welchPSD = scipy.signal.welch(Signal[WindowStart:WindowStart+WindowLength], SampleFreq, nperseg=NPerSegment)
+            np.testing.assert_allclose(freqs, welchfreqs)
+            np.testing.assert_allclose(PSD, welchPSD, rtol=1e-8)
+        freqsInRange, PSDsInRange, _ = datahandling.calc_sliding_PSD(Signal, SampleFreq, WindowLength, StepLength, NPerSegment,
+                                                                      FreqRange=np.array([100e3, 200e3]))
+        assert np.isin(freqs[(freqs >= 100e3) & (freqs <= 200e3)], freqsInRange).all()
+        np.testing.assert_allclose(PSDsInRange, PSDs[:, np.isin(freqs, freqsInRange)])
+
+    return None
+
+def test_get_fit_tracking():
+    """
+    Tests that DataObject.get_fit_tracking follows a trapping frequency which jumps half way through a simulated signal.
+    """
+    import scipy.signal
+    np.random.seed(0)
+    SampleFreq = 2e6
+    NumSamples = 2**20
+    Signal = np.zeros(NumSamples)
+    for Start, TrapFreq in [(0, 75e3), (NumSamples // 2, 80e3)]:
+        r = np.exp(-np.pi * 2000 / SampleFreq)
+        a = [1, -2 * r * np.cos(2 * np.pi * TrapFreq / SampleFreq), r**2]
+        Signal[Start:Start+NumSamples//2] = scipy.signal.lfilter([1 - r], a, np.random.normal(size=NumSamples // 2))
+    Data = datahandling.DataObject.__new__(datahandling.DataObject)
+    Data.SampleFreq = SampleFreq
+    Data.voltage = Signal
+    Data.time = datahandling.TimeAxis(NumSamples, 1 / SampleFreq)
+
+    FitTable = Data.get_fit_tracking(77.5e3, 20e3, 0.05, NPerSegment=4096)
+    assert len(FitTable) == 10
+    Ftraps = FitTable["Ftrap"] / (2 * np.pi)
+    Before, After = FitTable["Time"] < 0.2, FitTable["Time"] > 0.32
+    np.testing.assert_allclose(Ftraps[Before], 75e3, rtol=5e-3)
+    np.testing.assert_allclose(Ftraps[After], 80e3, rtol=5e-3)
+
+    return None
+
+def test_CollisionMonitor():
+    """
+    Tests that CollisionMonitor finds the same collision events (the injected jumps in frequency of a simulated signal) whether the signal is processed all at once or in chunks of random lengths, for both kinds of baseline.
+    """
+    import pandas as pd
+    np.random.seed(0)
+    SampleFreq = 1e6
+    NumSamples = 200000
+    InstFreq = np.full(NumSamples, 50e3)
+    JumpStarts = [30000, 90000, 150000]
+    for Start in JumpStarts:
+        InstFreq[Start:Start+500] = 90e3
+    Signal = np.cos(2 * np.pi * np.cumsum(InstFreq) / SampleFreq) + 0.01 * np.random.normal(size=NumSamples)
+    ChunkEnds = np.cumsum(np.random.randint(1, 20000, 40))
+    Chunks = np.split(Signal, ChunkEnds[ChunkEnds < NumSamples])
+
+    for Baseline in ["Welford", "EWMA"]:
+        Monitor = datahandling.CollisionMonitor(SampleFreq, Baseline=Baseline, BaselineTime=0.01)
+        WholeEvents = pd.concat([Monitor.process(Signal), Monitor.flush()], ignore_index=True)
+        Monitor.reset()
+        ChunkedEvents = pd.concat([Monitor.process(Chunk) for Chunk in Chunks] + [Monitor.flush()], ignore_index=True)
+        pd.testing.assert_frame_equal(ChunkedEvents, WholeEvents)
+        assert Monitor.CollisionCount == len(WholeEvents)
+        assert list(WholeEvents["StartIndex"][:3]) == JumpStarts
+        np.testing.assert_allclose(WholeEvents["Duration"][:3], 500 / SampleFreq, rtol=0.01)
+
+    return None
+
+def test_calc_analytic_signal():
+    """
+    Tests that calc_analytic_signal is the same as scipy.signal.hilbert when done in one FFT and that calculating it in overlapping chunks agrees with that, as does the FM discriminator calculated from it.
+    """
+    import scipy.signal
+    np.random.seed(0)
+    SampleFreq = 1e6
+    t = np.arange(100000) / SampleFreq
+    # a whole number of periods of the carrier and modulation, so the single FFT has no edge effects to compare against
+    Signal = np.cos(2 * np.pi * (50e3 * t + 2e3 / 300 * np.sin(2 * np.pi * 300 * t))) + 0.01 * np.random.normal(size=len(t))
+    S_analytic = datahandling.calc_analytic_signal(Signal)
+    np.testing.assert_allclose(S_analytic, scipy.signal.hilbert(Signal), atol=1e-12)
+    S_chunked = datahandling.calc_analytic_signal(Signal, ChunkLength=20000, Overlap=5000)
+    np.testing.assert_allclose(S_chunked[5000:-5000], S_analytic[5000:-5000], atol=1e-3)
+    fmd = datahandling.fm_discriminator(Signal)
+    fmd_chunked = datahandling.fm_discriminator(Signal, ChunkLength=20000, Overlap=5000)
+    np.testing.assert_allclose(fmd_chunked[5000:-5000], fmd[5000:-5000], atol=1e-3)
+
+    return None
+
+def test_save_PSD_plots_filenames(tmpdir):
+    """
+    Tests that save_PSD_plots names the pngs of data files with the same name in different directories differently and refuses to plot the same file twice.
+    """
+    PlotTable = datahandling.save_PSD_plots([str(tmpdir.join("a", "run.raw")), str(tmpdir.join("b", "run.raw"))], str(tmpdir), NumProcesses=1)
+    assert list(PlotTable["PlotFilepath"]) == [str(tmpdir.join("a_run.png")), str(tmpdir.join("b_run.png"))]
+    with pytest.raises(ValueError):
+        datahandling.save_PSD_plots(["run.raw", "./run.raw"], str(tmpdir), NumProcesses=1)
+
+    return None
+
+def test_animation_frame_renderer():
+    """
+    Tests that the frame renderer used by animate draws consecutive frames of the size it reports.
+    """
+    import importlib
+    _AnimationFrameRenderer = importlib.import_module("datahandling.datahandling")._AnimationFrameRenderer
+    t = np.arange(20) * 1e-6
+    Positions = 50 * np.array([np.sin(t * 1e5), np.cos(t * 1e5), np.sin(t * 2e5)])
+    Renderer = _AnimationFrameRenderer([Positions, t, 100])
+    Width, Height = Renderer.get_size()
+    for i in range(2):
+        Frame = Renderer.render(i)
+        assert len(Frame) == Width * Height * 4
+    assert len(Renderer.ax.collections) == 3 # the trails of the previous frame were removed
+    return None
+
+def test_bounded_imap():
+    """
+    Tests that the bounded imap used by animate returns the results in order and submits no more than MaxInFlight tasks ahead of the results consumed.
+    """
+    import importlib
+    from multiprocessing import Pool
+    _bounded_imap = importlib.import_module("datahandling.datahandling")._bounded_imap
+    Submitted = []
+    def tasks():
+        for i in range(20):
+            Submitted.append(i)
+            yield -i
+    workerPool = Pool(2)
+    try:
+        Results = []
+        for Result in _bounded_imap(workerPool, abs, tasks(), 4):
+            assert len(Submitted) - len(Results) <= 4
+            Results.append(Result)
+    finally:
+        workerPool.close()
+        workerPool.join()
+    assert Results == list(range(20))
+
+    return None